@@ -1,22 +1,51 @@
 """
 Analytics Service
 """
-from typing import Dict, Any
+from typing import Dict, Any, List
 from datetime import datetime, timedelta
-from app.core.firebase import get_firestore
+from app.core.firebase import get_async_firestore
 from app.core.logging import logger
 from app.rides.repository import RideRepository
 from app.payments.repository import PaymentRepository
+from app.maps import geo
 
 
 class AnalyticsService:
     """Service for analytics business logic"""
     
     def __init__(self):
-        self.db = get_firestore()
+        self.db = get_async_firestore()
         self.ride_repository = RideRepository()
         self.payment_repository = PaymentRepository()
     
+    def _trip_distances_km(self, rides: List[Dict[str, Any]]) -> List[float]:
+        """
+        Straight-line pickup-to-dropoff distances for rides, in one vectorized pass
+        
+        Rides without valid pickup and dropoff coordinates are skipped.
+        """
+        pickup_lats, pickup_lngs, dropoff_lats, dropoff_lngs = [], [], [], []
+        for ride in rides:
+            pickup = ride.get("pickupLocation") or {}
+            dropoff = ride.get("dropoffLocation") or {}
+            try:
+                coordinates = (
+                    float(pickup["latitude"]),
+                    float(pickup["longitude"]),
+                    float(dropoff["latitude"]),
+                    float(dropoff["longitude"])
+                )
+            except (KeyError, TypeError, ValueError):
+                continue
+            pickup_lats.append(coordinates[0])
+            pickup_lngs.append(coordinates[1])
+            dropoff_lats.append(coordinates[2])
+            dropoff_lngs.append(coordinates[3])
+        
+        if not pickup_lats:
+            return []
+        return geo.distances_km(pickup_lats, pickup_lngs, dropoff_lats, dropoff_lngs).tolist()
+    
     async def get_user_ride_analytics(self, user_id: str) -> Dict[str, Any]:
         """Get ride analytics for a user"""
         try:
@@ -37,6 +66,10 @@ class AnalyticsService:
             ratings = [r.get("rating") for r in completed_rides if r.get("rating")]
             avg_rating = sum(ratings) / len(ratings) if ratings else 0
             
+            # Trip distances of completed rides
+            distances = self._trip_distances_km(completed_rides)
+            total_distance = sum(distances)
+            
             return {
                 "totalRides": total_rides,
                 "completedRides": len(completed_rides),
@@ -44,6 +77,8 @@ class AnalyticsService:
                 "pendingRides": len(pending_rides),
                 "totalSpent": total_spent,
                 "averageRating": round(avg_rating, 2),
+                "totalDistanceKm": round(total_distance, 2),
+                "averageDistanceKm": round(total_distance / len(distances), 2) if distances else 0,
                 "currency": "NAD"
             }
             
@@ -194,12 +229,18 @@ class AnalyticsService:
             ratings = [r.get("rating") for r in completed_rides if r.get("rating")]
             avg_rating = sum(ratings) / len(ratings) if ratings else 0
             
+            # Trip distances of completed rides
+            distances = self._trip_distances_km(completed_rides)
+            total_distance = sum(distances)
+            
             return {
                 "totalRides": len(rides),
                 "completedRides": len(completed_rides),
                 "cancelledRides": len(cancelled_rides),
                 "activeRides": len(active_rides),
                 "averageRating": round(avg_rating, 2),
+                "totalDistanceKm": round(total_distance, 2),
+                "averageDistanceKm": round(total_distance / len(distances), 2) if distances else 0,
                 "completionRate": round((len(completed_rides) / len(rides) * 100) if rides else 0, 2)
             }
             
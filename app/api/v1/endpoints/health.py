@@ -4,6 +4,7 @@ Health Check Endpoints
 from fastapi import APIRouter
 from app.core.responses import success_response
 from app.core.config import settings
+from app.core.metrics import collect_metrics
 
 router = APIRouter()
 
@@ -32,3 +33,11 @@ async def test():
         }
     )
 
+
+@router.get("/metrics")
+async def metrics():
+    """In-process metrics (executor saturation, caches, queues)"""
+    return success_response(
+        message="Metrics retrieved successfully",
+        data=collect_metrics()
+    )
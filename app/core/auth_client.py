@@ -0,0 +1,102 @@
+"""
+Async Firebase Auth Facade
+
+Wraps the process-wide firebase_admin auth.Client (see get_firebase_auth) with
+awaitable methods that run on the "auth" executor, and counts calls, errors and
+latency per method. The client is resolved lazily on first call, so services
+can hold the facade from import time.
+
+Revoking a user's tokens or changing their disabled flag notifies the
+registered revocation listeners (the verified token cache), so cached
+verification results of that user are re-checked on their next request.
+"""
+import time
+from typing import Any, Callable, Dict, List, Optional
+from firebase_admin import auth
+from app.core.executors import run_blocking
+from app.core.firebase import get_firebase_auth
+from app.core.metrics import register_metrics
+
+
+class AsyncAuthClient:
+    """Awaitable Firebase Auth calls with per-method counters"""
+    
+    def __init__(self, client_factory: Callable[[], auth.Client] = get_firebase_auth):
+        """
+        Args:
+            client_factory: Returns the shared auth.Client
+        """
+        self._client_factory = client_factory
+        self._revocation_listeners: List[Callable[[str], None]] = []
+        self._calls: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._latency_seconds: Dict[str, float] = {}
+    
+    def add_revocation_listener(self, listener: Callable[[str], None]) -> None:
+        """Call listener(uid) after a user's tokens are revoked or their disabled flag changes"""
+        self._revocation_listeners.append(listener)
+    
+    def _notify_revocation(self, uid: str) -> None:
+        for listener in self._revocation_listeners:
+            listener(uid)
+    
+    @property
+    def client(self) -> auth.Client:
+        """The underlying firebase_admin client"""
+        return self._client_factory()
+    
+    async def _call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        func = getattr(self.client, method)
+        self._calls[method] = self._calls.get(method, 0) + 1
+        started_at = time.monotonic()
+        try:
+            return await run_blocking("auth", func, *args, **kwargs)
+        except Exception:
+            self._errors[method] = self._errors.get(method, 0) + 1
+            raise
+        finally:
+            self._latency_seconds[method] = self._latency_seconds.get(method, 0.0) + time.monotonic() - started_at
+    
+    async def verify_id_token(self, token: str, check_revoked: bool = False) -> Dict[str, Any]:
+        return await self._call("verify_id_token", token, check_revoked=check_revoked)
+    
+    async def get_user(self, uid: str) -> auth.UserRecord:
+        return await self._call("get_user", uid)
+    
+    async def get_user_by_phone_number(self, phone_number: str) -> auth.UserRecord:
+        return await self._call("get_user_by_phone_number", phone_number)
+    
+    async def create_user(self, **kwargs: Any) -> auth.UserRecord:
+        return await self._call("create_user", **kwargs)
+    
+    async def update_user(self, uid: str, **kwargs: Any) -> auth.UserRecord:
+        user_record = await self._call("update_user", uid, **kwargs)
+        if "disabled" in kwargs:
+            self._notify_revocation(uid)
+        return user_record
+    
+    async def set_custom_user_claims(self, uid: str, custom_claims: Optional[Dict[str, Any]]) -> None:
+        await self._call("set_custom_user_claims", uid, custom_claims)
+    
+    async def create_custom_token(self, uid: str, developer_claims: Optional[Dict[str, Any]] = None) -> bytes:
+        return await self._call("create_custom_token", uid, developer_claims)
+    
+    async def revoke_refresh_tokens(self, uid: str) -> None:
+        await self._call("revoke_refresh_tokens", uid)
+        self._notify_revocation(uid)
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of calls, errors and average latency per method"""
+        return {
+            method: {
+                "calls": calls,
+                "errors": self._errors.get(method, 0),
+                "avg_latency_ms": round(self._latency_seconds.get(method, 0.0) / calls * 1000, 3),
+            }
+            for method, calls in sorted(self._calls.items())
+        }
+
+
+# Global Firebase Auth facade
+auth_client = AsyncAuthClient()
+register_metrics("auth_client", auth_client.metrics)
@@ -0,0 +1,106 @@
+"""
+In-process TTL Cache
+
+Small bounded key-value cache with per-entry expiry and LRU eviction, used for
+short-lived derived values (counts, lookups) that are expensive to recompute.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a fixed time-to-live"""
+    
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float):
+        """
+        Args:
+            name: Cache name used in logs and metrics
+            max_entries: Maximum number of entries before least recently used ones are evicted
+            ttl_seconds: Entry lifetime in seconds (0 disables the cache)
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether entries are kept at all"""
+        return self.ttl_seconds > 0 and self.max_entries > 0
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a cached value
+        
+        Returns:
+            The cached value, or default if missing or expired
+        """
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self._misses += 1
+                return default
+            
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._misses += 1
+                return default
+            
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+    
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Store a value
+        
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl_seconds: Lifetime override for this entry
+        """
+        if not self.enabled:
+            return
+        
+        expires_at = time.monotonic() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+    
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a single entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self) -> None:
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of cache size and hit/miss counters"""
+        lookups = self._hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "evictions": self._evictions,
+        }
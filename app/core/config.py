@@ -87,11 +87,99 @@ class Settings(BaseSettings):
     DRIVER_SUBSCRIPTION_AMOUNT: float = 150.00  # NAD per month
     PARENT_SUBSCRIPTION_AMOUNT: float = 1000.00  # NAD per month
     DEFAULT_RIDE_FARE: float = 13.00  # NAD per ride
+    FARE_PER_KM: float = 0.0  # NAD per estimated km (0 keeps the flat DEFAULT_RIDE_FARE)
+    FARE_PER_MINUTE: float = 0.0  # NAD per estimated minute
+    FARE_MINIMUM: float = 0.0  # Lowest fare charged
     
     # FCM Configuration
     # Note: FCM now uses service account credentials (OAuth2) via Firebase Admin SDK
     # No separate FCM_SERVER_KEY needed - uses FIREBASE_CREDENTIALS_PATH
     
+    # Live Driver Location Index (in-process)
+    DRIVER_INDEX_ENABLED: bool = True
+    DRIVER_INDEX_CELL_SIZE_DEG: float = 0.01  # ~1.1km grid cells
+    DRIVER_INDEX_TTL_SECONDS: int = 120  # Drivers silent for longer are treated as unavailable
+    DRIVER_INDEX_RESYNC_SECONDS: int = 60  # Re-read online drivers from Firestore (0 = only seed at startup)
+    
+    # Aggregation Count Cache (paginated history totals)
+    COUNT_CACHE_TTL_SECONDS: int = 30  # 0 disables caching of totals
+    COUNT_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Maps Requests
+    GOOGLE_MAPS_BASE_URL: str = "https://maps.googleapis.com"  # Point at scripts/maps_stub_server.py for tests
+    MAPS_HTTP2: bool = True  # Used when the h2 package is installed
+    MAPS_MAX_CONNECTIONS: int = 20  # Pooled keep-alive connections
+    MAPS_CONNECT_TIMEOUT_SECONDS: float = 2.0  # Read timeouts are set per endpoint
+    MAPS_MAX_RETRIES: int = 2  # Retries on network errors, 429/5xx and OVER_QUERY_LIMIT
+    MAPS_RETRY_BACKOFF_SECONDS: float = 0.2  # First retry backoff, doubled per retry (full jitter)
+    MAPS_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Failed calls in a row before failing fast
+    MAPS_CIRCUIT_RESET_SECONDS: int = 30  # Open circuit duration before a trial call
+    MAPS_MAX_CONCURRENT_REQUESTS: int = 4  # Batched distance_matrix requests in flight per call
+    MAPS_ROAD_FACTOR: float = 1.3  # Road distance / straight-line distance for local estimates
+    MAPS_FALLBACK_SPEED_KMH: float = 30.0  # Off-peak average urban driving speed for local estimates
+    MAPS_UTC_OFFSET_HOURS: int = 2  # Local time for traffic bands (Namibia, UTC+2)
+    
+    # Maps Result Cache (distance matrix)
+    MAPS_CACHE_ENABLED: bool = True
+    MAPS_CACHE_GEOHASH_PRECISION: int = 7  # ~150m cells; trips between the same cells share a result
+    MAPS_CACHE_TIME_BUCKET_HOURS: int = 3  # Travel times are cached per time-of-day band
+    MAPS_CACHE_TTL_SECONDS: int = 86400
+    MAPS_CACHE_MAX_ENTRIES: int = 20000  # In-memory entries
+    MAPS_CACHE_PATH: Optional[str] = None  # SQLite file so cached results survive restarts
+    MAPS_GEOCODE_CACHE_TTL_SECONDS: int = 2592000  # 30 days
+    MAPS_GEOCODE_CACHE_MAX_ENTRIES: int = 20000  # In-memory entries per direction
+    MAPS_GEOCODE_GEOHASH_PRECISION: int = 8  # ~38m x 19m cells share a reverse geocode
+    
+    # Phone Number Index (login lookups)
+    PHONE_INDEX_FALLBACK_QUERY: bool = True  # Query by phone_number when not indexed; disable after backfill_phone_index.py
+    
+    # Document Cache (users, drivers, active driver subscriptions)
+    DOCUMENT_CACHE_ENABLED: bool = True
+    DOCUMENT_CACHE_TTL_SECONDS: int = 60
+    DOCUMENT_CACHE_MAX_ENTRIES: int = 5000  # Local backend only
+    DOCUMENT_CACHE_REDIS_URL: Optional[str] = None  # Shared backend for multi-worker deployments
+    
+    # ID-token Signing Keys (local verification)
+    AUTH_LOCAL_VERIFICATION: bool = True  # Verify signatures with prefetched keys instead of the SDK
+    AUTH_PUBLIC_KEYS_URL: str = "https://www.googleapis.com/service_accounts/v1/jwk/securetoken@system.gserviceaccount.com"
+    AUTH_KEYS_REFRESH_MARGIN_SECONDS: int = 600  # Refresh this long before the fetched keys expire
+    AUTH_KEYS_RETRY_SECONDS: int = 30  # Delay before retrying a failed refresh
+    
+    # Verified ID-token Cache
+    TOKEN_CACHE_ENABLED: bool = True  # False verifies with check_revoked=True on every request
+    TOKEN_CACHE_MAX_ENTRIES: int = 50000
+    TOKEN_REVOCATION_CHECK_INTERVAL_SECONDS: int = 300  # Per-uid revocation check interval (0 checks every request)
+    
+    # Blocking SDK Executors (threads per dependency)
+    AUTH_EXECUTOR_WORKERS: int = 8  # Firebase Auth calls
+    FCM_EXECUTOR_WORKERS: int = 8  # FCM sends
+    DISK_EXECUTOR_WORKERS: int = 2  # Local SQLite cache files
+    EXECUTOR_MAX_QUEUE: int = 200  # Queued calls per executor before rejecting with 503
+    
+    # FCM Fan-out
+    FCM_MAX_CONCURRENT_BATCHES: int = 4  # send_each batches (up to 500 messages) in flight at once
+    FCM_TOKEN_CACHE_TTL_SECONDS: int = 900  # 0 disables the device token cache
+    FCM_TOKEN_CACHE_MAX_ENTRIES: int = 20000
+    FCM_TOKEN_REFRESH_AFTER_SECONDS: int = 300  # Older cached tokens are served and reloaded in the background
+    
+    # Notification Outbox (background delivery with retry)
+    NOTIFICATION_OUTBOX_WORKERS: int = 4
+    NOTIFICATION_OUTBOX_MAX_QUEUE: int = 1000  # Jobs waiting in memory per process
+    NOTIFICATION_OUTBOX_MAX_ATTEMPTS: int = 5
+    NOTIFICATION_OUTBOX_BACKOFF_SECONDS: float = 1.0  # First retry delay, doubled per attempt (with jitter)
+    NOTIFICATION_OUTBOX_MAX_BACKOFF_SECONDS: float = 60.0
+    NOTIFICATION_OUTBOX_PERSIST: bool = True  # Keep jobs in Firestore so they survive restarts
+    NOTIFICATION_OUTBOX_SWEEP_INTERVAL_SECONDS: int = 60
+    NOTIFICATION_OUTBOX_STALE_SECONDS: int = 300  # Pending jobs untouched for longer are re-claimed
+    NOTIFICATION_OUTBOX_DRAIN_TIMEOUT_SECONDS: float = 10.0  # Time to finish queued jobs on shutdown
+    
+    # Notification Throttle (per recipient, per process)
+    NOTIFICATION_RATE_PER_MINUTE: float = 6.0  # Sustained pushes per recipient (0 disables rate limiting)
+    NOTIFICATION_RATE_BURST: int = 5  # Pushes a recipient can receive back to back
+    NOTIFICATION_DEDUPE_WINDOW_SECONDS: int = 60  # Identical ride notifications within this window are dropped
+    NOTIFICATION_RIDE_STATE_TTL_SECONDS: int = 7200  # How long a ride's latest notified state is remembered
+    NOTIFICATION_THROTTLE_MAX_ENTRIES: int = 50000
+    
     # Logging Configuration
     LOG_LEVEL: str = "INFO"  # DEBUG, INFO, WARNING, ERROR, CRITICAL
     
@@ -0,0 +1,264 @@
+"""
+Read-through Document Cache
+
+Caches Firestore documents (users, drivers, active subscriptions) that are read
+repeatedly within one request flow and across requests. Repository write
+methods write through or invalidate, so reads never see their own writes stale.
+
+The default backend is an in-process TTL + LRU cache. Multi-worker deployments
+can share one Redis-compatible backend by setting DOCUMENT_CACHE_REDIS_URL.
+Documents are stored there as JSON, with tagged encodings for the Firestore
+values they hold (timestamps and GeoPoints), so nothing read back from the
+shared store is ever executed.
+"""
+import copy
+import json
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+from firebase_admin import firestore
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import register_metrics
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # Optional dependency, only needed for the shared backend
+    redis_asyncio = None
+
+# Stored in place of a document that is known not to exist
+_ABSENT = {"__absent__": True}
+
+# Returned by backends on a miss
+_MISS = object()
+
+# Tags of the JSON encodings of non-JSON Firestore values
+_DATETIME_TAG = "__datetime__"
+_GEOPOINT_TAG = "__geopoint__"
+
+
+def _encode_value(value: Any) -> Any:
+    """json.dumps default hook: tag Firestore timestamps and GeoPoints"""
+    if isinstance(value, datetime):
+        return {_DATETIME_TAG: value.isoformat()}
+    if isinstance(value, firestore.GeoPoint):
+        return {_GEOPOINT_TAG: [value.latitude, value.longitude]}
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def _decode_object(obj: Dict[str, Any]) -> Any:
+    """json.loads object hook: restore tagged values"""
+    if len(obj) == 1:
+        if _DATETIME_TAG in obj:
+            return datetime.fromisoformat(obj[_DATETIME_TAG])
+        if _GEOPOINT_TAG in obj:
+            latitude, longitude = obj[_GEOPOINT_TAG]
+            return firestore.GeoPoint(latitude, longitude)
+    return obj
+
+
+def _encode_document(document: Dict[str, Any]) -> bytes:
+    """Serialize a cached document for a shared backend"""
+    return json.dumps(document, default=_encode_value, separators=(",", ":")).encode("utf-8")
+
+
+def _decode_document(raw: bytes) -> Dict[str, Any]:
+    """Inverse of _encode_document()"""
+    return json.loads(raw, object_hook=_decode_object)
+
+
+class LocalCacheBackend:
+    """In-process TTL + LRU backend (per worker)"""
+    
+    name = "local"
+    
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._cache = TTLCache("documents", max_entries=max_entries, ttl_seconds=ttl_seconds)
+    
+    async def get(self, key: str) -> Any:
+        value = self._cache.get(key, _MISS)
+        # Copy so callers can mutate returned documents freely
+        return value if value is _MISS else copy.deepcopy(value)
+    
+    async def set(self, key: str, value: Dict[str, Any], ttl_seconds: float) -> None:
+        self._cache.set(key, copy.deepcopy(value), ttl_seconds)
+    
+    async def delete(self, key: str) -> None:
+        self._cache.invalidate(key)
+    
+    async def close(self) -> None:
+        self._cache.clear()
+    
+    def metrics(self) -> Dict[str, Any]:
+        cache_metrics = self._cache.metrics()
+        return {
+            "entries": cache_metrics["entries"],
+            "max_entries": cache_metrics["max_entries"],
+            "evictions": cache_metrics["evictions"],
+        }
+
+
+class RedisCacheBackend:
+    """
+    Shared backend on any client exposing async get/set(ex=)/delete
+    
+    Works with redis.asyncio.Redis. Values are JSON (see _encode_document).
+    """
+    
+    name = "redis"
+    
+    def __init__(self, client: Any, key_prefix: str = "londa:doc:"):
+        self._client = client
+        self._key_prefix = key_prefix
+    
+    async def get(self, key: str) -> Any:
+        raw = await self._client.get(self._key_prefix + key)
+        return _MISS if raw is None else _decode_document(raw)
+    
+    async def set(self, key: str, value: Dict[str, Any], ttl_seconds: float) -> None:
+        await self._client.set(
+            self._key_prefix + key,
+            _encode_document(value),
+            ex=max(1, int(ttl_seconds))
+        )
+    
+    async def delete(self, key: str) -> None:
+        await self._client.delete(self._key_prefix + key)
+    
+    async def close(self) -> None:
+        close = getattr(self._client, "aclose", None) or getattr(self._client, "close", None)
+        if close is not None:
+            await close()
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {}
+
+
+class DocumentCache:
+    """Read-through cache of Firestore documents keyed by '<collection>:<id>'"""
+    
+    def __init__(self, backend: Any, ttl_seconds: float, enabled: bool = True):
+        """
+        Args:
+            backend: LocalCacheBackend or RedisCacheBackend
+            ttl_seconds: Lifetime of cached documents
+            enabled: When False every call goes straight to the loader
+        """
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled and ttl_seconds > 0
+        
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._invalidations = 0
+        self._errors = 0
+    
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+        cache_absent: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get a document from the cache, loading and caching it on a miss
+        
+        Args:
+            key: Cache key
+            loader: Coroutine function reading the document from Firestore
+            cache_absent: Also cache "no document" results
+        
+        Returns:
+            Document dict, or None if it does not exist
+        """
+        if not self.enabled:
+            return await loader()
+        
+        try:
+            cached = await self.backend.get(key)
+        except Exception as e:
+            # The cache must never break reads
+            self._errors += 1
+            logger.warning(f"Document cache get failed for '{key}': {str(e)}")
+            cached = _MISS
+        
+        if cached is not _MISS:
+            self._hits += 1
+            return None if cached == _ABSENT else cached
+        
+        self._misses += 1
+        document = await loader()
+        if document is not None:
+            await self.set(key, document)
+        elif cache_absent:
+            await self.set(key, _ABSENT)
+        return document
+    
+    async def set(self, key: str, document: Dict[str, Any]) -> None:
+        """Write a document through to the cache"""
+        if not self.enabled:
+            return
+        try:
+            await self.backend.set(key, document, self.ttl_seconds)
+            self._writes += 1
+        except Exception as e:
+            self._errors += 1
+            logger.warning(f"Document cache set failed for '{key}': {str(e)}")
+    
+    async def invalidate(self, key: str) -> None:
+        """Drop a cached document after a write whose result is not known locally"""
+        if not self.enabled:
+            return
+        try:
+            await self.backend.delete(key)
+            self._invalidations += 1
+        except Exception as e:
+            self._errors += 1
+            logger.warning(f"Document cache invalidation failed for '{key}': {str(e)}")
+    
+    async def close(self) -> None:
+        """Release backend resources"""
+        try:
+            await self.backend.close()
+        except Exception as e:
+            logger.warning(f"Failed to close document cache backend: {str(e)}")
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of hit/miss counters"""
+        lookups = self._hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend.name,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "writes": self._writes,
+            "invalidations": self._invalidations,
+            "errors": self._errors,
+            **{f"backend_{name}": value for name, value in self.backend.metrics().items()},
+        }
+
+
+def _create_backend() -> Any:
+    """Backend selected by settings (Redis if configured and installed, else local)"""
+    if settings.DOCUMENT_CACHE_REDIS_URL:
+        if redis_asyncio is None:
+            logger.warning("DOCUMENT_CACHE_REDIS_URL is set but 'redis' is not installed; using local cache")
+        else:
+            client = redis_asyncio.from_url(settings.DOCUMENT_CACHE_REDIS_URL)
+            return RedisCacheBackend(client)
+    
+    return LocalCacheBackend(
+        max_entries=settings.DOCUMENT_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.DOCUMENT_CACHE_TTL_SECONDS
+    )
+
+
+# Global document cache instance
+document_cache = DocumentCache(
+    backend=_create_backend(),
+    ttl_seconds=settings.DOCUMENT_CACHE_TTL_SECONDS,
+    enabled=settings.DOCUMENT_CACHE_ENABLED
+)
+register_metrics("document_cache", document_cache.metrics)
@@ -49,6 +49,12 @@ class ConflictError(AppException):
         super().__init__(message, status_code=409, error_code=error_code)
 
 
+class ServiceUnavailableError(AppException):
+    """Service unavailable exception (e.g., upstream dependency saturated)"""
+    def __init__(self, message: str = "Service unavailable", error_code: str = "SERVICE_UNAVAILABLE"):
+        super().__init__(message, status_code=503, error_code=error_code)
+
+
 def create_error_response(
     message: str,
     error_code: str,
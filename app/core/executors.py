@@ -0,0 +1,160 @@
+"""
+Bounded Thread-Pool Executors for Blocking SDK Calls
+
+Firebase Auth and FCM SDK calls are synchronous network calls.
+Each dependency gets its own sized thread pool so a slow upstream API can only
+exhaust its own capacity, never the event loop or the other dependencies.
+Local SQLite cache files get a small "disk" pool of their own. (Google Maps
+calls are async, see app/maps/client.py.)
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+from app.core.config import settings
+from app.core.exceptions import ServiceUnavailableError
+from app.core.logging import logger
+from app.core.metrics import register_metrics
+
+T = TypeVar("T")
+
+
+class BoundedExecutor:
+    """Thread pool with a bounded wait queue and saturation metrics"""
+    
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"londa-{name}"
+        )
+        self._lock = threading.Lock()
+        
+        # Counters (guarded by _lock, updated from worker threads)
+        self._queued = 0
+        self._active = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+    
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run a blocking callable on this pool and await its result
+        
+        Raises:
+            ServiceUnavailableError: If the wait queue is full
+        """
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._rejected += 1
+                logger.warning(f"Executor '{self.name}' saturated: {self._queued} calls queued")
+                raise ServiceUnavailableError(f"{self.name} service is busy, please retry")
+            self._queued += 1
+            self._submitted += 1
+        
+        submitted_at = time.monotonic()
+        
+        def _call() -> T:
+            wait_seconds = time.monotonic() - submitted_at
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._total_wait_seconds += wait_seconds
+                self._max_wait_seconds = max(self._max_wait_seconds, wait_seconds)
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self._failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+        
+        future: Future = self._executor.submit(_call)
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+    
+    def _on_done(self, future: Future) -> None:
+        """Release the queue slot of calls cancelled before they started"""
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of queue depth, saturation and wait times"""
+        with self._lock:
+            started = self._completed + self._active
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._queued,
+                "active": self._active,
+                "saturation": round(self._active / self.max_workers, 3) if self.max_workers else 0.0,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._total_wait_seconds / started * 1000, 3) if started else 0.0,
+                "max_wait_ms": round(self._max_wait_seconds * 1000, 3),
+            }
+    
+    def shutdown(self) -> None:
+        """Stop accepting work and release worker threads"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Executors keyed by dependency name
+_executors: Dict[str, BoundedExecutor] = {}
+
+
+def _create_executors() -> None:
+    """Create one executor per blocking dependency"""
+    sizes = {
+        "auth": settings.AUTH_EXECUTOR_WORKERS,
+        "fcm": settings.FCM_EXECUTOR_WORKERS,
+        "disk": settings.DISK_EXECUTOR_WORKERS,
+    }
+    for name, workers in sizes.items():
+        _executors[name] = BoundedExecutor(name, workers, settings.EXECUTOR_MAX_QUEUE)
+
+
+def get_executor(name: str) -> BoundedExecutor:
+    """Get the executor for a dependency (auth, fcm, disk)"""
+    try:
+        return _executors[name]
+    except KeyError:
+        raise ValueError(f"Unknown executor: {name}")
+
+
+async def run_blocking(name: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Offload a blocking SDK call to the executor of its dependency
+    
+    Args:
+        name: Executor name (auth, fcm, disk)
+        func: Blocking callable
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+    
+    Returns:
+        The callable's return value
+    """
+    return await get_executor(name).run(func, *args, **kwargs)
+
+
+def shutdown_executors() -> None:
+    """Shut down all executors (called on application shutdown)"""
+    for executor in _executors.values():
+        executor.shutdown()
+
+
+_create_executors()
+register_metrics("executors", lambda: {name: ex.metrics() for name, ex in _executors.items()})
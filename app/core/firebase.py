@@ -3,9 +3,10 @@ Firebase Admin SDK Initialization
 """
 import os
 import json
+import threading
 from typing import Optional, Dict, Any
 import firebase_admin
-from firebase_admin import credentials, firestore, auth
+from firebase_admin import credentials, firestore, firestore_async, auth
 from app.core.config import settings
 from app.core.logging import logger
 
@@ -13,6 +14,9 @@ from app.core.logging import logger
 # Global Firebase app instance
 _firebase_app: Optional[firebase_admin.App] = None
 _db: Optional[firestore.Client] = None
+_async_db: Optional[firestore_async.AsyncClient] = None
+_auth_client: Optional[auth.Client] = None
+_auth_client_lock = threading.Lock()
 
 
 def initialize_firebase() -> None:
@@ -89,17 +93,54 @@ def get_firestore() -> firestore.Client:
     return _db
 
 
+def get_async_firestore() -> firestore_async.AsyncClient:
+    """
+    Get async Firestore client instance
+    
+    Repositories use this client so Firestore round trips are awaited instead of
+    blocking the event loop. The gRPC channel is opened lazily on first use, so it
+    is safe to call this while services are constructed at import time.
+    The sync client from get_firestore() remains available for scripts.
+    """
+    global _async_db, _firebase_app
+    
+    if _async_db is None:
+        if _firebase_app is None:
+            initialize_firebase()
+        
+        if _firebase_app is None:
+            raise RuntimeError("Async Firestore client not initialized. Firebase app not available.")
+        
+        _async_db = firestore_async.client(_firebase_app)
+        logger.info("Async Firestore client initialized")
+    
+    return _async_db
+
+
 def get_firebase_auth() -> auth.Client:
-    """Get Firebase Auth client instance"""
-    global _firebase_app
+    """
+    Get the Firebase Auth client instance
     
-    if _firebase_app is None:
-        initialize_firebase()
+    Created once per process on first use (thread-safe), so its HTTP session
+    and token verifiers are reused across requests.
+    """
+    global _auth_client, _firebase_app
     
-    if _firebase_app is None:
-        raise RuntimeError("Firebase app not initialized")
+    if _auth_client is not None:
+        return _auth_client
+    
+    with _auth_client_lock:
+        if _auth_client is None:
+            if _firebase_app is None:
+                initialize_firebase()
+            
+            if _firebase_app is None:
+                raise RuntimeError("Firebase app not initialized")
+            
+            _auth_client = auth.Client(_firebase_app)
+            logger.info("Firebase Auth client initialized")
     
-    return auth.Client(_firebase_app)
+    return _auth_client
 
 
 def get_firebase_app() -> firebase_admin.App:
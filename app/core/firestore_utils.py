@@ -0,0 +1,246 @@
+"""
+Firestore Query Helpers
+
+Server-side aggregation counts with an optional short-lived per-owner cache,
+keyset (cursor) pagination over createdAt, local merging of written fields and
+batched multi-document reads, so paginated history endpoints neither stream
+every matching document to compute a total nor pay for skipped documents when
+paging deep, write paths don't read a document back just to return it, and N
+lookups by ID cost one round trip instead of N.
+"""
+import asyncio
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from firebase_admin import firestore
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.exceptions import ValidationError
+from app.core.metrics import register_metrics
+
+# Document references per batched get_all request
+GET_ALL_BATCH_SIZE = 100
+
+# Cached totals keyed by "<collection>:<field>:<value>"
+count_cache = TTLCache(
+    name="firestore_counts",
+    max_entries=settings.COUNT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.COUNT_CACHE_TTL_SECONDS
+)
+register_metrics("count_cache", count_cache.metrics)
+
+
+def count_cache_key(collection: str, field: str, value: Any) -> str:
+    """Cache key for the number of documents in a collection where field == value"""
+    return f"{collection}:{field}:{value}"
+
+
+async def count_documents(query: Any) -> int:
+    """
+    Count documents matching a query with a server-side aggregation
+    
+    Billed as one read per 1000 index entries instead of one read per document.
+    
+    Args:
+        query: Async Firestore query holding the filters to count
+    
+    Returns:
+        Number of matching documents
+    """
+    results = await query.count(alias="total").get()
+    return int(results[0][0].value)
+
+
+async def cached_count(cache_key: str, query: Any) -> int:
+    """
+    Count documents matching a query, reusing a recent total for the same key
+    
+    Args:
+        cache_key: Key from count_cache_key()
+        query: Async Firestore query
+    
+    Returns:
+        Number of matching documents (at most COUNT_CACHE_TTL_SECONDS stale)
+    """
+    total = count_cache.get(cache_key)
+    if total is not None:
+        return total
+    
+    total = await count_documents(query)
+    count_cache.set(cache_key, total)
+    return total
+
+
+def invalidate_count(cache_key: str) -> None:
+    """Drop a cached total after a document was added to or removed from its set"""
+    count_cache.invalidate(cache_key)
+
+
+def encode_cursor(snapshot: Any) -> str:
+    """
+    Build an opaque pagination cursor pointing at a document
+    
+    Args:
+        snapshot: Document snapshot of the last item on a page
+    
+    Returns:
+        URL-safe cursor string
+    """
+    created_at = snapshot.get("createdAt")
+    payload = {
+        "t": created_at.isoformat() if isinstance(created_at, datetime) else None,
+        "id": snapshot.id
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Decode a cursor built by encode_cursor()
+    
+    Returns:
+        Tuple of (createdAt, document ID)
+    
+    Raises:
+        ValidationError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["t"]), str(payload["id"])
+    except (binascii.Error, ValueError, TypeError, KeyError, UnicodeError):
+        raise ValidationError("Invalid pagination cursor")
+
+
+async def fetch_page(
+    query: Any,
+    collection_ref: Any,
+    page: int,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Fetch one page of a query ordered by createdAt (newest first)
+    
+    With a cursor the page starts right after the cursor's document, so every
+    page costs the same reads as the first one. Without a cursor the page
+    number is applied as an offset for backwards compatibility.
+    
+    Ties on createdAt are broken by document ID, which the composite
+    (owner ASC, createdAt DESC) indexes already include.
+    
+    Args:
+        query: Async Firestore query holding the owner filter
+        collection_ref: Collection the query runs on (to resolve cursor document IDs)
+        page: Page number (1-based), ignored when a cursor is given
+        limit: Page size
+        cursor: Cursor from a previous page's nextCursor
+    
+    Returns:
+        Tuple of (document snapshots, nextCursor or None on the last page)
+    """
+    query = (
+        query
+        .order_by("createdAt", direction=firestore.Query.DESCENDING)
+        .order_by("__name__", direction=firestore.Query.DESCENDING)
+    )
+    
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        query = query.start_after([created_at, collection_ref.document(doc_id)])
+    elif page > 1:
+        query = query.offset((page - 1) * limit)
+    
+    # One extra document tells whether another page exists
+    docs = [doc async for doc in query.limit(limit + 1).stream()]
+    if len(docs) <= limit:
+        return docs, None
+    
+    docs = docs[:limit]
+    return docs, encode_cursor(docs[-1])
+
+
+def _resolve_value(value: Any, write_time: datetime) -> Any:
+    """Resolve a written value to what Firestore would return on read"""
+    if value is firestore.SERVER_TIMESTAMP:
+        return write_time
+    if isinstance(value, datetime) and value.tzinfo is None:
+        # Firestore stores naive datetimes as UTC and returns them timezone-aware
+        return value.replace(tzinfo=timezone.utc)
+    if isinstance(value, dict):
+        return {key: _resolve_value(item, write_time) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_resolve_value(item, write_time) for item in value]
+    return value
+
+
+def merge_written(
+    data: Dict[str, Any],
+    write_time: Optional[datetime],
+    current: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Build the stored document after a write without reading it back
+    
+    Only plain values and SERVER_TIMESTAMP are resolved; writes using other
+    transforms (Increment, ArrayUnion, ...) must read the document instead.
+    
+    Args:
+        data: Fields passed to set() or update() (top-level keys only)
+        write_time: WriteResult.update_time of the write (commit time)
+        current: Document before an update(), or None for set()/create()
+    
+    Returns:
+        Document as a subsequent get() would return it
+    """
+    if write_time is None:
+        write_time = datetime.now(timezone.utc)
+    
+    merged = dict(current) if current else {}
+    for key, value in data.items():
+        merged[key] = _resolve_value(value, write_time)
+    return merged
+
+
+def unique_ids(ids: List[str]) -> List[str]:
+    """De-duplicate IDs preserving first-seen order, dropping empty values"""
+    return list(dict.fromkeys(doc_id for doc_id in ids if doc_id))
+
+
+async def get_documents(db: Any, collection_ref: Any, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch documents by ID with batched get_all requests
+    
+    Args:
+        db: Async Firestore client
+        collection_ref: Collection holding the documents
+        ids: Document IDs (duplicates and empty values are ignored)
+    
+    Returns:
+        Dict mapping document ID to document data, for existing documents only
+    """
+    doc_ids = unique_ids(ids)
+    if not doc_ids:
+        return {}
+    
+    async def fetch_batch(batch_ids: List[str]) -> List[Any]:
+        refs = [collection_ref.document(doc_id) for doc_id in batch_ids]
+        return [snapshot async for snapshot in db.get_all(refs)]
+    
+    batches = await asyncio.gather(*[
+        fetch_batch(doc_ids[i:i + GET_ALL_BATCH_SIZE])
+        for i in range(0, len(doc_ids), GET_ALL_BATCH_SIZE)
+    ])
+    
+    documents: Dict[str, Dict[str, Any]] = {}
+    for snapshots in batches:
+        for snapshot in snapshots:
+            if snapshot.exists:
+                data = snapshot.to_dict() or {}
+                # Ensure "id" field is set from document ID
+                data.setdefault("id", snapshot.id)
+                documents[snapshot.id] = data
+    return documents
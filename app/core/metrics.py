@@ -0,0 +1,36 @@
+"""
+In-process Metrics Registry
+
+Components (executors, caches, queues) register a provider callable that returns
+a snapshot of their counters. The snapshots are exposed through the health API.
+"""
+from typing import Any, Callable, Dict
+from app.core.logging import logger
+
+# Metric providers keyed by component name
+_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register_metrics(name: str, provider: Callable[[], Dict[str, Any]]) -> None:
+    """
+    Register a metrics provider
+    
+    Args:
+        name: Component name used as the key in the metrics snapshot
+        provider: Callable returning a JSON-serializable dict of counters
+    """
+    _providers[name] = provider
+
+
+def collect_metrics() -> Dict[str, Any]:
+    """Collect a snapshot from every registered metrics provider"""
+    snapshot: Dict[str, Any] = {}
+    
+    for name, provider in sorted(_providers.items()):
+        try:
+            snapshot[name] = provider()
+        except Exception as e:
+            logger.warning(f"Failed to collect metrics for '{name}': {str(e)}")
+            snapshot[name] = {"error": str(e)}
+    
+    return snapshot
@@ -0,0 +1,177 @@
+"""
+Phone Number Index
+
+phone_index/{e164} documents map a phone number to the user and driver
+documents registered with it ({"userId", "driverId", "updatedAt"}), so a login
+resolves its account with one direct document get (served from the document
+cache when warm) instead of a where("phone_number", "==", ...) query.
+
+Entries are written in the same batch as the user/driver document they point
+to (in a transaction when a phone number changes, see update_with_entry). Lookups missing from the index fall back to the query while
+PHONE_INDEX_FALLBACK_QUERY is on and repair the entry; turn it off once
+scripts/backfill_phone_index.py has indexed existing accounts.
+"""
+from typing import Any, Callable, Dict, Optional
+from firebase_admin import firestore, firestore_async
+from app.core.document_cache import document_cache
+from app.core.firestore_utils import merge_written
+from app.core.logging import logger
+
+PHONE_INDEX_COLLECTION = "phone_index"
+
+# Index fields per collection
+USER_FIELD = "userId"
+DRIVER_FIELD = "driverId"
+
+
+def _cache_key(phone_number: str) -> str:
+    """Document cache key for an index entry"""
+    return f"{PHONE_INDEX_COLLECTION}:{phone_number}"
+
+
+def index_ref(db: Any, phone_number: str) -> Any:
+    """Reference of the index document for an E.164 phone number"""
+    return db.collection(PHONE_INDEX_COLLECTION).document(phone_number)
+
+
+def add_to_batch(batch: Any, db: Any, phone_number: str, field: str, doc_id: str) -> None:
+    """Point the phone number's entry at a document, within a write batch or transaction"""
+    batch.set(
+        index_ref(db, phone_number),
+        {field: doc_id, "updatedAt": firestore.SERVER_TIMESTAMP},
+        merge=True
+    )
+
+
+def remove_from_batch(batch: Any, db: Any, phone_number: str, field: str) -> None:
+    """Clear the phone number's entry for one collection, within a write batch or transaction"""
+    batch.set(
+        index_ref(db, phone_number),
+        {field: firestore.DELETE_FIELD, "updatedAt": firestore.SERVER_TIMESTAMP},
+        merge=True
+    )
+
+
+async def commit_with_entry(
+    db: Any,
+    write: Callable[[Any], None],
+    field: str,
+    doc_id: str,
+    phone_number: str,
+    previous_phone_number: Optional[str] = None
+) -> Any:
+    """
+    Commit a document write together with its index entry in one atomic batch
+    
+    Args:
+        db: Async Firestore client
+        write: Adds the document write to the batch (e.g. lambda batch: batch.create(ref, data))
+        field: USER_FIELD or DRIVER_FIELD
+        doc_id: ID of the written document
+        phone_number: Phone number the document is registered with
+        previous_phone_number: Former phone number whose entry is cleared, if it changed
+    
+    Returns:
+        WriteResult of the document write
+    """
+    batch = db.batch()
+    write(batch)
+    if previous_phone_number and previous_phone_number != phone_number:
+        remove_from_batch(batch, db, previous_phone_number, field)
+    add_to_batch(batch, db, phone_number, field, doc_id)
+    
+    write_results = await batch.commit()
+    for number in {phone_number, previous_phone_number}:
+        if number:
+            await invalidate(number)
+    return write_results[0]
+
+
+async def update_with_entry(
+    db: Any,
+    doc_ref: Any,
+    updates: Dict[str, Any],
+    field: str,
+    doc_id: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Change a document's phone number and move its index entry in one transaction
+    
+    The former phone number is read inside the transaction rather than taken
+    from a cached or earlier read, so a concurrent change cannot leave a stale
+    entry pointing at the document.
+    
+    Args:
+        db: Async Firestore client
+        doc_ref: Reference of the user/driver document
+        updates: Fields passed to update(), including "phone_number"
+        field: USER_FIELD or DRIVER_FIELD
+        doc_id: ID of the updated document
+    
+    Returns:
+        Updated document, or None if it does not exist
+    """
+    phone_number = updates["phone_number"]
+    
+    @firestore_async.async_transactional
+    async def update_in_transaction(transaction):
+        doc = await doc_ref.get(transaction=transaction)
+        if not doc.exists:
+            return None
+        
+        current = doc.to_dict()
+        previous_phone_number = current.get("phone_number")
+        transaction.update(doc_ref, updates)
+        if previous_phone_number and previous_phone_number != phone_number:
+            remove_from_batch(transaction, db, previous_phone_number, field)
+        add_to_batch(transaction, db, phone_number, field, doc_id)
+        return current
+    
+    current = await update_in_transaction(db.transaction())
+    if current is None:
+        return None
+    
+    for number in {phone_number, current.get("phone_number")}:
+        if number:
+            await invalidate(number)
+    
+    # The commit time is not exposed by transactional functions,
+    # so updatedAt resolves to the local clock
+    return merge_written(updates, None, current=current)
+
+
+async def invalidate(phone_number: str) -> None:
+    """Drop the cached entry after a write to it"""
+    await document_cache.invalidate(_cache_key(phone_number))
+
+
+async def lookup(db: Any, phone_number: str, field: str) -> Optional[str]:
+    """
+    ID of the document registered with a phone number
+    
+    Args:
+        db: Async Firestore client
+        phone_number: E.164 phone number
+        field: USER_FIELD or DRIVER_FIELD
+    
+    Returns:
+        Document ID, or None if the phone number is not indexed for the collection
+    """
+    async def load() -> Optional[dict]:
+        doc = await index_ref(db, phone_number).get()
+        return doc.to_dict() if doc.exists else None
+    
+    entry = await document_cache.get_or_load(_cache_key(phone_number), load)
+    return entry.get(field) if entry else None
+
+
+async def repair(db: Any, phone_number: str, field: str, doc_id: str) -> None:
+    """Write a missing or stale entry found through the fallback query"""
+    try:
+        batch = db.batch()
+        add_to_batch(batch, db, phone_number, field, doc_id)
+        await batch.commit()
+        await invalidate(phone_number)
+    except Exception as e:
+        # The next login repeats the fallback query
+        logger.warning(f"Failed to repair phone index entry: {str(e)}")
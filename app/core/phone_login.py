@@ -0,0 +1,134 @@
+"""
+Phone Login Pipeline
+
+Auth-side steps of an OTP login shared by users and drivers, arranged so
+independent remote calls run concurrently:
+
+1. find_auth_user() runs alongside the Firestore phone lookup
+2. ensure_auth_user() only calls Auth when the lookup did not already
+   resolve the account (new phone number or mismatched uid)
+3. issue_token() signs the custom token while custom claims are written,
+   and skips the claims write when the stored claims already match
+
+A returning user costs one concurrent round of lookups; a new user costs the
+lookups, create_user, then one concurrent round of claims and document writes.
+"""
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+from firebase_admin import auth as firebase_auth
+from app.core.auth_client import auth_client
+from app.core.logging import logger
+from app.core.metrics import register_metrics
+
+_counters = {
+    "logins": 0,
+    "auth_users_created": 0,
+    "claims_set": 0,
+    "claims_skipped": 0,
+}
+
+
+async def find_auth_user(phone_number: str) -> Optional[firebase_auth.UserRecord]:
+    """Auth user registered with a phone number, or None"""
+    try:
+        return await auth_client.get_user_by_phone_number(phone_number)
+    except firebase_auth.UserNotFoundError:
+        return None
+    except Exception as e:
+        # The uid from Firestore (or create_user) still resolves the account
+        logger.warning(f"Auth lookup by phone failed: {str(e)}")
+        return None
+
+
+async def ensure_auth_user(
+    phone_number: str,
+    user_id: Optional[str],
+    auth_record: Optional[firebase_auth.UserRecord],
+    custom_claims: Dict[str, Any]
+) -> Tuple[str, Optional[firebase_auth.UserRecord]]:
+    """
+    Resolve the Auth account for a login, creating it if missing
+    
+    Args:
+        phone_number: E.164 phone number
+        user_id: Document ID found in Firestore for the phone number, if any
+        auth_record: Result of find_auth_user()
+        custom_claims: Claims of the role logging in (e.g. {"user_type": "driver"})
+    
+    Returns:
+        Tuple of (uid, Auth user record or None if it could not be loaded)
+    """
+    _counters["logins"] += 1
+    
+    if user_id is None:
+        # Only adopt an Auth user without a role or of this role. An account of
+        # the other role keeps failing create_user (phone number already exists).
+        if auth_record is not None and (auth_record.custom_claims or {}) in ({}, custom_claims):
+            return auth_record.uid, auth_record
+        
+        user_record = await auth_client.create_user(phone_number=phone_number)
+        _counters["auth_users_created"] += 1
+        logger.info(f"Created new Firebase Auth user: {user_record.uid}")
+        return user_record.uid, user_record
+    
+    if auth_record is not None and auth_record.uid == user_id:
+        return user_id, auth_record
+    
+    # Firestore and Auth disagree on the phone number: the Firestore ID wins
+    try:
+        return user_id, await auth_client.get_user(user_id)
+    except firebase_auth.UserNotFoundError:
+        logger.info(f"User {user_id} exists in Firestore but not in Auth, creating Auth user")
+    
+    try:
+        user_record = await auth_client.create_user(uid=user_id, phone_number=phone_number)
+        _counters["auth_users_created"] += 1
+        return user_id, user_record
+    except firebase_auth.UidAlreadyExistsError:
+        logger.info(f"User {user_id} was created concurrently")
+    except Exception as e:
+        # Continue anyway - the Firestore ID still identifies the account
+        logger.error(f"Error creating Firebase Auth user: {str(e)}")
+    return user_id, None
+
+
+async def issue_token(
+    user_id: str,
+    custom_claims: Dict[str, Any],
+    auth_record: Optional[firebase_auth.UserRecord]
+) -> str:
+    """
+    Custom token for a login, with the custom claims stored on the Auth user
+    
+    Args:
+        user_id: Auth uid
+        custom_claims: Claims for RBAC (e.g. {"user_type": "driver"})
+        auth_record: Current Auth user record; its claims decide whether a write is needed
+    
+    Returns:
+        Custom token string
+    """
+    async def set_claims() -> None:
+        if auth_record is not None and (auth_record.custom_claims or {}) == custom_claims:
+            _counters["claims_skipped"] += 1
+            return
+        try:
+            await auth_client.set_custom_user_claims(user_id, custom_claims)
+            _counters["claims_set"] += 1
+            logger.info(f"Set custom claims for {user_id}: {custom_claims}")
+        except Exception as e:
+            # Continue - custom token will still work
+            logger.warning(f"Could not set custom claims: {str(e)}")
+    
+    custom_token, _ = await asyncio.gather(
+        auth_client.create_custom_token(user_id, custom_claims),
+        set_claims()
+    )
+    
+    # Ensure custom_token is a string (not bytes)
+    if isinstance(custom_token, bytes):
+        return custom_token.decode("utf-8")
+    return str(custom_token)
+
+
+register_metrics("phone_login", lambda: dict(_counters))
@@ -7,19 +7,233 @@ Following Firebase and industry best practices:
 - Never expose service account keys
 - Log without exposing secrets
 """
+import asyncio
+import re
+import time
 from typing import Optional, Dict, Any
+import httpx
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from firebase_admin import auth as firebase_auth
-from app.core.firebase import get_firebase_auth
+from jose import jwt, ExpiredSignatureError, JWTError
 from app.core.config import settings
 from app.core.logging import logger
-from app.core.exceptions import UnauthorizedError
+from app.core.exceptions import UnauthorizedError, ServiceUnavailableError
+from app.core.auth_client import auth_client
+from app.core.metrics import register_metrics
+from app.core.token_cache import token_cache
 
 # HTTP Bearer token scheme
 security = HTTPBearer(auto_error=False)
 
 
+class PublicKeyStore:
+    """
+    Google's ID-token signing keys (JWKS), fetched ahead of time
+    
+    Keys are loaded at startup and refreshed in the background
+    AUTH_KEYS_REFRESH_MARGIN_SECONDS before the Cache-Control max-age of the
+    last fetch runs out, so signatures are verified locally (RS256, python-jose)
+    without a network fetch on the request path. On a failed refresh the
+    current keys stay in use and the fetch is retried.
+    """
+    
+    def __init__(self, url: str, project_id: str, refresh_margin_seconds: float, retry_seconds: float):
+        """
+        Args:
+            url: JWKS endpoint of the securetoken service account
+            project_id: Firebase project ID (expected aud and issuer suffix)
+            refresh_margin_seconds: Refresh this long before the keys expire
+            retry_seconds: Delay before retrying a failed refresh
+        """
+        self.url = url
+        self.project_id = project_id
+        self.issuer = f"https://securetoken.google.com/{project_id}"
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.retry_seconds = retry_seconds
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._expires_at = 0.0
+        self._last_attempt_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._kid_refresh: Optional[asyncio.Task] = None
+        
+        self._refreshes = 0
+        self._refresh_failures = 0
+        self._unknown_kids = 0
+        self._verified = 0
+    
+    @property
+    def ready(self) -> bool:
+        """Whether keys are loaded"""
+        return bool(self._keys)
+    
+    async def start(self) -> None:
+        """Load the keys (startup warmup) and start the background refresh"""
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Failed to load ID-token signing keys: {str(e)}")
+        self._task = asyncio.create_task(self._refresh_loop())
+    
+    async def stop(self) -> None:
+        """Stop the background refresh"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def refresh(self) -> None:
+        """Fetch the current keys"""
+        async with self._refresh_lock:
+            await self._fetch()
+    
+    async def _fetch(self) -> None:
+        """Fetch the keys (caller holds _refresh_lock)"""
+        # Recorded up front, so failed fetches also count against the retry interval
+        self._last_attempt_at = time.monotonic()
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+        
+        keys = {key["kid"]: key for key in response.json()["keys"]}
+        if not keys:
+            raise ValueError("JWKS response contained no keys")
+        
+        match = re.search(r"max-age=(\d+)", response.headers.get("cache-control", ""))
+        max_age = int(match.group(1)) if match else 3600
+        
+        self._keys = keys
+        self._expires_at = time.time() + max_age
+        self._refreshes += 1
+        logger.info(f"Loaded {len(keys)} ID-token signing keys, valid for {max_age}s")
+    
+    async def _refresh_for_kid(self, kid: str) -> None:
+        """
+        Refetch the keys for a token signed with an unknown key ID
+        
+        Concurrent callers share one in-flight fetch, and at most one fetch is
+        attempted per retry interval, so a burst of tokens with a bogus kid
+        cannot put a key fetch on every request.
+        """
+        if self._kid_refresh is None or self._kid_refresh.done():
+            if time.monotonic() - self._last_attempt_at < self.retry_seconds:
+                return
+            self._kid_refresh = asyncio.create_task(self._refresh_unknown_kid(kid))
+        
+        # Shielded: a cancelled request must not cancel the fetch other requests await
+        await asyncio.shield(self._kid_refresh)
+    
+    async def _refresh_unknown_kid(self, kid: str) -> None:
+        async with self._refresh_lock:
+            # A refresh that held the lock may already have loaded the key or just been attempted
+            if kid in self._keys or time.monotonic() - self._last_attempt_at < self.retry_seconds:
+                return
+            try:
+                await self._fetch()
+            except Exception as e:
+                self._refresh_failures += 1
+                logger.error(f"Failed to refresh ID-token signing keys: {str(e)}")
+    
+    async def _refresh_loop(self) -> None:
+        while True:
+            delay = self._expires_at - time.time() - self.refresh_margin_seconds
+            await asyncio.sleep(max(self.retry_seconds, delay))
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._refresh_failures += 1
+                logger.error(f"Failed to refresh ID-token signing keys: {str(e)}")
+    
+    async def verify_id_token(self, token: str) -> Dict[str, Any]:
+        """
+        Verify a Firebase ID token locally (signature, exp, aud, iss, sub)
+        
+        Applies the same checks as firebase_admin's verify_id_token and returns
+        the claims with "uid" set, but never blocks on a key fetch unless the
+        token is signed with a key newer than the loaded ones.
+        
+        Raises:
+            firebase_auth.ExpiredIdTokenError: If the token has expired
+            firebase_auth.InvalidIdTokenError: If the token is invalid
+        """
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError as e:
+            raise firebase_auth.InvalidIdTokenError(f"Malformed ID token: {str(e)}")
+        
+        if header.get("alg") != "RS256":
+            raise firebase_auth.InvalidIdTokenError("ID token has incorrect algorithm")
+        
+        kid = header.get("kid")
+        key = self._keys.get(kid)
+        if key is None:
+            # Keys rotated ahead of the schedule: refetch, at most once per retry interval
+            self._unknown_kids += 1
+            await self._refresh_for_kid(kid)
+            key = self._keys.get(kid)
+            if key is None:
+                raise firebase_auth.InvalidIdTokenError("ID token has an unknown key ID")
+        
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=["RS256"],
+                audience=self.project_id,
+                issuer=self.issuer,
+                options={"verify_at_hash": False}
+            )
+        except ExpiredSignatureError as e:
+            raise firebase_auth.ExpiredIdTokenError("Token expired", e)
+        except JWTError as e:
+            raise firebase_auth.InvalidIdTokenError(f"Invalid ID token: {str(e)}")
+        
+        now = time.time()
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise firebase_auth.InvalidIdTokenError("ID token has an invalid subject")
+        if claims.get("iat", 0) > now or claims.get("auth_time", 0) > now:
+            raise firebase_auth.InvalidIdTokenError("ID token issued in the future")
+        
+        self._verified += 1
+        claims["uid"] = subject
+        return claims
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of loaded keys and refresh counters"""
+        return {
+            "keys": len(self._keys),
+            "expires_in_seconds": max(0, int(self._expires_at - time.time())),
+            "refreshes": self._refreshes,
+            "refresh_failures": self._refresh_failures,
+            "unknown_kids": self._unknown_kids,
+            "verified": self._verified,
+        }
+
+
+# Global ID-token signing key store (started in the application lifespan)
+public_key_store = PublicKeyStore(
+    url=settings.AUTH_PUBLIC_KEYS_URL,
+    project_id=settings.FIREBASE_PROJECT_ID,
+    refresh_margin_seconds=settings.AUTH_KEYS_REFRESH_MARGIN_SECONDS,
+    retry_seconds=settings.AUTH_KEYS_RETRY_SECONDS
+)
+register_metrics("auth_keys", public_key_store.metrics)
+
+
+async def _verify_id_token(token: str) -> Dict[str, Any]:
+    """Signature check: local when keys are loaded, otherwise through the Firebase SDK"""
+    if settings.AUTH_LOCAL_VERIFICATION and public_key_store.ready:
+        return await public_key_store.verify_id_token(token)
+    return await auth_client.verify_id_token(token)
+
+
 async def verify_firebase_token(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ) -> Dict[str, Any]:
@@ -46,11 +260,10 @@ async def verify_firebase_token(
     if not token:
         raise UnauthorizedError("Authentication token required")
     
-    auth_client = get_firebase_auth()
-    
     # Primary: Verify as ID token (production flow - Firebase best practice)
+    # Verified claims are cached until exp; revocation is re-checked per uid on an interval
     try:
-        decoded_token = auth_client.verify_id_token(token, check_revoked=True)
+        decoded_token = await token_cache.verify(token, _verify_id_token)
         user_id = decoded_token.get('uid')
         
         # Extract custom claims for RBAC
@@ -71,27 +284,29 @@ async def verify_firebase_token(
     except firebase_auth.ExpiredIdTokenError:
         logger.warning("Expired Firebase ID token")
         raise UnauthorizedError("Authentication token has expired")
+    except firebase_auth.RevokedIdTokenError:
+        logger.warning("Revoked Firebase ID token")
+        raise UnauthorizedError("Authentication token has been revoked")
+    except firebase_auth.UserDisabledError:
+        logger.warning("Firebase ID token of a disabled user")
+        raise UnauthorizedError("User account has been disabled")
     except firebase_auth.InvalidIdTokenError:
         # Fallback: Try custom token (development/testing only)
         # In production, this should not be used
         if settings.DEBUG:
             logger.warning("ID token verification failed, attempting custom token decode (development mode)")
-            return await _decode_custom_token_for_development(token, auth_client)
+            return await _decode_custom_token_for_development(token)
         else:
             logger.error("Invalid ID token in production mode")
             raise UnauthorizedError("Invalid authentication token")
-    except firebase_auth.RevokedIdTokenError:
-        logger.warning("Revoked Firebase ID token")
-        raise UnauthorizedError("Authentication token has been revoked")
+    except (UnauthorizedError, ServiceUnavailableError):
+        raise
     except Exception as e:
         logger.error(f"Token verification error: {str(e)}")
         raise UnauthorizedError("Authentication failed")
 
 
-async def _decode_custom_token_for_development(
-    token: str,
-    auth_client: firebase_auth.Client
-) -> Dict[str, Any]:
+async def _decode_custom_token_for_development(token: str) -> Dict[str, Any]:
     """
     Decode custom token for development/testing purposes only
     
@@ -101,7 +316,6 @@ async def _decode_custom_token_for_development(
     
     Args:
         token: Custom token string
-        auth_client: Firebase Auth client
         
     Returns:
         User information dictionary
@@ -134,7 +348,7 @@ async def _decode_custom_token_for_development(
         
         # Try to get user from Firebase Auth
         try:
-            user_record = auth_client.get_user(user_id)
+            user_record = await auth_client.get_user(user_id)
             logger.info(f"Custom token decoded for user: {user_id} (development mode)")
             
             # Extract custom claims if present
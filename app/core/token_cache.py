@@ -0,0 +1,180 @@
+"""
+Verified ID-token Cache
+
+Keeps the claims of verified Firebase ID tokens, keyed by the SHA-256 of the
+token, until the token's exp. Repeat requests with the same token skip
+verification entirely.
+
+Revocation is checked per uid instead of per request: the user's
+tokens_valid_after_timestamp and disabled flag are loaded from Firebase Auth
+at most every TOKEN_REVOCATION_CHECK_INTERVAL_SECONDS and compared with each
+token's iat locally (the same rule verify_id_token(check_revoked=True)
+applies). A revocation therefore takes effect within one interval, or
+immediately on this process when it goes through the auth_client facade
+(revoke_refresh_tokens, update_user(disabled=...)), which calls
+invalidate_user(). Tools revoking or disabling users outside this process are
+picked up on the next check.
+"""
+import asyncio
+import hashlib
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from firebase_admin import auth as firebase_auth
+from app.core.auth_client import auth_client
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import register_metrics
+
+
+def token_key(token: str) -> str:
+    """Cache key for a token (the raw token is never stored)"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class VerifiedTokenCache:
+    """Verified claims per token plus revocation state per uid"""
+    
+    def __init__(self, max_entries: int, revocation_check_interval_seconds: float, enabled: bool = True):
+        """
+        Args:
+            max_entries: Cached tokens (and uids) before least recently used ones are evicted
+            revocation_check_interval_seconds: How long a uid's revocation state is trusted (0 checks every request)
+            enabled: When False every request is verified with check_revoked=True
+        """
+        self.enabled = enabled
+        self.revocation_check_interval_seconds = revocation_check_interval_seconds
+        # Per-entry TTL is the token's remaining lifetime; the default only bounds entries without exp
+        self._claims = TTLCache("verified_tokens", max_entries=max_entries, ttl_seconds=3600)
+        self._users = TTLCache("token_revocation", max_entries=max_entries, ttl_seconds=revocation_check_interval_seconds)
+        self._loading: Dict[str, asyncio.Future] = {}
+        
+        self._hits = 0
+        self._misses = 0
+        self._revocation_checks = 0
+        self._revoked = 0
+        self._disabled = 0
+    
+    async def verify(
+        self,
+        token: str,
+        verifier: Optional[Callable[[str], Awaitable[Dict[str, Any]]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Verified claims of an ID token
+        
+        Args:
+            token: Firebase ID token
+            verifier: Signature check for cache misses (defaults to the SDK's verify_id_token)
+        
+        Raises:
+            firebase_auth.ExpiredIdTokenError, InvalidIdTokenError: From verification
+            firebase_auth.RevokedIdTokenError: If the user's tokens were revoked after iat
+            firebase_auth.UserDisabledError: If the user is disabled
+        """
+        if not self.enabled:
+            return await auth_client.verify_id_token(token, check_revoked=True)
+        
+        key = token_key(token)
+        claims = self._claims.get(key)
+        if claims is not None and claims.get("exp", 0) > time.time():
+            self._hits += 1
+        else:
+            self._misses += 1
+            if verifier is not None:
+                claims = await verifier(token)
+            else:
+                claims = await auth_client.verify_id_token(token)
+            remaining = claims.get("exp", 0) - time.time()
+            if remaining > 0:
+                self._claims.set(key, claims, remaining)
+        
+        try:
+            await self._check_revocation(claims)
+        except (firebase_auth.RevokedIdTokenError, firebase_auth.UserDisabledError):
+            self._claims.invalidate(key)
+            raise
+        return claims
+    
+    async def _check_revocation(self, claims: Dict[str, Any]) -> None:
+        uid = claims.get("uid") or claims.get("sub")
+        state = self._users.get(uid)
+        if state is None:
+            state = await self._load_user_state(uid)
+        
+        if state["disabled"]:
+            self._disabled += 1
+            raise firebase_auth.UserDisabledError("The user record is disabled.")
+        if claims.get("iat", 0) * 1000 < state["valid_after_ms"]:
+            self._revoked += 1
+            raise firebase_auth.RevokedIdTokenError("The Firebase ID token has been revoked.")
+    
+    async def _load_user_state(self, uid: str) -> Dict[str, Any]:
+        """Load a uid's revocation state, one Auth call per uid however many requests wait"""
+        pending = self._loading.get(uid)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._loading[uid] = future
+        try:
+            self._revocation_checks += 1
+            user_record = await auth_client.get_user(uid)
+            state = {
+                "valid_after_ms": user_record.tokens_valid_after_timestamp or 0,
+                "disabled": bool(user_record.disabled),
+            }
+            self._users.set(uid, state)
+            future.set_result(state)
+            return state
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure nobody else awaited is not logged
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            del self._loading[uid]
+    
+    def invalidate_user(self, uid: str) -> None:
+        """
+        Push-invalidation hook: re-check the uid's revocation state on its next request
+        
+        Registered as the auth_client revocation listener, so it runs whenever
+        this process revokes a user's tokens or changes their disabled flag.
+        """
+        self._users.invalidate(uid)
+    
+    async def revoke_user(self, uid: str) -> None:
+        """Revoke a user's refresh tokens and reject their current ID tokens in this process right away"""
+        await auth_client.revoke_refresh_tokens(uid)
+        # Firebase stores validSince in whole seconds, so tokens issued later in
+        # the same second stay valid there and must stay valid here
+        self._users.set(uid, {"valid_after_ms": int(time.time()) * 1000, "disabled": False})
+        logger.info(f"Revoked tokens for user: {uid}")
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of cache hits and revocation checks"""
+        lookups = self._hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "tokens": len(self._claims),
+            "users": len(self._users),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "revocation_checks": self._revocation_checks,
+            "revoked": self._revoked,
+            "disabled": self._disabled,
+        }
+
+
+# Global verified token cache instance
+token_cache = VerifiedTokenCache(
+    max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+    revocation_check_interval_seconds=settings.TOKEN_REVOCATION_CHECK_INTERVAL_SECONDS,
+    enabled=settings.TOKEN_CACHE_ENABLED
+)
+auth_client.add_revocation_listener(token_cache.invalidate_user)
+register_metrics("token_cache", token_cache.metrics)
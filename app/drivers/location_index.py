@@ -0,0 +1,376 @@
+"""
+In-Process Live Driver Location Index
+
+Uniform lat/lng grid of driver positions fed by location and status updates.
+Nearby-driver queries (including the drivers notified about a new ride) are
+answered from memory; Firestore remains the fallback while the index is cold.
+
+The index is per process. At startup it is seeded with the online drivers in
+Firestore (placed with the age of their last location update), and it is
+re-synced every DRIVER_INDEX_RESYNC_SECONDS, so a restarted process does not
+miss drivers whose next ping is late, and with several workers each process
+also sees the updates handled by the others (at most one resync interval late).
+"""
+import asyncio
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Set, Tuple, Callable, Awaitable
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import register_metrics
+from app.maps import geo, geohash
+
+# Approximate kilometers per degree of latitude
+_KM_PER_DEGREE_LAT = 110.574
+
+
+@dataclass
+class DriverLocationEntry:
+    """Live location and status of a single driver"""
+    driver_id: str
+    latitude: float
+    longitude: float
+    status: str
+    last_seen: float
+    cell: Tuple[int, int]
+    geohash: str
+    profile: Dict[str, Any] = field(default_factory=dict)
+
+
+class DriverLocationIndex:
+    """Uniform grid spatial index of online drivers"""
+    
+    def __init__(self, cell_size_deg: float, ttl_seconds: float, resync_seconds: float = 0):
+        """
+        Args:
+            cell_size_deg: Grid cell size in degrees (latitude and longitude)
+            ttl_seconds: Drivers without a location update for this long are ignored
+            resync_seconds: Interval of re-reading online drivers from Firestore (0 = never)
+        """
+        self.cell_size_deg = cell_size_deg
+        self.ttl_seconds = ttl_seconds
+        self.resync_seconds = resync_seconds
+        self._entries: Dict[str, DriverLocationEntry] = {}
+        self._grid: Dict[Tuple[int, int], Set[str]] = {}
+        
+        # Without a successful seed, every live driver reports within one TTL
+        # period, so the index is complete (warm) one TTL after startup
+        self._warm_at = time.monotonic() + ttl_seconds
+        
+        self._loader: Optional[Callable[[], Awaitable[List[Dict[str, Any]]]]] = None
+        self._resync_task: Optional[asyncio.Task] = None
+        
+        self._queries = 0
+        self._updates = 0
+        self._fallbacks = 0
+        self._syncs = 0
+        self._sync_errors = 0
+    
+    def _cell_for(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        """Grid cell key for coordinates"""
+        return (
+            math.floor(latitude / self.cell_size_deg),
+            math.floor(longitude / self.cell_size_deg)
+        )
+    
+    def is_warm(self) -> bool:
+        """Whether the index has been seeded from Firestore or has seen a full TTL period of updates"""
+        return time.monotonic() >= self._warm_at
+    
+    def record_fallback(self) -> None:
+        """Record a query that had to fall back to Firestore"""
+        self._fallbacks += 1
+    
+    def has_profile(self, driver_id: str) -> bool:
+        """Whether a profile snapshot is held for the driver"""
+        entry = self._entries.get(driver_id)
+        return bool(entry and entry.profile)
+    
+    def upsert_location(
+        self,
+        driver_id: str,
+        latitude: float,
+        longitude: float,
+        status: Optional[str] = None,
+        profile: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Insert or move a driver in the index
+        
+        Args:
+            driver_id: Driver ID
+            latitude: Current latitude
+            longitude: Current longitude
+            status: Driver status if known (online, offline, busy)
+            profile: Driver document snapshot returned with query results
+        """
+        self._updates += 1
+        cell = self._cell_for(latitude, longitude)
+        entry = self._entries.get(driver_id)
+        
+        if entry is None:
+            entry = DriverLocationEntry(
+                driver_id=driver_id,
+                latitude=latitude,
+                longitude=longitude,
+                status=status or (profile or {}).get("status", "offline"),
+                last_seen=time.monotonic(),
+                cell=cell,
+                geohash=geohash.encode(latitude, longitude),
+                profile=dict(profile) if profile else {}
+            )
+            self._entries[driver_id] = entry
+            self._grid.setdefault(cell, set()).add(driver_id)
+            return
+        
+        if entry.cell != cell:
+            self._remove_from_cell(driver_id, entry.cell)
+            self._grid.setdefault(cell, set()).add(driver_id)
+            entry.cell = cell
+        
+        entry.latitude = latitude
+        entry.longitude = longitude
+        entry.geohash = geohash.encode(latitude, longitude)
+        entry.last_seen = time.monotonic()
+        if profile:
+            entry.profile = dict(profile)
+            entry.status = profile.get("status", entry.status)
+        if status:
+            entry.status = status
+    
+    def update_status(
+        self,
+        driver_id: str,
+        status: str,
+        profile: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Update the status (and optionally the profile) of an indexed driver"""
+        self._updates += 1
+        entry = self._entries.get(driver_id)
+        if entry is None:
+            # Position unknown until the first location update
+            return
+        
+        entry.status = status
+        if profile:
+            entry.profile = dict(profile)
+    
+    def update_profile(self, driver_id: str, profile: Dict[str, Any]) -> None:
+        """Replace the profile snapshot of an indexed driver"""
+        entry = self._entries.get(driver_id)
+        if entry is not None and profile:
+            entry.profile = dict(profile)
+            entry.status = profile.get("status", entry.status)
+    
+    def remove(self, driver_id: str) -> None:
+        """Remove a driver from the index"""
+        entry = self._entries.pop(driver_id, None)
+        if entry is not None:
+            self._remove_from_cell(driver_id, entry.cell)
+    
+    def _remove_from_cell(self, driver_id: str, cell: Tuple[int, int]) -> None:
+        """Remove a driver ID from a grid cell, dropping empty cells"""
+        members = self._grid.get(cell)
+        if members is not None:
+            members.discard(driver_id)
+            if not members:
+                del self._grid[cell]
+    
+    def seed(self, drivers: List[Dict[str, Any]], loaded_at: float) -> int:
+        """
+        Merge online driver documents read from Firestore into the index
+        
+        Drivers are placed with the age of their last location update, so the
+        result matches an index that received every update itself. Entries
+        updated locally after the read started are kept, and entries still
+        online locally but no longer online in Firestore are marked offline.
+        
+        Args:
+            drivers: Online driver documents (with "id")
+            loaded_at: time.monotonic() taken before the documents were read
+        
+        Returns:
+            Number of drivers placed or moved
+        """
+        now = time.monotonic()
+        age_base = time.time()
+        online_ids: Set[str] = set()
+        placed = 0
+        
+        for driver in drivers:
+            driver_id = driver.get("id")
+            if not driver_id:
+                continue
+            online_ids.add(driver_id)
+            
+            entry = self._entries.get(driver_id)
+            if entry is not None and entry.last_seen >= loaded_at:
+                continue
+            
+            try:
+                location = driver["location"]
+                latitude = float(location.latitude)
+                longitude = float(location.longitude)
+                age = max(age_base - driver["locationUpdatedAt"].timestamp(), 0.0)
+            except (KeyError, AttributeError, TypeError, ValueError):
+                # No usable location yet: placed on the driver's first update
+                continue
+            if age > self.ttl_seconds or (entry is not None and entry.last_seen >= now - age):
+                continue
+            
+            self.upsert_location(driver_id, latitude, longitude, status="online", profile=driver)
+            self._entries[driver_id].last_seen = now - age
+            placed += 1
+        
+        for driver_id, entry in self._entries.items():
+            if entry.status == "online" and driver_id not in online_ids and entry.last_seen < loaded_at:
+                entry.status = "offline"
+        
+        self._warm_at = min(self._warm_at, now)
+        self._syncs += 1
+        return placed
+    
+    async def start(self, loader: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> None:
+        """
+        Seed the index and start the periodic resync
+        
+        Args:
+            loader: Returns the online driver documents from Firestore
+        """
+        self._loader = loader
+        await self.resync()
+        if self.resync_seconds > 0 and self._resync_task is None:
+            self._resync_task = asyncio.create_task(self._resync_loop(), name="driver-index-resync")
+    
+    async def stop(self) -> None:
+        """Stop the periodic resync"""
+        if self._resync_task is not None:
+            self._resync_task.cancel()
+            try:
+                await self._resync_task
+            except asyncio.CancelledError:
+                pass
+            self._resync_task = None
+    
+    async def resync(self) -> None:
+        """Merge the online drivers from Firestore (errors keep the current index)"""
+        if self._loader is None:
+            return
+        loaded_at = time.monotonic()
+        try:
+            drivers = await self._loader()
+        except Exception as e:
+            self._sync_errors += 1
+            logger.error(f"Error loading online drivers for the location index: {str(e)}")
+            return
+        placed = self.seed(drivers, loaded_at)
+        logger.debug(f"Driver location index synced: {placed} of {len(drivers)} online drivers placed")
+    
+    async def _resync_loop(self) -> None:
+        """Periodically merge the online drivers from Firestore"""
+        while True:
+            await asyncio.sleep(self.resync_seconds)
+            await self.resync()
+    
+    def _candidate_ids(self, latitude: float, longitude: float, radius_km: float) -> List[str]:
+        """Driver IDs in the grid cells overlapping the search circle's bounding box"""
+        lat_delta = radius_km / _KM_PER_DEGREE_LAT
+        cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+        lon_delta = radius_km / (111.320 * cos_lat)
+        
+        min_cell = self._cell_for(latitude - lat_delta, longitude - lon_delta)
+        max_cell = self._cell_for(latitude + lat_delta, longitude + lon_delta)
+        cell_count = (max_cell[0] - min_cell[0] + 1) * (max_cell[1] - min_cell[1] + 1)
+        
+        # Large radius over a sparse grid: scanning occupied cells is cheaper
+        if cell_count > len(self._grid):
+            return [
+                driver_id
+                for cell, members in self._grid.items()
+                if min_cell[0] <= cell[0] <= max_cell[0] and min_cell[1] <= cell[1] <= max_cell[1]
+                for driver_id in members
+            ]
+        
+        candidates: List[str] = []
+        for lat_cell in range(min_cell[0], max_cell[0] + 1):
+            for lon_cell in range(min_cell[1], max_cell[1] + 1):
+                members = self._grid.get((lat_cell, lon_cell))
+                if members:
+                    candidates.extend(members)
+        return candidates
+    
+    def query_radius(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        limit: Optional[int] = None,
+        status: str = "online"
+    ) -> List[Tuple[DriverLocationEntry, float]]:
+        """
+        Find drivers within a radius
+        
+        Args:
+            latitude: Search latitude
+            longitude: Search longitude
+            radius_km: Search radius in kilometers
+            limit: Maximum number of results (closest first)
+            status: Required driver status
+        
+        Returns:
+            List of (entry, distance_km) tuples sorted by distance
+        """
+        self._queries += 1
+        stale_before = time.monotonic() - self.ttl_seconds
+        
+        entries = []
+        for driver_id in self._candidate_ids(latitude, longitude, radius_km):
+            entry = self._entries[driver_id]
+            if entry.status == status and entry.last_seen >= stale_before:
+                entries.append(entry)
+        if not entries:
+            return []
+        
+        # Score all candidates in one vectorized pass
+        distances = geo.distances_km(
+            latitude,
+            longitude,
+            [entry.latitude for entry in entries],
+            [entry.longitude for entry in entries]
+        )
+        results: List[Tuple[DriverLocationEntry, float]] = [
+            (entries[index], float(distances[index]))
+            for index in (distances <= radius_km).nonzero()[0]
+        ]
+        
+        results.sort(key=lambda item: item[1])
+        return results[:limit] if limit is not None else results
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of index size and usage counters"""
+        stale_before = time.monotonic() - self.ttl_seconds
+        online = sum(
+            1 for entry in self._entries.values()
+            if entry.status == "online" and entry.last_seen >= stale_before
+        )
+        return {
+            "warm": self.is_warm(),
+            "drivers": len(self._entries),
+            "online_live": online,
+            "cells": len(self._grid),
+            "updates": self._updates,
+            "queries": self._queries,
+            "firestore_fallbacks": self._fallbacks,
+            "firestore_syncs": self._syncs,
+            "firestore_sync_errors": self._sync_errors,
+        }
+
+
+# Global driver location index instance
+driver_location_index = DriverLocationIndex(
+    cell_size_deg=settings.DRIVER_INDEX_CELL_SIZE_DEG,
+    ttl_seconds=settings.DRIVER_INDEX_TTL_SECONDS,
+    resync_seconds=settings.DRIVER_INDEX_RESYNC_SECONDS
+)
+register_metrics("driver_location_index", driver_location_index.metrics)
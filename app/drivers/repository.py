@@ -1,21 +1,31 @@
 """
 Driver Repository - Firestore Operations
 """
-import math
-from typing import Optional, Dict, Any
+import asyncio
+from typing import Optional, Dict, Any, List
 from firebase_admin import firestore
-from app.core.firebase import get_firestore
+from google.api_core.exceptions import AlreadyExists
+from app.core.firebase import get_async_firestore
 from app.core.logging import logger
 from app.core.exceptions import NotFoundError
+from app.core.firestore_utils import merge_written
+from app.core.config import settings
+from app.core.document_cache import document_cache
+from app.core import phone_index
+from app.maps import geo, geohash
 
 
 class DriverRepository:
     """Repository for driver Firestore operations"""
     
     def __init__(self):
-        self.db = get_firestore()
+        self.db = get_async_firestore()
         self.collection = "drivers"
     
+    def _cache_key(self, driver_id: str) -> str:
+        """Document cache key for a driver"""
+        return f"{self.collection}:{driver_id}"
+    
     async def create_driver(
         self,
         driver_id: str,
@@ -28,9 +38,9 @@ class DriverRepository:
         email: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Create a new driver document in Firestore using transaction for atomicity
+        Create a new driver document in Firestore
         
-        Best Practice: Use transactions to ensure data consistency
+        Best Practice: Use create() so an existing document is never overwritten
         """
         try:
             driver_data = {
@@ -49,42 +59,89 @@ class DriverRepository:
             
             doc_ref = self.db.collection(self.collection).document(driver_id)
             
-            # Use transaction to ensure atomicity (best practice)
-            transaction = self.db.transaction()
+            # create() fails if the document exists, so existence check and
+            # write happen atomically in a single round trip (with the phone index entry)
+            try:
+                write_result = await phone_index.commit_with_entry(
+                    self.db,
+                    lambda batch: batch.create(doc_ref, driver_data),
+                    phone_index.DRIVER_FIELD,
+                    driver_id,
+                    phone_number
+                )
+            except AlreadyExists:
+                raise ValueError(f"Driver {driver_id} already exists")
             
-            @firestore.transactional
-            def create_driver_transaction(transaction):
-                # Check if document already exists
-                doc = doc_ref.get(transaction=transaction)
-                if doc.exists:
-                    raise ValueError(f"Driver {driver_id} already exists")
-                
-                # Create document atomically
-                transaction.set(doc_ref, driver_data)
+            driver_dict = merge_written(driver_data, write_result.update_time)
+            await document_cache.set(self._cache_key(driver_id), driver_dict)
+            return driver_dict
             
-            # Execute transaction
-            create_driver_transaction(transaction)
+        except Exception as e:
+            logger.error(f"Error creating driver: {str(e)}")
+            raise
+    
+    async def get_or_create_driver(self, driver_id: str, phone_number: str) -> Dict[str, Any]:
+        """
+        Get a driver document, creating a minimal one if it does not exist
+        
+        Used at login, where the document is normally missing: create() is
+        tried first, so a new driver costs one round trip and the existing
+        document is only read when the create is rejected.
+        """
+        try:
+            driver_data = {
+                "id": driver_id,
+                "phone_number": phone_number,
+                "name": "",  # Will be set in create-account
+                "email": None,
+                "license_number": "",
+                "vehicle_model": "",
+                "vehicle_plate": "",
+                "vehicle_color": "",
+                "status": "offline",
+                "createdAt": firestore.SERVER_TIMESTAMP,
+                "updatedAt": firestore.SERVER_TIMESTAMP,
+            }
             
-            # Fetch the created document
-            doc = doc_ref.get()
-            if doc.exists:
-                driver_dict = doc.to_dict()
-                # Ensure "id" field is set from document ID
-                if driver_dict and "id" not in driver_dict:
-                    driver_dict["id"] = doc.id
+            doc_ref = self.db.collection(self.collection).document(driver_id)
+            try:
+                write_result = await phone_index.commit_with_entry(
+                    self.db,
+                    lambda batch: batch.create(doc_ref, driver_data),
+                    phone_index.DRIVER_FIELD,
+                    driver_id,
+                    phone_number
+                )
+            except AlreadyExists:
+                # A cached "absent" marker would hide the existing document
+                await document_cache.invalidate(self._cache_key(driver_id))
+                driver_dict = await self.get_driver_by_id(driver_id)
+                if driver_dict is None:
+                    raise NotFoundError(f"Driver {driver_id} not found")
+                if driver_dict.get("phone_number") == phone_number:
+                    await phone_index.repair(self.db, phone_number, phone_index.DRIVER_FIELD, driver_id)
                 return driver_dict
             
-            raise Exception("Failed to create driver document")
+            driver_dict = merge_written(driver_data, write_result.update_time)
+            await document_cache.set(self._cache_key(driver_id), driver_dict)
+            return driver_dict
             
         except Exception as e:
-            logger.error(f"Error creating driver: {str(e)}")
+            logger.error(f"Error getting or creating driver: {str(e)}")
             raise
     
     async def get_driver_by_id(self, driver_id: str) -> Optional[Dict[str, Any]]:
-        """Get driver by ID"""
+        """Get driver by ID (served from the document cache when possible)"""
+        return await document_cache.get_or_load(
+            self._cache_key(driver_id),
+            lambda: self._load_driver(driver_id)
+        )
+    
+    async def _load_driver(self, driver_id: str) -> Optional[Dict[str, Any]]:
+        """Read driver document from Firestore"""
         try:
             doc_ref = self.db.collection(self.collection).document(driver_id)
-            doc = doc_ref.get()
+            doc = await doc_ref.get()
             
             if doc.exists:
                 return doc.to_dict()
@@ -96,17 +153,35 @@ class DriverRepository:
             raise
     
     async def get_driver_by_phone(self, phone_number: str) -> Optional[Dict[str, Any]]:
-        """Get driver by phone number"""
+        """
+        Get driver by phone number
+        
+        Resolved through the phone index (direct gets, usually cached); the
+        collection query is only run for phone numbers missing from the index
+        while PHONE_INDEX_FALLBACK_QUERY is on.
+        """
         try:
+            driver_id = await phone_index.lookup(self.db, phone_number, phone_index.DRIVER_FIELD)
+            if driver_id:
+                driver_data = await self.get_driver_by_id(driver_id)
+                # Ignore stale entries (document deleted or phone number changed)
+                if driver_data and driver_data.get("phone_number") == phone_number:
+                    driver_data.setdefault("id", driver_id)
+                    return driver_data
+            
+            if not settings.PHONE_INDEX_FALLBACK_QUERY:
+                return None
+            
             # Use filter keyword argument (best practice - avoids deprecation warning)
             query = self.db.collection(self.collection).where(filter=firestore.FieldFilter("phone_number", "==", phone_number)).limit(1)
             docs = query.stream()
             
-            for doc in docs:
+            async for doc in docs:
                 driver_data = doc.to_dict()
                 # Ensure "id" field is set from document ID
                 if driver_data and "id" not in driver_data:
                     driver_data["id"] = doc.id
+                await phone_index.repair(self.db, phone_number, phone_index.DRIVER_FIELD, doc.id)
                 return driver_data
             
             return None
@@ -118,20 +193,46 @@ class DriverRepository:
     async def update_driver(
         self,
         driver_id: str,
-        updates: Dict[str, Any]
+        updates: Dict[str, Any],
+        current: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
-        """Update driver document"""
+        """
+        Update driver document
+        
+        Pass the document as already loaded by the caller in `current` to build
+        the result locally; otherwise it is read back after the update. Phone
+        number changes always read the document within their transaction.
+        """
         try:
             updates["updatedAt"] = firestore.SERVER_TIMESTAMP
             
             doc_ref = self.db.collection(self.collection).document(driver_id)
-            doc_ref.update(updates)
+            if "phone_number" in updates:
+                # Move the phone index entry in the same transaction
+                driver_dict = await phone_index.update_with_entry(
+                    self.db, doc_ref, updates, phone_index.DRIVER_FIELD, driver_id
+                )
+                if driver_dict is None:
+                    await document_cache.invalidate(self._cache_key(driver_id))
+                    raise NotFoundError(f"Driver {driver_id} not found")
+                await document_cache.set(self._cache_key(driver_id), driver_dict)
+                return driver_dict
+            
+            write_result = await doc_ref.update(updates)
+            
+            if current is not None:
+                driver_dict = merge_written(updates, write_result.update_time, current=current)
+                await document_cache.set(self._cache_key(driver_id), driver_dict)
+                return driver_dict
             
             # Fetch updated document
-            doc = doc_ref.get()
+            doc = await doc_ref.get()
             if doc.exists:
-                return doc.to_dict()
+                driver_dict = doc.to_dict()
+                await document_cache.set(self._cache_key(driver_id), driver_dict)
+                return driver_dict
             
+            await document_cache.invalidate(self._cache_key(driver_id))
             raise NotFoundError(f"Driver {driver_id} not found")
             
         except Exception as e:
@@ -144,14 +245,16 @@ class DriverRepository:
         latitude: float,
         longitude: float
     ) -> None:
-        """Update driver location"""
+        """Update driver location and its geohash (used by nearby-driver search)"""
         try:
             doc_ref = self.db.collection(self.collection).document(driver_id)
-            doc_ref.update({
+            await doc_ref.update({
                 "location": firestore.GeoPoint(latitude, longitude),
+                "geohash": geohash.encode(latitude, longitude),
                 "locationUpdatedAt": firestore.SERVER_TIMESTAMP,
                 "updatedAt": firestore.SERVER_TIMESTAMP
             })
+            await document_cache.invalidate(self._cache_key(driver_id))
             
         except Exception as e:
             logger.error(f"Error updating driver location: {str(e)}")
@@ -167,6 +270,10 @@ class DriverRepository:
         """
         Get nearby drivers within specified radius using Haversine distance calculation
         
+        Only the geohash cells covering the search circle are queried, so the
+        number of documents read tracks local driver density, not fleet size.
+        Candidates are then scored by exact Haversine distance in one vectorized pass.
+        
         Args:
             latitude: User's latitude
             longitude: User's longitude
@@ -177,18 +284,24 @@ class DriverRepository:
             List of driver documents sorted by distance (closest first)
         """
         try:
-            # Get all online drivers
-            # Use filter keyword argument (best practice - avoids deprecation warning)
-            query = self.db.collection(self.collection).where(
-                filter=firestore.FieldFilter("status", "==", "online")
+            cells = geohash.covering_cells(latitude, longitude, radius_km)
+            
+            # Query all covering cells concurrently
+            cell_results = await asyncio.gather(
+                *[self._get_online_drivers_in_cell(cell) for cell in cells]
             )
-            docs = query.stream()
             
-            drivers_with_distance = []
+            candidates = []
+            candidate_lats = []
+            candidate_lngs = []
             drivers_without_location = 0
             total_online_drivers = 0
+            seen_ids = set()
             
-            for doc in docs:
+            for doc in (doc for cell_docs in cell_results for doc in cell_docs):
+                if doc.id in seen_ids:
+                    continue
+                seen_ids.add(doc.id)
                 total_online_drivers += 1
                 driver_data = doc.to_dict()
                 
@@ -205,29 +318,29 @@ class DriverRepository:
                 try:
                     # Extract driver coordinates
                     driver_location = driver_data["location"]
-                    driver_lat = driver_location.latitude
-                    driver_lng = driver_location.longitude
-                    
-                    # Calculate distance using Haversine formula
-                    distance_km = self._haversine_distance(
-                        latitude, longitude, driver_lat, driver_lng
-                    )
-                    
-                    # Only include drivers within the specified radius
-                    if distance_km <= radius_km:
-                        # Add distance to driver data for sorting and client use
-                        driver_data["distance_km"] = round(distance_km, 2)
-                        drivers_with_distance.append(driver_data)
-                        
-                except AttributeError as e:
+                    driver_lat = float(driver_location.latitude)
+                    driver_lng = float(driver_location.longitude)
+                except (AttributeError, TypeError, ValueError) as e:
                     # Location field exists but is not a valid GeoPoint
                     logger.warning(f"Driver {doc.id} has invalid location data: {str(e)}")
                     drivers_without_location += 1
                     continue
-                except Exception as e:
-                    # Unexpected error processing this driver
-                    logger.error(f"Error processing driver {doc.id}: {str(e)}")
-                    continue
+                
+                candidates.append(driver_data)
+                candidate_lats.append(driver_lat)
+                candidate_lngs.append(driver_lng)
+            
+            drivers_with_distance = []
+            if candidates:
+                # Score every candidate in one vectorized pass
+                batch = geo.score_points(
+                    latitude, longitude, candidate_lats, candidate_lngs, radius_km
+                )
+                for index in batch.within_radius.nonzero()[0]:
+                    driver_data = candidates[index]
+                    # Add distance to driver data for sorting and client use
+                    driver_data["distance_km"] = round(float(batch.distances_km[index]), 2)
+                    drivers_with_distance.append(driver_data)
             
             # Sort drivers by distance (closest first)
             drivers_with_distance.sort(key=lambda d: d.get("distance_km", float('inf')))
@@ -238,7 +351,7 @@ class DriverRepository:
             # Log summary for debugging
             logger.info(
                 f"Found {len(result)} drivers within {radius_km}km radius "
-                f"(out of {total_online_drivers} online drivers, "
+                f"(out of {total_online_drivers} online drivers in {len(cells)} geohash cells, "
                 f"{drivers_without_location} without valid location)"
             )
             
@@ -248,43 +361,32 @@ class DriverRepository:
             logger.error(f"Error getting nearby drivers: {str(e)}", exc_info=True)
             raise
     
-    def _haversine_distance(
-        self,
-        lat1: float,
-        lon1: float,
-        lat2: float,
-        lon2: float
-    ) -> float:
-        """
-        Calculate distance between two points using Haversine formula
-        
-        Args:
-            lat1: Latitude of point 1
-            lon1: Longitude of point 1
-            lat2: Latitude of point 2
-            lon2: Longitude of point 2
+    async def get_online_drivers(self) -> List[Dict[str, Any]]:
+        """Get all online drivers (seeds the in-process location index)"""
+        try:
+            query = self.db.collection(self.collection).where(filter=firestore.FieldFilter("status", "==", "online"))
+            drivers = []
+            async for doc in query.stream():
+                driver_data = doc.to_dict()
+                driver_data["id"] = doc.id
+                drivers.append(driver_data)
+            return drivers
             
-        Returns:
-            Distance in kilometers
+        except Exception as e:
+            logger.error(f"Error getting online drivers: {str(e)}")
+            raise
+    
+    async def _get_online_drivers_in_cell(self, cell: str) -> List[Any]:
         """
-        # Earth's radius in kilometers
-        R = 6371.0
-        
-        # Convert degrees to radians
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lon = math.radians(lon2 - lon1)
+        Get online driver snapshots whose geohash starts with the given cell prefix
         
-        # Haversine formula
-        a = (
-            math.sin(delta_lat / 2) ** 2 +
-            math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon / 2) ** 2
+        Requires the composite index: status (Ascending), geohash (Ascending)
+        """
+        query = (
+            self.db.collection(self.collection)
+            .where(filter=firestore.FieldFilter("status", "==", "online"))
+            .where(filter=firestore.FieldFilter("geohash", ">=", cell))
+            .where(filter=firestore.FieldFilter("geohash", "<", cell + geohash.PREFIX_RANGE_END))
         )
-        c = 2 * math.asin(math.sqrt(a))
-        
-        # Distance in kilometers
-        distance = R * c
-        
-        return distance
+        return [doc async for doc in query.stream()]
 
@@ -1,13 +1,17 @@
 """
 Driver Service - Business Logic
 """
+import asyncio
 from typing import Optional, Dict, Any
 from firebase_admin import auth as firebase_auth
-from firebase_admin import auth
-from app.core.firebase import get_firebase_auth
+from app.core import phone_login
+from app.core.auth_client import auth_client
 from app.core.logging import logger
 from app.core.exceptions import ValidationError, NotFoundError, ConflictError
+from app.core.config import settings
 from app.drivers.repository import DriverRepository
+from app.drivers.location_index import driver_location_index
+from app.maps.service import maps_service
 from app.drivers.schemas import CreateDriverAccountRequest, UpdateDriverStatusRequest, UpdateDriverLocationRequest
 from app.core.serializers import serialize_firestore_document
 
@@ -17,7 +21,6 @@ class DriverService:
     
     def __init__(self):
         self.repository = DriverRepository()
-        self.auth = get_firebase_auth()
     
     async def send_phone_otp(self, phone_number: str) -> Dict[str, Any]:
         """Send OTP to driver's phone number"""
@@ -44,60 +47,45 @@ class DriverService:
     ) -> Dict[str, Any]:
         """Verify driver OTP and create/get Firebase user"""
         try:
-            # Check if driver exists in Firestore
-            existing_driver = await self.repository.get_driver_by_phone(phone_number)
+            # Look the phone number up in Firestore and Firebase Auth concurrently
+            existing_driver, auth_record = await asyncio.gather(
+                self.repository.get_driver_by_phone(phone_number),
+                phone_login.find_auth_user(phone_number)
+            )
             
-            driver_id: str
+            driver_id: Optional[str] = None
             if existing_driver:
                 # Get driver_id from document (repository ensures "id" field exists)
                 driver_id = existing_driver.get("id")
                 if not driver_id:
                     # This shouldn't happen with the repository fix, but handle it just in case
                     raise ValidationError("Driver data is missing ID field. Please contact support.")
-            else:
-                # Create new Firebase Auth user
-                try:
-                    user_record = self.auth.create_user(phone_number=phone_number)
-                    driver_id = user_record.uid
-                except Exception as e:
-                    logger.error(f"Error creating Firebase driver user: {str(e)}")
-                    raise ValidationError("Failed to create driver account")
             
-            # Generate custom token with custom claims for RBAC
-            # Best Practice: Client should exchange this for ID token using Firebase SDK
-            # Custom claims allow role-based access control
+            # Custom claims for RBAC
             custom_claims = {
                 "user_type": "driver"  # Set user_type in custom claims for RBAC
             }
-            custom_token = auth.create_custom_token(driver_id, custom_claims)
-            
-            # Ensure custom_token is a string (not bytes)
-            if isinstance(custom_token, bytes):
-                custom_token = custom_token.decode('utf-8')
-            elif not isinstance(custom_token, str):
-                custom_token = str(custom_token)
             
-            # Set custom claims on Firebase Auth user for ID token generation
+            # Make sure the Auth user exists (created for new phone numbers)
             try:
-                self.auth.set_custom_user_claims(driver_id, custom_claims)
-                logger.info(f"Set custom claims for driver: {driver_id}")
+                driver_id, auth_record = await phone_login.ensure_auth_user(
+                    phone_number, driver_id, auth_record, custom_claims
+                )
             except Exception as e:
-                logger.warning(f"Could not set custom claims: {str(e)}")
-                # Continue - custom token will still work
-            
-            # Get or create driver document
-            driver_doc = await self.repository.get_driver_by_id(driver_id)
-            if not driver_doc:
-                # Create driver document with minimal info
-                driver_doc = await self.repository.create_driver(
-                    driver_id=driver_id,
-                    phone_number=phone_number,
-                    name="",  # Will be set in create-account
-                    license_number="",
-                    vehicle_model="",
-                    vehicle_plate="",
-                    vehicle_color="",
-                    email=None
+                logger.error(f"Error creating Firebase driver user: {str(e)}")
+                raise ValidationError("Failed to create driver account")
+            
+            # Generate custom token with custom claims
+            # Best Practice: Client should exchange this for ID token using Firebase SDK
+            # Custom claims are only written when they differ from the stored ones
+            if existing_driver:
+                driver_doc = existing_driver
+                custom_token = await phone_login.issue_token(driver_id, custom_claims, auth_record)
+            else:
+                # Create the driver document with minimal info alongside the token
+                custom_token, driver_doc = await asyncio.gather(
+                    phone_login.issue_token(driver_id, custom_claims, auth_record),
+                    self.repository.get_or_create_driver(driver_id, phone_number)
                 )
             
             # Serialize Firestore document to JSON-serializable format
@@ -135,11 +123,12 @@ class DriverService:
             if request.email:
                 driver_data["email"] = request.email
                 try:
-                    self.auth.update_user(driver_id, email=request.email)
+                    await auth_client.update_user(driver_id, email=request.email)
                 except Exception as e:
                     logger.warning(f"Could not update Firebase Auth email: {str(e)}")
             
-            updated_driver = await self.repository.update_driver(driver_id, driver_data)
+            updated_driver = await self.repository.update_driver(driver_id, driver_data, current=existing_driver)
+            driver_location_index.update_profile(driver_id, updated_driver)
             
             # Serialize Firestore document to JSON-serializable format
             # Best Practice: Ensure all Firestore types are converted before API response
@@ -172,6 +161,7 @@ class DriverService:
         """Update driver status"""
         try:
             updated_driver = await self.repository.update_driver(driver_id, {"status": request.status})
+            driver_location_index.update_status(driver_id, request.status, profile=updated_driver)
             # Serialize Firestore document to JSON-serializable format
             return serialize_firestore_document(updated_driver) if updated_driver else {}
             
@@ -189,22 +179,77 @@ class DriverService:
             )
             
             # Update status if provided
+            profile = None
             if request.status:
-                await self.repository.update_driver(driver_id, {"status": request.status})
+                profile = await self.repository.update_driver(driver_id, {"status": request.status})
+            elif not driver_location_index.has_profile(driver_id):
+                # First update seen by this process: load the profile once
+                profile = await self.repository.get_driver_by_id(driver_id)
+            
+            driver_location_index.upsert_location(
+                driver_id,
+                latitude=request.latitude,
+                longitude=request.longitude,
+                status=request.status,
+                profile=profile
+            )
             
         except Exception as e:
             logger.error(f"Error updating driver location: {str(e)}")
             raise ValidationError(f"Failed to update location: {str(e)}")
     
+    async def find_nearby_drivers(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float = 5.0,
+        limit: int = 10
+    ) -> list[Dict[str, Any]]:
+        """
+        Find nearby online drivers, closest first (unserialized driver documents)
+        
+        Answered from the in-process location index when it is warm, otherwise
+        from the Firestore geohash query.
+        """
+        if settings.DRIVER_INDEX_ENABLED and driver_location_index.is_warm():
+            results = driver_location_index.query_radius(
+                latitude, longitude, radius_km, limit=limit
+            )
+            return [
+                {
+                    **entry.profile,
+                    "id": entry.driver_id,
+                    "status": entry.status,
+                    "location": {"latitude": entry.latitude, "longitude": entry.longitude},
+                    "geohash": entry.geohash,
+                    "distance_km": round(distance_km, 2),
+                }
+                for entry, distance_km in results
+            ]
+        
+        driver_location_index.record_fallback()
+        return await self.repository.get_nearby_drivers(
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=radius_km,
+            limit=limit
+        )
+    
     async def get_nearby_drivers(
         self,
         latitude: float,
         longitude: float,
-        radius_km: float = 5.0
+        radius_km: float = 5.0,
+        include_eta: bool = False
     ) -> list[Dict[str, Any]]:
-        """Get nearby drivers"""
+        """
+        Get nearby drivers
+        
+        With include_eta, each driver gets its driving ETA to the given point
+        (one batched Distance Matrix call) and drivers are ranked by ETA.
+        """
         try:
-            drivers = await self.repository.get_nearby_drivers(
+            drivers = await self.find_nearby_drivers(
                 latitude=latitude,
                 longitude=longitude,
                 radius_km=radius_km
@@ -212,7 +257,20 @@ class DriverService:
             
             # Serialize each driver document to handle GeoPoint and timestamps
             # Best Practice: Ensure all Firestore types are converted before API response
-            return [serialize_firestore_document(driver) for driver in drivers]
+            drivers = [serialize_firestore_document(driver) for driver in drivers]
+            
+            if include_eta and drivers:
+                etas = await maps_service.calculate_etas(
+                    [(driver["location"]["latitude"], driver["location"]["longitude"]) for driver in drivers],
+                    (latitude, longitude)
+                )
+                for driver, eta in zip(drivers, etas):
+                    driver["eta_seconds"] = eta["duration_seconds"]
+                    driver["eta_text"] = eta["duration_text"]
+                    driver["eta_estimated"] = eta["estimated"]
+                drivers.sort(key=lambda driver: driver["eta_seconds"])
+            
+            return drivers
             
         except Exception as e:
             logger.error(f"Error getting nearby drivers: {str(e)}")
@@ -8,6 +8,14 @@ from app.core.config import settings
 from app.api.v1.api import api_router
 from app.core.exceptions import setup_exception_handlers
 from app.core.firebase import initialize_firebase
+from app.core.executors import shutdown_executors
+from app.core.security import public_key_store
+from app.core.document_cache import document_cache
+from app.drivers.location_index import driver_location_index
+from app.drivers.repository import DriverRepository
+from app.maps.cache import geocode_cache, reverse_geocode_cache, route_cache
+from app.maps.service import maps_service
+from app.notifications.outbox import notification_outbox
 from app.core.logging import logger
 
 
@@ -23,10 +31,24 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to initialize Firebase: {str(e)}")
         # Continue anyway for development
     
+    await public_key_store.start()
+    await notification_outbox.start()
+    if settings.DRIVER_INDEX_ENABLED:
+        await driver_location_index.start(lambda: DriverRepository().get_online_drivers())
+    
     yield
     
     # Shutdown
     logger.info("Shutting down Londa API...")
+    await notification_outbox.stop()
+    await driver_location_index.stop()
+    await public_key_store.stop()
+    shutdown_executors()
+    await document_cache.close()
+    await maps_service.close()
+    route_cache.close()
+    geocode_cache.close()
+    reverse_geocode_cache.close()
 
 
 # Create FastAPI application instance
@@ -0,0 +1,246 @@
+"""
+Maps Result Cache
+
+Two-tier cache for Google Maps results: an in-process TTL + LRU cache in front
+of an optional SQLite file (MAPS_CACHE_PATH) that survives restarts. SQLite
+calls run on the "disk" executor.
+
+Route results are keyed by origin and destination snapped to geohash cells
+and by a time-of-day band, so repeat trips between popular spots reuse one
+Distance Matrix answer while rush-hour and night-time durations stay apart.
+Forward geocodes are keyed by a normalized address string and reverse
+geocodes by snapped coordinates, so saved places and common pickup points
+resolve locally.
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.executors import run_blocking
+from app.core.logging import logger
+from app.core.metrics import register_metrics
+from app.maps import fares, geohash
+
+
+class SQLiteStore:
+    """Key/value table with per-row expiry in a local SQLite file (blocking calls)"""
+    
+    def __init__(self, path: str, table: str):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            table: Table name, one per cache
+        """
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            purged = self._connection.execute(
+                f"DELETE FROM {table} WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+            self._connection.commit()
+        if purged:
+            logger.info(f"Purged {purged} expired rows from {path}:{table}")
+    
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        Returns:
+            Tuple of (value, seconds left), or None if missing or expired
+        """
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        
+        remaining = row[1] - time.time()
+        if remaining <= 0:
+            return None
+        return json.loads(row[0]), remaining
+    
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        with self._lock:
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, separators=(",", ":")), time.time() + ttl_seconds)
+            )
+            self._connection.commit()
+    
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class PersistentCache:
+    """In-process TTL + LRU cache backed by an optional SQLiteStore"""
+    
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        ttl_seconds: float,
+        path: Optional[str] = None,
+        enabled: bool = True
+    ):
+        """
+        Args:
+            name: Cache name, also the SQLite table name
+            max_entries: In-memory entries before least recently used ones are evicted
+            ttl_seconds: Entry lifetime in both tiers
+            path: SQLite file for the persistent tier (None keeps the cache in memory only)
+            enabled: When False nothing is cached
+        """
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled and ttl_seconds > 0
+        self._memory = TTLCache(name, max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._store: Optional[SQLiteStore] = None
+        
+        if self.enabled and path:
+            try:
+                self._store = SQLiteStore(path, name)
+                logger.info(f"Maps cache '{name}' persisted to {path}")
+            except Exception as e:
+                logger.error(f"Failed to open maps cache file {path}: {str(e)}")
+        
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._errors = 0
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """Cached value, or None on a miss"""
+        if not self.enabled:
+            return None
+        
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory_hits += 1
+            return value
+        
+        if self._store is not None:
+            try:
+                stored = await run_blocking("disk", self._store.get, key)
+            except Exception as e:
+                self._errors += 1
+                logger.warning(f"Maps cache '{self.name}' read failed: {str(e)}")
+                stored = None
+            
+            if stored is not None:
+                value, remaining = stored
+                self._memory.set(key, value, remaining)
+                self._disk_hits += 1
+                return value
+        
+        self._misses += 1
+        return None
+    
+    async def set(self, key: str, value: Any) -> None:
+        """Store a JSON-serializable value in both tiers"""
+        if not self.enabled:
+            return
+        
+        self._memory.set(key, value)
+        if self._store is not None:
+            try:
+                await run_blocking("disk", self._store.set, key, value, self.ttl_seconds)
+            except Exception as e:
+                self._errors += 1
+                logger.warning(f"Maps cache '{self.name}' write failed: {str(e)}")
+    
+    def close(self) -> None:
+        """Close the SQLite file"""
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of hit/miss counters per tier"""
+        lookups = self._memory_hits + self._disk_hits + self._misses
+        hits = self._memory_hits + self._disk_hits
+        return {
+            "enabled": self.enabled,
+            "persistent": self._store is not None,
+            "entries": len(self._memory),
+            "memory_hits": self._memory_hits,
+            "disk_hits": self._disk_hits,
+            "misses": self._misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "errors": self._errors,
+        }
+
+
+def time_bucket(now: Optional[datetime] = None) -> str:
+    """
+    Time-of-day band used in route keys
+    
+    Returns:
+        "wd<n>" on weekdays or "we<n>" on weekends, n being the
+        MAPS_CACHE_TIME_BUCKET_HOURS band of the local hour
+    """
+    local = fares.local_time(now)
+    day_type = "we" if local.weekday() >= 5 else "wd"
+    return f"{day_type}{local.hour // max(1, settings.MAPS_CACHE_TIME_BUCKET_HOURS)}"
+
+
+def route_key(origin: Tuple[float, float], destination: Tuple[float, float], bucket: Optional[str] = None) -> str:
+    """Cache key for a driving route between two (latitude, longitude) points"""
+    precision = settings.MAPS_CACHE_GEOHASH_PRECISION
+    return ":".join((
+        geohash.encode(origin[0], origin[1], precision),
+        geohash.encode(destination[0], destination[1], precision),
+        bucket or time_bucket()
+    ))
+
+
+def address_key(address: str) -> str:
+    """Cache key for a forward geocode: case, spacing and stray punctuation ignored"""
+    normalized = re.sub(r"\s+", " ", address.strip().lower())
+    normalized = re.sub(r"\s*,\s*", ", ", normalized)
+    return normalized.strip(" ,.;")
+
+
+def coordinates_key(latitude: float, longitude: float) -> str:
+    """Cache key for a reverse geocode: the point's geohash cell"""
+    return geohash.encode(latitude, longitude, settings.MAPS_GEOCODE_GEOHASH_PRECISION)
+
+
+# Distance Matrix results keyed by route_key()
+route_cache = PersistentCache(
+    name="routes",
+    max_entries=settings.MAPS_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.MAPS_CACHE_TTL_SECONDS,
+    path=settings.MAPS_CACHE_PATH,
+    enabled=settings.MAPS_CACHE_ENABLED
+)
+register_metrics("maps_route_cache", route_cache.metrics)
+
+# Geocode results keyed by address_key() and coordinates_key()
+geocode_cache = PersistentCache(
+    name="geocode",
+    max_entries=settings.MAPS_GEOCODE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.MAPS_GEOCODE_CACHE_TTL_SECONDS,
+    path=settings.MAPS_CACHE_PATH,
+    enabled=settings.MAPS_CACHE_ENABLED
+)
+reverse_geocode_cache = PersistentCache(
+    name="reverse_geocode",
+    max_entries=settings.MAPS_GEOCODE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.MAPS_GEOCODE_CACHE_TTL_SECONDS,
+    path=settings.MAPS_CACHE_PATH,
+    enabled=settings.MAPS_CACHE_ENABLED
+)
+register_metrics("maps_geocode_cache", geocode_cache.metrics)
+register_metrics("maps_reverse_geocode_cache", reverse_geocode_cache.metrics)
@@ -0,0 +1,329 @@
+"""
+Async Google Maps Web Service Client
+
+Calls the Maps JSON web services (Distance Matrix, Geocoding, Directions) with
+one shared httpx.AsyncClient instead of the synchronous googlemaps client on a
+thread pool:
+- keep-alive connection pool (HTTP/2 when the h2 package is installed)
+- connect timeout plus a read timeout per endpoint
+- retries with exponential backoff and full jitter on network errors,
+  429/5xx responses and OVER_QUERY_LIMIT / UNKNOWN_ERROR statuses
+- a circuit breaker that fails fast after repeated failed calls, so a Maps
+  outage degrades to local estimates instead of piling up slow requests
+
+Method return values match the googlemaps client (full response for
+distance_matrix, the results/routes list for geocoding and directions).
+GOOGLE_MAPS_BASE_URL can point at scripts/maps_stub_server.py for tests.
+"""
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import httpx
+from app.core.config import settings
+from app.core.logging import logger
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+LatLng = Tuple[float, float]
+
+# Read timeout per endpoint in seconds
+_READ_TIMEOUTS = {
+    "distancematrix": 5.0,
+    "geocode": 3.0,
+    "directions": 5.0,
+}
+
+# HTTP statuses worth retrying
+_RETRY_HTTP_STATUSES = {429, 500, 502, 503, 504}
+
+# API statuses worth retrying (others are final)
+_RETRY_API_STATUSES = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+
+# API statuses that are successful answers
+_OK_API_STATUSES = {"OK", "ZERO_RESULTS"}
+
+
+class MapsAPIError(Exception):
+    """A Maps request failed (after retries, where retryable)"""
+
+
+class CircuitOpenError(MapsAPIError):
+    """The circuit breaker is open and the request was not sent"""
+
+
+class _RetryableError(Exception):
+    """Internal: attempt failed in a way worth retrying"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+    
+    Opens after failure_threshold failed calls in a row. While open, calls are
+    rejected until reset_seconds have passed; then one trial call is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+    
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+    
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+    
+    def allow(self) -> bool:
+        """Whether a call may be sent now"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+    
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+    
+    def release_trial(self) -> None:
+        """End a half-open trial that recorded no outcome (e.g. cancelled)"""
+        self._trial_in_flight = False
+    
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._trial_in_flight or self._failures >= self.failure_threshold:
+            if self._opened_at is None or self._trial_in_flight:
+                logger.warning(f"Maps circuit breaker opened after {self._failures} consecutive failures")
+            self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+
+def _format_location(location: LatLng) -> str:
+    return f"{location[0]:.6f},{location[1]:.6f}"
+
+
+def _format_locations(locations: Sequence[LatLng]) -> str:
+    return "|".join(_format_location(location) for location in locations)
+
+
+class MapsClient:
+    """Async client for the Google Maps JSON web services"""
+    
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        http2: bool = True,
+        max_connections: int = 20,
+        connect_timeout_seconds: float = 2.0,
+        max_retries: int = 2,
+        retry_backoff_seconds: float = 0.2,
+        circuit_failure_threshold: int = 5,
+        circuit_reset_seconds: float = 30.0
+    ):
+        """
+        Args:
+            api_key: Google Maps API key
+            base_url: Web service base URL
+            http2: Use HTTP/2 when the h2 package is installed
+            max_connections: Connection pool size
+            connect_timeout_seconds: TCP/TLS connect timeout
+            max_retries: Retries after the first attempt of a call
+            retry_backoff_seconds: Backoff of the first retry, doubled per retry (with jitter)
+            circuit_failure_threshold: Failed calls in a row that open the circuit
+            circuit_reset_seconds: Time the circuit stays open before a trial call
+        """
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.breaker = CircuitBreaker(circuit_failure_threshold, circuit_reset_seconds)
+        self.http2 = http2 and _HTTP2_AVAILABLE
+        self._connect_timeout = connect_timeout_seconds
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+            timeout=httpx.Timeout(10.0, connect=connect_timeout_seconds)
+        )
+        
+        self._requests = 0
+        self._retries = 0
+        self._failures = 0
+        self._rejected = 0
+        self._total_latency_seconds = 0.0
+    
+    async def distance_matrix(
+        self,
+        origins: Sequence[LatLng],
+        destinations: Sequence[LatLng],
+        mode: str = "driving"
+    ) -> Dict[str, Any]:
+        """Distance Matrix response (rows of elements, one row per origin)"""
+        return await self._request("distancematrix", {
+            "origins": _format_locations(origins),
+            "destinations": _format_locations(destinations),
+            "mode": mode
+        })
+    
+    async def geocode(self, address: str) -> List[Dict[str, Any]]:
+        """Geocoding results for an address"""
+        response = await self._request("geocode", {"address": address})
+        return response.get("results", [])
+    
+    async def reverse_geocode(self, location: LatLng) -> List[Dict[str, Any]]:
+        """Geocoding results for a (latitude, longitude) point"""
+        response = await self._request("geocode", {"latlng": _format_location(location)})
+        return response.get("results", [])
+    
+    async def directions(
+        self,
+        origin: LatLng,
+        destination: LatLng,
+        mode: str = "driving"
+    ) -> List[Dict[str, Any]]:
+        """Directions routes between two points"""
+        response = await self._request("directions", {
+            "origin": _format_location(origin),
+            "destination": _format_location(destination),
+            "mode": mode
+        })
+        return response.get("routes", [])
+    
+    async def _request(self, endpoint: str, params: Dict[str, str]) -> Dict[str, Any]:
+        """
+        GET a web service with retries, guarded by the circuit breaker
+        
+        Raises:
+            CircuitOpenError: If the circuit is open
+            MapsAPIError: If the call failed
+        """
+        trial = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            self._rejected += 1
+            raise CircuitOpenError(f"Maps circuit open, skipping {endpoint} request")
+        
+        try:
+            return await self._send(endpoint, params)
+        except MapsAPIError:
+            raise
+        except Exception as e:
+            # Unexpected errors count as failures so the breaker keeps working
+            self._failures += 1
+            self.breaker.record_failure()
+            raise MapsAPIError(f"Maps {endpoint} request failed: {type(e).__name__}: {str(e)}") from e
+        finally:
+            if trial:
+                # A cancelled trial must not leave the circuit half-open forever
+                self.breaker.release_trial()
+    
+    async def _send(self, endpoint: str, params: Dict[str, str]) -> Dict[str, Any]:
+        """Attempts of one call, recording the outcome on the circuit breaker"""
+        timeout = httpx.Timeout(_READ_TIMEOUTS.get(endpoint, 10.0), connect=self._connect_timeout)
+        last_error = ""
+        
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._retries += 1
+                backoff = self.retry_backoff_seconds * (2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(0, backoff))
+            
+            self._requests += 1
+            started_at = time.monotonic()
+            try:
+                body = await self._attempt(endpoint, params, timeout)
+            except _RetryableError as e:
+                last_error = str(e)
+                continue
+            except MapsAPIError:
+                # Rejected request (bad key, invalid parameters): not an outage
+                self.breaker.record_success()
+                self._failures += 1
+                raise
+            finally:
+                self._total_latency_seconds += time.monotonic() - started_at
+            
+            self.breaker.record_success()
+            return body
+        
+        self._failures += 1
+        self.breaker.record_failure()
+        raise MapsAPIError(f"Maps {endpoint} request failed after {self.max_retries + 1} attempts: {last_error}")
+    
+    async def _attempt(self, endpoint: str, params: Dict[str, str], timeout: httpx.Timeout) -> Dict[str, Any]:
+        """One HTTP round trip"""
+        try:
+            response = await self._http.get(
+                f"/maps/api/{endpoint}/json",
+                params={**params, "key": self.api_key},
+                timeout=timeout
+            )
+        except httpx.TransportError as e:
+            raise _RetryableError(f"{type(e).__name__}: {str(e)}")
+        
+        if response.status_code in _RETRY_HTTP_STATUSES:
+            raise _RetryableError(f"HTTP {response.status_code}")
+        if response.status_code != 200:
+            raise MapsAPIError(f"Maps {endpoint} request returned HTTP {response.status_code}")
+        
+        try:
+            body = response.json()
+        except ValueError:
+            # e.g. an HTML error page from a proxy
+            raise _RetryableError(f"Non-JSON response ({response.headers.get('content-type', 'unknown')})")
+        if not isinstance(body, dict):
+            raise _RetryableError("Unexpected JSON response")
+        
+        status = body.get("status")
+        if status in _OK_API_STATUSES:
+            return body
+        if status in _RETRY_API_STATUSES:
+            raise _RetryableError(status)
+        raise MapsAPIError(f"Maps {endpoint} request returned {status}: {body.get('error_message', '')}")
+    
+    async def aclose(self) -> None:
+        """Close pooled connections"""
+        await self._http.aclose()
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of request, retry and circuit breaker counters"""
+        return {
+            "http2": self.http2,
+            "circuit": self.breaker.state,
+            "requests": self._requests,
+            "retries": self._retries,
+            "failures": self._failures,
+            "rejected": self._rejected,
+            "avg_latency_ms": round(self._total_latency_seconds / self._requests * 1000, 3) if self._requests else 0.0,
+        }
+
+
+def create_maps_client(api_key: str) -> MapsClient:
+    """Client configured from settings"""
+    return MapsClient(
+        api_key=api_key,
+        base_url=settings.GOOGLE_MAPS_BASE_URL,
+        http2=settings.MAPS_HTTP2,
+        max_connections=settings.MAPS_MAX_CONNECTIONS,
+        connect_timeout_seconds=settings.MAPS_CONNECT_TIMEOUT_SECONDS,
+        max_retries=settings.MAPS_MAX_RETRIES,
+        retry_backoff_seconds=settings.MAPS_RETRY_BACKOFF_SECONDS,
+        circuit_failure_threshold=settings.MAPS_CIRCUIT_FAILURE_THRESHOLD,
+        circuit_reset_seconds=settings.MAPS_CIRCUIT_RESET_SECONDS
+    )
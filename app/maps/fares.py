@@ -0,0 +1,124 @@
+"""
+Offline Route and Fare Estimation
+
+Estimates driving distance and duration from straight-line (Haversine)
+distance, a road factor and an average speed adjusted per time-of-day band,
+and prices them with a distance/time tariff. Fare quotes need no Google call;
+the Distance Matrix is only used when an exact route is requested.
+
+Calibration: MAPS_ROAD_FACTOR is the typical ratio of road distance to
+straight-line distance, MAPS_FALLBACK_SPEED_KMH the off-peak average speed.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.maps import geo
+
+# (first hour, end hour, speed multiplier) in local time on weekdays; other hours use 1.0
+_WEEKDAY_SPEED_BANDS = (
+    (6, 9, 0.7),    # Morning peak (school and work runs)
+    (12, 14, 0.9),  # Lunch
+    (16, 19, 0.7),  # Evening peak
+    (21, 24, 1.25),  # Night
+    (0, 6, 1.25),
+)
+
+# Weekends have no peaks, only faster nights
+_WEEKEND_SPEED_BANDS = (
+    (21, 24, 1.25),
+    (0, 6, 1.25),
+)
+
+
+@dataclass(frozen=True)
+class Tariff:
+    """Fare = base + per km + per minute, never below the minimum"""
+    base_fare: float
+    per_km: float = 0.0
+    per_minute: float = 0.0
+    minimum_fare: float = 0.0
+    
+    def price(self, distance_km: float, duration_seconds: float) -> float:
+        fare = self.base_fare + self.per_km * distance_km + self.per_minute * duration_seconds / 60
+        return round(max(self.minimum_fare, fare), 2)
+
+
+def default_tariff(base_fare: float) -> Tariff:
+    """Tariff from settings with the given base fare"""
+    return Tariff(
+        base_fare=base_fare,
+        per_km=settings.FARE_PER_KM,
+        per_minute=settings.FARE_PER_MINUTE,
+        minimum_fare=settings.FARE_MINIMUM
+    )
+
+
+def local_time(now: Optional[datetime] = None) -> datetime:
+    """Current time in the service area's local time (MAPS_UTC_OFFSET_HOURS)"""
+    now = now or datetime.now(timezone.utc)
+    return now + timedelta(hours=settings.MAPS_UTC_OFFSET_HOURS)
+
+
+def average_speed_kmh(now: Optional[datetime] = None) -> float:
+    """Average driving speed for the current time-of-day band"""
+    local = local_time(now)
+    bands = _WEEKEND_SPEED_BANDS if local.weekday() >= 5 else _WEEKDAY_SPEED_BANDS
+    for start, end, multiplier in bands:
+        if start <= local.hour < end:
+            return settings.MAPS_FALLBACK_SPEED_KMH * multiplier
+    return settings.MAPS_FALLBACK_SPEED_KMH
+
+
+def estimate_routes(
+    origins: List[Tuple[float, float]],
+    destination: Tuple[float, float],
+    now: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """
+    Estimated driving distance and duration from many origins to one destination
+    
+    Computed in one vectorized pass. Results have the same shape as
+    MapsService.calculate_distance() plus estimated=True.
+    """
+    distances = geo.distances_km(
+        [origin[0] for origin in origins],
+        [origin[1] for origin in origins],
+        destination[0],
+        destination[1]
+    ) * settings.MAPS_ROAD_FACTOR
+    speed_kmh = average_speed_kmh(now)
+    return [_route_estimate(distance_km, speed_kmh) for distance_km in distances.tolist()]
+
+
+def estimate_route(
+    origin: Tuple[float, float],
+    destination: Tuple[float, float],
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """Estimated driving distance and duration between two points"""
+    distance_km = geo.haversine_km(origin[0], origin[1], destination[0], destination[1]) * settings.MAPS_ROAD_FACTOR
+    return _route_estimate(distance_km, average_speed_kmh(now))
+
+
+def _route_estimate(distance_km: float, speed_kmh: float) -> Dict[str, Any]:
+    duration_seconds = int(round(distance_km / speed_kmh * 3600))
+    return {
+        "distance_km": round(distance_km, 2),
+        "duration_seconds": duration_seconds,
+        "distance_text": f"{distance_km:.1f} km",
+        "duration_text": f"{max(1, round(duration_seconds / 60))} mins",
+        "estimated": True
+    }
+
+
+def quote(distance_info: Dict[str, Any], tariff: Tariff) -> Dict[str, Any]:
+    """Fare quote for a route (from estimate_route() or the Distance Matrix)"""
+    return {
+        "estimated_fare": tariff.price(distance_info["distance_km"], distance_info["duration_seconds"]),
+        "base_fare": tariff.base_fare,
+        "distance_km": distance_info["distance_km"],
+        "duration_minutes": distance_info["duration_seconds"] / 60,
+        "currency": "NAD",
+        "estimated": distance_info.get("estimated", False)
+    }
@@ -0,0 +1,148 @@
+"""
+Geohash Encoding and Radius Cover Utilities
+
+Driver documents store a geohash of their location so nearby searches can
+query a handful of geohash prefix ranges instead of every online driver.
+"""
+import math
+from typing import List, Tuple
+
+# Geohash base32 alphabet
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Precision stored on driver documents (~4.8m x 4.8m cells)
+DRIVER_GEOHASH_PRECISION = 9
+
+# Character sorting after every base32 character, used as a prefix range end
+PREFIX_RANGE_END = "~"
+
+# Approximate kilometers per degree of latitude
+_KM_PER_DEGREE_LAT = 110.574
+_KM_PER_DEGREE_LON_EQUATOR = 111.320
+
+
+def encode(latitude: float, longitude: float, precision: int = DRIVER_GEOHASH_PRECISION) -> str:
+    """
+    Encode coordinates as a geohash string
+    
+    Args:
+        latitude: Latitude (-90 to 90)
+        longitude: Longitude (-180 to 180)
+        precision: Number of geohash characters
+    
+    Returns:
+        Geohash string
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    
+    chars = []
+    bits = 0
+    bit_count = 0
+    even_bit = True
+    
+    while len(chars) < precision:
+        if even_bit:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits = bits << 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits = bits << 1
+                lat_range[1] = mid
+        
+        even_bit = not even_bit
+        bit_count += 1
+        
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    
+    return "".join(chars)
+
+
+def cell_size_degrees(precision: int) -> Tuple[float, float]:
+    """
+    Get the (latitude, longitude) span in degrees of a geohash cell
+    
+    Args:
+        precision: Number of geohash characters
+    
+    Returns:
+        Tuple of (latitude span, longitude span)
+    """
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def cell_size_km(precision: int, latitude: float) -> Tuple[float, float]:
+    """
+    Get the approximate (height, width) in kilometers of a geohash cell
+    
+    Args:
+        precision: Number of geohash characters
+        latitude: Latitude at which the width is measured
+    
+    Returns:
+        Tuple of (height km, width km)
+    """
+    lat_span, lon_span = cell_size_degrees(precision)
+    km_per_degree_lon = _KM_PER_DEGREE_LON_EQUATOR * math.cos(math.radians(latitude))
+    return lat_span * _KM_PER_DEGREE_LAT, lon_span * km_per_degree_lon
+
+
+def precision_for_radius(latitude: float, radius_km: float) -> int:
+    """
+    Get the finest precision whose cells are at least radius_km / 2 on each side
+    
+    With cells at least half the radius, the circle around any point always
+    fits inside the 5x5 block of cells centered on that point. Half-radius
+    cells keep the covered area close to the circle: a 3x3 cover of
+    radius-sized cells often has to drop to the next coarser precision,
+    which is 32 times the area.
+    """
+    for precision in range(DRIVER_GEOHASH_PRECISION, 0, -1):
+        height_km, width_km = cell_size_km(precision, latitude)
+        if min(height_km, width_km) >= radius_km / 2:
+            return precision
+    return 1
+
+
+def covering_cells(latitude: float, longitude: float, radius_km: float) -> List[str]:
+    """
+    Get the geohash cells covering a circle
+    
+    Args:
+        latitude: Center latitude
+        longitude: Center longitude
+        radius_km: Circle radius in kilometers
+    
+    Returns:
+        De-duplicated list of geohash prefixes (center cell and two rings of neighbors)
+    """
+    precision = precision_for_radius(latitude, radius_km)
+    lat_span, lon_span = cell_size_degrees(precision)
+    
+    cells: List[str] = []
+    for lat_step in (-2, -1, 0, 1, 2):
+        cell_lat = max(-90.0, min(90.0, latitude + lat_step * lat_span))
+        for lon_step in (-2, -1, 0, 1, 2):
+            cell_lon = longitude + lon_step * lon_span
+            # Wrap across the antimeridian
+            cell_lon = ((cell_lon + 180.0) % 360.0) - 180.0
+            cell = encode(cell_lat, cell_lon, precision)
+            if cell not in cells:
+                cells.append(cell)
+    
+    return cells
@@ -1,21 +1,36 @@
 """
 Google Maps Service
 """
-from typing import Dict, Any, Optional, Tuple
-import googlemaps
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple
 from app.core.config import settings
 from app.core.logging import logger
+from app.core.metrics import register_metrics
+from app.maps import fares
+from app.maps.cache import (
+    address_key,
+    coordinates_key,
+    geocode_cache,
+    reverse_geocode_cache,
+    route_cache,
+    route_key
+)
+from app.maps.client import MapsClient, create_maps_client
+
+# Distance Matrix limit of origins per request
+DISTANCE_MATRIX_MAX_ORIGINS = 25
 
 
 class MapsService:
     """Service for Google Maps API operations"""
     
     def __init__(self):
-        self.client: Optional[googlemaps.Client] = None
+        self.client: Optional[MapsClient] = None
         
         if settings.GOOGLE_MAPS_API_KEY:
             try:
-                self.client = googlemaps.Client(key=settings.GOOGLE_MAPS_API_KEY)
+                self.client = create_maps_client(settings.GOOGLE_MAPS_API_KEY)
+                register_metrics("maps_client", self.client.metrics)
                 logger.info("Google Maps client initialized")
             except Exception as e:
                 logger.error(f"Failed to initialize Google Maps client: {str(e)}")
@@ -26,6 +41,8 @@ class MapsService:
         """
         Geocode an address to coordinates
         
+        Results are cached by normalized address.
+        
         Args:
             address: Address string
             
@@ -36,17 +53,24 @@ class MapsService:
             logger.warning("Google Maps client not available")
             return None
         
+        cache_key = address_key(address)
+        cached = await geocode_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
         try:
-            geocode_result = self.client.geocode(address)
+            geocode_result = await self.client.geocode(address)
             
             if geocode_result:
                 location = geocode_result[0]["geometry"]["location"]
-                return {
+                geocode = {
                     "latitude": location["lat"],
                     "longitude": location["lng"],
                     "formatted_address": geocode_result[0]["formatted_address"],
                     "place_id": geocode_result[0].get("place_id")
                 }
+                await geocode_cache.set(cache_key, geocode)
+                return dict(geocode)
             
             return None
             
@@ -62,6 +86,8 @@ class MapsService:
         """
         Reverse geocode coordinates to address
         
+        Results are cached per MAPS_GEOCODE_GEOHASH_PRECISION geohash cell.
+        
         Args:
             latitude: Latitude
             longitude: Longitude
@@ -73,14 +99,21 @@ class MapsService:
             logger.warning("Google Maps client not available")
             return None
         
+        cache_key = coordinates_key(latitude, longitude)
+        cached = await reverse_geocode_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
         try:
-            reverse_geocode_result = self.client.reverse_geocode((latitude, longitude))
+            reverse_geocode_result = await self.client.reverse_geocode((latitude, longitude))
             
             if reverse_geocode_result:
-                return {
+                address = {
                     "formatted_address": reverse_geocode_result[0]["formatted_address"],
                     "place_id": reverse_geocode_result[0].get("place_id")
                 }
+                await reverse_geocode_cache.set(cache_key, address)
+                return dict(address)
             
             return None
             
@@ -96,6 +129,8 @@ class MapsService:
         """
         Calculate distance and duration between two points
         
+        Results are cached per snapped origin/destination and time-of-day band.
+        
         Args:
             origin: (latitude, longitude) tuple
             destination: (latitude, longitude) tuple
@@ -113,8 +148,13 @@ class MapsService:
                 "duration_text": "0 mins"
             }
         
+        cache_key = route_key(origin, destination)
+        cached = await route_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
         try:
-            result = self.client.distance_matrix(
+            result = await self.client.distance_matrix(
                 origins=[origin],
                 destinations=[destination],
                 mode="driving"
@@ -127,12 +167,14 @@ class MapsService:
                     distance = element["distance"]["value"] / 1000  # Convert to km
                     duration = element["duration"]["value"]  # In seconds
                     
-                    return {
+                    distance_info = {
                         "distance_km": distance,
                         "duration_seconds": duration,
                         "distance_text": element["distance"]["text"],
                         "duration_text": element["duration"]["text"]
                     }
+                    await route_cache.set(cache_key, distance_info)
+                    return dict(distance_info)
             
             return None
             
@@ -140,50 +182,115 @@ class MapsService:
             logger.error(f"Error calculating distance: {str(e)}")
             return None
     
+    async def calculate_etas(
+        self,
+        origins: List[Tuple[float, float]],
+        destination: Tuple[float, float]
+    ) -> List[Dict[str, Any]]:
+        """
+        Driving distance and duration from many origins to one destination
+        
+        Cached routes are served locally; the rest are packed 25 origins per
+        distance_matrix request, with at most MAPS_MAX_CONCURRENT_REQUESTS
+        requests in flight. Origins Google cannot route (or all of them when
+        the client is unavailable) get a straight-line estimate instead.
+        
+        Args:
+            origins: (latitude, longitude) tuples, e.g. driver locations
+            destination: (latitude, longitude) tuple, e.g. the pickup
+            
+        Returns:
+            One dict per origin, in input order, with distance_km,
+            duration_seconds, distance_text, duration_text and estimated
+            (True for straight-line estimates)
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(origins)
+        keys = [route_key(origin, destination) for origin in origins]
+        
+        cached = await asyncio.gather(*[route_cache.get(key) for key in keys])
+        missing = []
+        for index, value in enumerate(cached):
+            if value is not None:
+                results[index] = {**value, "estimated": False}
+            else:
+                missing.append(index)
+        
+        if missing and self.client:
+            semaphore = asyncio.Semaphore(settings.MAPS_MAX_CONCURRENT_REQUESTS)
+            
+            async def fetch_chunk(indexes: List[int]) -> None:
+                async with semaphore:
+                    try:
+                        result = await self.client.distance_matrix(
+                            origins=[origins[index] for index in indexes],
+                            destinations=[destination],
+                            mode="driving"
+                        )
+                    except Exception as e:
+                        logger.error(f"Error calculating ETAs for {len(indexes)} origins: {str(e)}")
+                        return
+                
+                for index, row in zip(indexes, result.get("rows", [])):
+                    element = row["elements"][0]
+                    if element["status"] != "OK":
+                        continue
+                    distance_info = {
+                        "distance_km": element["distance"]["value"] / 1000,
+                        "duration_seconds": element["duration"]["value"],
+                        "distance_text": element["distance"]["text"],
+                        "duration_text": element["duration"]["text"]
+                    }
+                    await route_cache.set(keys[index], distance_info)
+                    results[index] = {**distance_info, "estimated": False}
+            
+            await asyncio.gather(*[
+                fetch_chunk(missing[i:i + DISTANCE_MATRIX_MAX_ORIGINS])
+                for i in range(0, len(missing), DISTANCE_MATRIX_MAX_ORIGINS)
+            ])
+        
+        unresolved = [index for index, value in enumerate(results) if value is None]
+        if unresolved:
+            estimates = fares.estimate_routes([origins[index] for index in unresolved], destination)
+            for index, estimate in zip(unresolved, estimates):
+                results[index] = estimate
+        
+        return results
+    
     async def calculate_fare(
         self,
         pickup_location: Dict[str, float],
         dropoff_location: Dict[str, float],
-        base_fare: float = 13.00
+        base_fare: float = 13.00,
+        exact_route: bool = False
     ) -> Dict[str, Any]:
         """
         Calculate fare for a ride
         
+        Priced from a local distance/duration estimate by default, which needs
+        no Google call. With exact_route the Distance Matrix route is used
+        (falling back to the estimate if it is unavailable).
+        
         Args:
             pickup_location: Dict with latitude and longitude
             dropoff_location: Dict with latitude and longitude
             base_fare: Base fare amount (default NAD 13.00)
+            exact_route: Price the Google driving route instead of the estimate
             
         Returns:
             Dict with fare information
         """
+        tariff = fares.default_tariff(base_fare)
         try:
             origin = (pickup_location["latitude"], pickup_location["longitude"])
             destination = (dropoff_location["latitude"], dropoff_location["longitude"])
             
-            distance_info = await self.calculate_distance(origin, destination)
+            distance_info = None
+            if exact_route and self.client:
+                distance_info = await self.calculate_distance(origin, destination)
+            if not distance_info:
+                distance_info = fares.estimate_route(origin, destination)
             
-            if distance_info:
-                # For now, use base fare regardless of distance
-                # In production, could add distance-based pricing
-                fare = base_fare
-                
-                return {
-                    "estimated_fare": fare,
-                    "base_fare": base_fare,
-                    "distance_km": distance_info.get("distance_km", 0),
-                    "duration_minutes": distance_info.get("duration_seconds", 0) / 60,
-                    "currency": "NAD"
-                }
-            else:
-                # Return base fare if distance calculation fails
-                return {
-                    "estimated_fare": base_fare,
-                    "base_fare": base_fare,
-                    "distance_km": 0,
-                    "duration_minutes": 0,
-                    "currency": "NAD"
-                }
+            return fares.quote(distance_info, tariff)
                 
         except Exception as e:
             logger.error(f"Error calculating fare: {str(e)}")
@@ -214,7 +321,7 @@ class MapsService:
             return None
         
         try:
-            directions_result = self.client.directions(
+            directions_result = await self.client.directions(
                 origin=origin,
                 destination=destination,
                 mode="driving"
@@ -245,6 +352,11 @@ class MapsService:
             logger.error(f"Error getting directions: {str(e)}")
             return None
 
+    async def close(self) -> None:
+        """Close the Maps client's pooled connections"""
+        if self.client:
+            await self.client.aclose()
+
 
 # Global maps service instance
 maps_service = MapsService()
@@ -2,20 +2,58 @@
 Firebase Cloud Messaging (FCM) Service
 Uses FCM HTTP v1 API with service account credentials (OAuth2)
 """
-from typing import List, Optional, Dict, Any
+import asyncio
+import time
+from typing import List, Optional, Dict, Any, Set, Tuple
 from firebase_admin import firestore, messaging
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.core.firebase import get_firebase_app
-from app.core.firebase import get_firestore
+from app.core.firebase import get_async_firestore
+from app.core.executors import run_blocking
+from app.core.firestore_utils import get_documents, unique_ids
 from app.core.logging import logger
+from app.core.metrics import register_metrics
+from app.notifications.payloads import to_fcm_data
+
+# Maximum messages per messaging.send_each call (FCM limit)
+SEND_EACH_BATCH_SIZE = 500
+
+# Maximum writes per Firestore batch commit
+_WRITE_BATCH_SIZE = 500
+
+# Per-recipient send results
+SENT = "sent"
+NO_DEVICE = "no_device"  # No registered or only invalid device tokens: retrying cannot help
+FAILED = "failed"  # Transient send error: worth retrying
 
 
 class FCMService:
     """Service for FCM push notifications using HTTP v1 API"""
     
     def __init__(self):
-        self.db = get_firestore()
+        self.db = get_async_firestore()
         self._initialized = False
         
+        # Device tokens per user: {"tokens": [...], "legacy": str | None, "loadedAt": monotonic}
+        self._token_cache = TTLCache(
+            name="fcm_tokens",
+            max_entries=settings.FCM_TOKEN_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.FCM_TOKEN_CACHE_TTL_SECONDS
+        )
+        # Generation of each user's token document, bumped whenever it is written,
+        # so a load that started before a write does not cache the old tokens
+        self._generations = TTLCache(
+            name="fcm_token_generations",
+            max_entries=settings.FCM_TOKEN_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.FCM_TOKEN_CACHE_TTL_SECONDS
+        )
+        self._generation = 0
+        self._refreshing: Set[str] = set()
+        self._refresh_tasks: Set[asyncio.Task] = set()
+        self._refreshes = 0
+        self._pruned_tokens = 0
+        
         # Verify Firebase is initialized (uses service account credentials)
         try:
             app = get_firebase_app()
@@ -28,30 +66,120 @@ class FCMService:
             logger.warning(f"FCM initialization failed: {str(e)}")
     
     async def get_fcm_token(self, user_id: str) -> Optional[str]:
-        """Get FCM token for a user"""
+        """Get the most recently registered FCM token for a user"""
+        tokens = await self.get_fcm_tokens([user_id])
+        user_tokens = tokens.get(user_id)
+        return user_tokens[-1] if user_tokens else None
+    
+    async def get_fcm_tokens(self, user_ids: List[str]) -> Dict[str, List[str]]:
+        """
+        Get the FCM device tokens of several users
+        
+        Served from the token cache; misses are loaded with one batched read.
+        Entries older than FCM_TOKEN_REFRESH_AFTER_SECONDS are still served
+        and reloaded in the background, so hot recipients never wait on
+        Firestore.
+        
+        Returns:
+            Dict mapping user_id to device tokens, for users that have any
+        
+        Raises:
+            Exception: If token documents missing from the cache could not be read
+        """
+        entries = await self._get_token_entries(user_ids)
+        return {
+            user_id: list(entry["tokens"])
+            for user_id, entry in entries.items()
+            if entry["tokens"]
+        }
+    
+    async def _get_token_entries(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Token cache entries of several users (see get_fcm_tokens), including users without tokens"""
+        ids = unique_ids(user_ids)
+        entries: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        stale: List[str] = []
+        now = time.monotonic()
+        
+        for user_id in ids:
+            entry = self._token_cache.get(user_id)
+            if entry is None:
+                missing.append(user_id)
+                continue
+            entries[user_id] = entry
+            if now - entry["loadedAt"] >= settings.FCM_TOKEN_REFRESH_AFTER_SECONDS:
+                stale.append(user_id)
+        
+        if missing:
+            entries.update(await self._load_tokens(missing))
+        if stale:
+            self._schedule_refresh(stale)
+        
+        return entries
+    
+    async def _load_tokens(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Read token documents with one batched read and cache them (including users without tokens)"""
+        started_at_generation = self._generation
         try:
-            doc_ref = self.db.collection("fcm_tokens").document(user_id)
-            doc = doc_ref.get()
-            
-            if doc.exists:
-                data = doc.to_dict()
-                return data.get("token")
-            
-            return None
-            
+            documents = await get_documents(self.db, self.db.collection("fcm_tokens"), user_ids)
         except Exception as e:
-            logger.error(f"Error getting FCM token: {str(e)}")
-            return None
+            logger.error(f"Error getting FCM tokens: {str(e)}")
+            raise
+        
+        loaded_at = time.monotonic()
+        entries = {}
+        for user_id in user_ids:
+            data = documents.get(user_id) or {}
+            legacy = data.get("token")
+            # Documents written before multi-device support only have "token"
+            tokens = list(dict.fromkeys(
+                token for token in [*(data.get("tokens") or []), legacy] if token
+            ))
+            entry = {"tokens": tokens, "legacy": legacy, "loadedAt": loaded_at}
+            # Skip caching if the document was written while the read was in flight
+            if self._generations.get(user_id, 0) <= started_at_generation:
+                self._token_cache.set(user_id, entry)
+            entries[user_id] = entry
+        return entries
+    
+    def _invalidate_tokens(self, user_id: str) -> None:
+        """Drop a user's cached tokens after writing their token document"""
+        self._generation += 1
+        self._generations.set(user_id, self._generation)
+        self._token_cache.invalidate(user_id)
+    
+    def _schedule_refresh(self, user_ids: List[str]) -> None:
+        """Reload cached tokens in the background"""
+        ids = [user_id for user_id in user_ids if user_id not in self._refreshing]
+        if not ids:
+            return
+        
+        self._refreshing.update(ids)
+        self._refreshes += 1
+        
+        async def refresh() -> None:
+            try:
+                await self._load_tokens(ids)
+            except Exception:
+                # Already logged; the cached tokens keep being served
+                pass
+            finally:
+                self._refreshing.difference_update(ids)
+        
+        task = asyncio.create_task(refresh())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
     
     async def save_fcm_token(self, user_id: str, token: str) -> None:
-        """Save FCM token for a user"""
+        """Register a device token for a user (a user may have several devices)"""
         try:
             doc_ref = self.db.collection("fcm_tokens").document(user_id)
-            doc_ref.set({
-                "token": token,
+            await doc_ref.set({
+                "tokens": firestore.ArrayUnion([token]),
                 "userId": user_id,
                 "updatedAt": firestore.SERVER_TIMESTAMP
-            })
+            }, merge=True)
+            self._invalidate_tokens(user_id)
             
         except Exception as e:
             logger.error(f"Error saving FCM token: {str(e)}")
@@ -61,94 +189,202 @@ class FCMService:
         user_id: str,
         title: str,
         body: str,
-        data: Optional[Dict[str, Any]] = None
-    ) -> bool:
+        data: Optional[Dict[str, Any]] = None,
+        collapse_key: Optional[str] = None
+    ) -> str:
         """
-        Send push notification to a single user
+        Send push notification to all devices of a single user
         
         Args:
             user_id: Target user ID
             title: Notification title
             body: Notification body
             data: Optional data payload
+            collapse_key: Newer notifications with the same key replace older ones on the device
             
         Returns:
-            True if sent successfully, False otherwise
+            SENT if sent to at least one device, NO_DEVICE if the user has no valid
+            device token, FAILED otherwise
         """
-        try:
-            token = await self.get_fcm_token(user_id)
-            
-            if not token:
-                logger.warning(f"No FCM token found for user {user_id}")
-                return False
-            
-            if not self._initialized:
-                logger.info(f"FCM not configured - would send to {user_id}: {title} - {body}")
-                return True  # Return True in dev mode
-            
-            # Build FCM message using HTTP v1 API
-            message = messaging.Message(
-                token=token,
-                notification=messaging.Notification(
-                    title=title,
-                    body=body
-                ),
-                data={str(k): str(v) for k, v in (data or {}).items()} if data else None
-            )
-            
-            # Send message using service account credentials (OAuth2)
-            response = messaging.send(message)
-            logger.info(f"Notification sent to {user_id}, message ID: {response}")
-            return True
-                
-        except messaging.UnregisteredError:
-            # Token is invalid or unregistered - remove it
-            logger.warning(f"FCM token invalid for user {user_id}, removing token")
-            try:
-                doc_ref = self.db.collection("fcm_tokens").document(user_id)
-                doc_ref.delete()
-            except Exception as delete_error:
-                logger.error(f"Error deleting invalid token: {str(delete_error)}")
-            return False
-        except messaging.InvalidArgumentError as e:
-            logger.error(f"Invalid FCM message arguments: {str(e)}")
-            return False
-        except Exception as e:
-            logger.error(f"Error sending notification: {str(e)}")
-            return False
+        results = await self.send_notifications([user_id], title, body, data, collapse_key)
+        return results.get(user_id, FAILED)
     
     async def send_notifications(
         self,
         user_ids: List[str],
         title: str,
         body: str,
-        data: Optional[Dict[str, Any]] = None
-    ) -> Dict[str, bool]:
+        data: Optional[Dict[str, Any]] = None,
+        collapse_key: Optional[str] = None
+    ) -> Dict[str, str]:
         """
-        Send push notifications to multiple users
+        Send push notifications to all devices of multiple users
+        
+        Tokens come from the token cache (misses loaded with one batched read),
+        messages go out through messaging.send_each in batches of up to 500 (a
+        few batches in flight at once), and tokens reported as unregistered are
+        removed with batched writes.
         
         Returns:
-            Dict mapping user_id to success status
+            Dict mapping user_id to SENT (sent to at least one device), NO_DEVICE
+            (no token, or every token was rejected as invalid) or FAILED
         """
-        results = {}
+        recipients = unique_ids(user_ids)
+        results = {user_id: FAILED for user_id in recipients}
+        try:
+            entries = await self._get_token_entries(recipients)
+        except Exception:
+            # Tokens unknown: report FAILED so callers retry
+            return results
+        tokens = {user_id: list(entry["tokens"]) for user_id, entry in entries.items() if entry["tokens"]}
         
-        for user_id in user_ids:
-            success = await self.send_notification(user_id, title, body, data)
-            results[user_id] = success
+        missing = [user_id for user_id in recipients if user_id not in tokens]
+        if missing:
+            logger.warning(f"No FCM token found for {len(missing)} of {len(recipients)} users")
+            results.update({user_id: NO_DEVICE for user_id in missing})
+        
+        if not tokens:
+            return results
+        
+        if not self._initialized:
+            logger.info(f"FCM not configured - would send to {len(tokens)} users: {title} - {body}")
+            results.update({user_id: SENT for user_id in tokens})
+            return results  # Report SENT in dev mode
+        
+        notification = messaging.Notification(title=title, body=body)
+        payload = to_fcm_data(data)
+        android = apns = None
+        if collapse_key:
+            android = messaging.AndroidConfig(
+                collapse_key=collapse_key,
+                notification=messaging.AndroidNotification(tag=collapse_key)
+            )
+            apns = messaging.APNSConfig(headers={"apns-collapse-id": collapse_key})
+        messages = [
+            (user_id, token, messaging.Message(
+                token=token,
+                notification=notification,
+                data=payload,
+                android=android,
+                apns=apns
+            ))
+            for user_id, user_tokens in tokens.items()
+            for token in user_tokens
+        ]
+        
+        semaphore = asyncio.Semaphore(settings.FCM_MAX_CONCURRENT_BATCHES)
+        
+        async def send_batch(batch: List[Tuple[str, str, messaging.Message]]) -> List[Tuple[str, str, bool, bool]]:
+            async with semaphore:
+                return await self._send_batch(batch)
+        
+        batch_results = await asyncio.gather(*[
+            send_batch(messages[i:i + SEND_EACH_BATCH_SIZE])
+            for i in range(0, len(messages), SEND_EACH_BATCH_SIZE)
+        ])
+        
+        # Stale tokens per user, with the legacy token the tokens were loaded with
+        stale_tokens: Dict[str, Tuple[List[str], Optional[str]]] = {}
+        for batch in batch_results:
+            for user_id, token, success, stale in batch:
+                if success:
+                    results[user_id] = SENT
+                if stale:
+                    stale_tokens.setdefault(user_id, ([], entries[user_id]["legacy"]))[0].append(token)
+        
+        for user_id, (user_stale_tokens, _) in stale_tokens.items():
+            if results[user_id] != SENT and len(user_stale_tokens) == len(tokens[user_id]):
+                results[user_id] = NO_DEVICE
+        
+        if stale_tokens:
+            await self.remove_fcm_tokens(stale_tokens)
+        
+        sent = sum(1 for result in results.values() if result == SENT)
+        logger.info(f"Notification sent to {sent}/{len(recipients)} users ({len(messages)} devices)")
+        return results
+    
+    async def _send_batch(
+        self,
+        batch: List[Tuple[str, str, messaging.Message]]
+    ) -> List[Tuple[str, str, bool, bool]]:
+        """
+        Send one batch of messages with messaging.send_each
+        
+        Returns:
+            List of (user_id, token, success, token_is_stale) in batch order
+        """
+        try:
+            response = await run_blocking("fcm", messaging.send_each, [message for _, _, message in batch])
+        except Exception as e:
+            logger.error(f"Error sending notification batch of {len(batch)}: {str(e)}")
+            return [(user_id, token, False, False) for user_id, token, _ in batch]
+        
+        results = []
+        for (user_id, token, _), send_response in zip(batch, response.responses):
+            if send_response.success:
+                results.append((user_id, token, True, False))
+                continue
+            
+            error = send_response.exception
+            stale = isinstance(error, (messaging.UnregisteredError, messaging.SenderIdMismatchError))
+            if not stale:
+                logger.warning(f"FCM send to {user_id} failed: {str(error)}")
+            results.append((user_id, token, False, stale))
         
         return results
     
+    async def remove_fcm_tokens(self, tokens_by_user: Dict[str, Tuple[List[str], Optional[str]]]) -> None:
+        """
+        Remove invalid device tokens with batched writes and drop the users' cached tokens
+        
+        Args:
+            tokens_by_user: Dict mapping user_id to (invalid tokens, legacy "token"
+                field value the tokens were loaded with); the legacy field is only
+                deleted when that value is among the invalid tokens
+        """
+        user_ids = list(tokens_by_user)
+        self._pruned_tokens += sum(len(tokens) for tokens, _ in tokens_by_user.values())
+        logger.warning(f"Removing invalid FCM tokens for {len(user_ids)} users")
+        try:
+            collection = self.db.collection("fcm_tokens")
+            for i in range(0, len(user_ids), _WRITE_BATCH_SIZE):
+                batch = self.db.batch()
+                for user_id in user_ids[i:i + _WRITE_BATCH_SIZE]:
+                    tokens, legacy = tokens_by_user[user_id]
+                    updates: Dict[str, Any] = {"tokens": firestore.ArrayRemove(tokens)}
+                    if legacy is not None and legacy in tokens:
+                        updates["token"] = firestore.DELETE_FIELD
+                    batch.update(collection.document(user_id), updates)
+                await batch.commit()
+            
+        except Exception as e:
+            logger.error(f"Error deleting invalid tokens: {str(e)}")
+        finally:
+            for user_id in user_ids:
+                self._invalidate_tokens(user_id)
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of token cache counters"""
+        return {
+            **self._token_cache.metrics(),
+            "refreshes": self._refreshes,
+            "refreshing": len(self._refreshing),
+            "pruned_tokens": self._pruned_tokens,
+        }
+    
     async def send_to_drivers(
         self,
         driver_ids: List[str],
         title: str,
         body: str,
-        data: Optional[Dict[str, Any]] = None
-    ) -> Dict[str, bool]:
+        data: Optional[Dict[str, Any]] = None,
+        collapse_key: Optional[str] = None
+    ) -> Dict[str, str]:
         """Send notifications to multiple drivers"""
-        return await self.send_notifications(driver_ids, title, body, data)
+        return await self.send_notifications(driver_ids, title, body, data, collapse_key)
 
 
 # Global FCM service instance
 fcm_service = FCMService()
+register_metrics("fcm", fcm_service.metrics)
 
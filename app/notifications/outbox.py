@@ -0,0 +1,404 @@
+"""
+Notification Outbox
+
+Request handlers enqueue notification jobs instead of delivering them inline,
+so an HTTP response returns as soon as its own write is done. Background
+workers drain the queue, retry failed jobs with exponential backoff and jitter,
+and track delivery latency and failures separately from request latency.
+
+Entries are also written to the `notification_outbox` collection (unless
+NOTIFICATION_OUTBOX_PERSIST is off). Delivered entries are deleted, entries
+that exhaust their attempts are kept with status "failed", and pending entries
+left behind by a crashed or restarted worker are re-claimed by a periodic
+sweep. Delivery is at-least-once.
+"""
+import asyncio
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from firebase_admin import firestore
+from app.core.config import settings
+from app.core.firebase import get_async_firestore
+from app.core.logging import logger
+from app.core.metrics import register_metrics
+
+OutboxHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Pending entries re-claimed per sweep
+_SWEEP_BATCH_SIZE = 100
+
+
+class DeliveryError(Exception):
+    """Raised by a handler to have its job retried"""
+
+
+@dataclass
+class OutboxEntry:
+    """One queued notification job"""
+    
+    id: str
+    kind: str
+    payload: Dict[str, Any]
+    enqueued_at: float  # Unix time, for end-to-end delivery latency
+    attempts: int = 0
+
+
+class NotificationOutbox:
+    """Queue of notification jobs drained by background workers"""
+    
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        max_attempts: int,
+        backoff_seconds: float,
+        max_backoff_seconds: float,
+        persist: bool,
+        sweep_interval_seconds: float,
+        stale_seconds: float,
+        drain_timeout_seconds: float
+    ):
+        """
+        Args:
+            workers: Number of worker tasks
+            max_queue: Jobs waiting in memory before new ones are left to the sweep
+            max_attempts: Attempts per job before it is marked failed
+            backoff_seconds: Delay before the first retry, doubled per attempt
+            max_backoff_seconds: Upper bound of the retry delay
+            persist: Write jobs to Firestore so they survive restarts
+            sweep_interval_seconds: How often stale pending jobs are re-claimed
+            stale_seconds: Age after which an untouched pending job is re-claimed
+            drain_timeout_seconds: Time allowed on shutdown to finish queued jobs
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.persist = persist
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.stale_seconds = stale_seconds
+        self.drain_timeout_seconds = drain_timeout_seconds
+        self.collection = "notification_outbox"
+        
+        self._handlers: Dict[str, OutboxHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: Set[asyncio.Task] = set()
+        self._background_tasks: Set[asyncio.Task] = set()
+        self._sweep_task: Optional[asyncio.Task] = None
+        self._running = False
+        
+        # Entries owned by this process (queued, in flight or waiting to retry)
+        self._owned: Set[str] = set()
+        
+        # Counters
+        self._enqueued = 0
+        self._delivered = 0
+        self._failed = 0
+        self._retries = 0
+        self._overflow = 0
+        self._reclaimed = 0
+        self._store_errors = 0
+        self._total_latency_seconds = 0.0
+        self._max_latency_seconds = 0.0
+        self._by_kind: Dict[str, Dict[str, int]] = {}
+    
+    def register_handler(self, kind: str, handler: OutboxHandler) -> None:
+        """
+        Register the coroutine function delivering jobs of one kind
+        
+        The handler receives the job payload. Raising any exception makes the
+        job retry until max_attempts is reached.
+        """
+        self._handlers[kind] = handler
+    
+    async def enqueue(self, kind: str, payload: Dict[str, Any]) -> str:
+        """
+        Queue a notification job for background delivery
+        
+        Args:
+            kind: Registered handler name
+            payload: JSON-serializable job data passed to the handler
+        
+        Returns:
+            Outbox entry ID
+        """
+        entry = OutboxEntry(
+            id=str(uuid.uuid4()),
+            kind=kind,
+            payload=payload,
+            enqueued_at=time.time()
+        )
+        self._enqueued += 1
+        
+        if self.persist:
+            try:
+                await self._document(entry.id).set({
+                    "id": entry.id,
+                    "kind": kind,
+                    "payload": payload,
+                    "status": "pending",
+                    "attempts": 0,
+                    "enqueuedAt": entry.enqueued_at,
+                    "createdAt": firestore.SERVER_TIMESTAMP,
+                    "updatedAt": firestore.SERVER_TIMESTAMP
+                })
+            except Exception as e:
+                # Still deliver from memory, only durability is lost
+                self._store_errors += 1
+                logger.error(f"Error persisting outbox entry {entry.id} ({kind}): {str(e)}")
+        
+        self._submit(entry)
+        return entry.id
+    
+    def _submit(self, entry: OutboxEntry) -> None:
+        """Hand an entry to the workers (or process it in a task if they are not running)"""
+        self._owned.add(entry.id)
+        
+        if not self._running:
+            self._spawn(self._process(entry))
+            return
+        
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self._overflow += 1
+            self._owned.discard(entry.id)
+            if self.persist:
+                logger.warning(f"Notification outbox full - entry {entry.id} left for the sweep")
+            else:
+                logger.error(f"Notification outbox full - dropping {entry.kind} entry {entry.id}")
+    
+    def _spawn(self, coro: Awaitable[None]) -> None:
+        """Run a coroutine as a tracked background task"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def start(self) -> None:
+        """Start the worker tasks and the stale-entry sweep"""
+        if self._running:
+            return
+        
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._running = True
+        for index in range(self.workers):
+            task = asyncio.create_task(self._worker(), name=f"notification-outbox-{index}")
+            self._worker_tasks.add(task)
+        
+        if self.persist:
+            self._sweep_task = asyncio.create_task(self._sweep_loop(), name="notification-outbox-sweep")
+        
+        logger.info(f"Notification outbox started with {self.workers} workers")
+    
+    async def stop(self) -> None:
+        """Drain queued jobs (up to drain_timeout_seconds) and stop the workers"""
+        if not self._running:
+            return
+        
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+        
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.drain_timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.warning(f"Notification outbox stopped with {self._queue.qsize()} jobs still queued")
+        
+        self._running = False
+        tasks = [*self._worker_tasks, *self._background_tasks]
+        if self._sweep_task is not None:
+            tasks.append(self._sweep_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
+        self._worker_tasks.clear()
+        self._sweep_task = None
+        logger.info("Notification outbox stopped")
+    
+    async def _worker(self) -> None:
+        """Deliver queued entries one at a time"""
+        while True:
+            entry = await self._queue.get()
+            try:
+                await self._process(entry)
+            except Exception as e:
+                logger.error(f"Unexpected outbox worker error for entry {entry.id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+    
+    async def _process(self, entry: OutboxEntry) -> None:
+        """Run the handler for an entry and record the outcome"""
+        handler = self._handlers.get(entry.kind)
+        if handler is None:
+            await self._fail(entry, f"No handler registered for '{entry.kind}'")
+            return
+        
+        entry.attempts += 1
+        try:
+            await handler(entry.payload)
+        except Exception as e:
+            if entry.attempts >= self.max_attempts:
+                await self._fail(entry, str(e))
+                return
+            
+            delay = self._backoff(entry.attempts)
+            self._retries += 1
+            logger.warning(
+                f"Notification {entry.kind} ({entry.id}) attempt {entry.attempts} failed, "
+                f"retrying in {delay:.1f}s: {str(e)}"
+            )
+            await self._store_update(entry.id, {
+                "attempts": entry.attempts,
+                "lastError": str(e)
+            })
+            self._spawn(self._retry_later(entry, delay))
+            return
+        
+        latency = max(0.0, time.time() - entry.enqueued_at)
+        self._delivered += 1
+        self._total_latency_seconds += latency
+        self._max_latency_seconds = max(self._max_latency_seconds, latency)
+        self._count(entry.kind, "delivered")
+        self._owned.discard(entry.id)
+        
+        if self.persist:
+            try:
+                await self._document(entry.id).delete()
+            except Exception as e:
+                self._store_errors += 1
+                logger.warning(f"Error deleting delivered outbox entry {entry.id}: {str(e)}")
+    
+    async def _fail(self, entry: OutboxEntry, error: str) -> None:
+        """Give up on an entry"""
+        self._failed += 1
+        self._count(entry.kind, "failed")
+        self._owned.discard(entry.id)
+        logger.error(f"Notification {entry.kind} ({entry.id}) failed after {entry.attempts} attempts: {error}")
+        await self._store_update(entry.id, {
+            "status": "failed",
+            "attempts": entry.attempts,
+            "lastError": error
+        })
+    
+    async def _retry_later(self, entry: OutboxEntry, delay: float) -> None:
+        """Resubmit an entry after its backoff delay"""
+        await asyncio.sleep(delay)
+        self._submit(entry)
+    
+    def _backoff(self, attempts: int) -> float:
+        """Exponential backoff with jitter for the retry after `attempts` attempts"""
+        delay = min(self.max_backoff_seconds, self.backoff_seconds * (2 ** (attempts - 1)))
+        return random.uniform(delay / 2, delay)
+    
+    def _count(self, kind: str, outcome: str) -> None:
+        counts = self._by_kind.setdefault(kind, {"delivered": 0, "failed": 0})
+        counts[outcome] += 1
+    
+    def _document(self, entry_id: str) -> Any:
+        return get_async_firestore().collection(self.collection).document(entry_id)
+    
+    async def _store_update(self, entry_id: str, updates: Dict[str, Any]) -> None:
+        """Best-effort status update of a persisted entry"""
+        if not self.persist:
+            return
+        try:
+            await self._document(entry_id).update({**updates, "updatedAt": firestore.SERVER_TIMESTAMP})
+        except Exception as e:
+            self._store_errors += 1
+            logger.warning(f"Error updating outbox entry {entry_id}: {str(e)}")
+    
+    async def _sweep_loop(self) -> None:
+        """Periodically re-claim pending entries nobody is working on"""
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error sweeping notification outbox: {str(e)}")
+            await asyncio.sleep(self.sweep_interval_seconds)
+    
+    async def sweep(self) -> int:
+        """
+        Re-claim pending entries not updated for stale_seconds
+        
+        Each entry is claimed with an update conditioned on its last update
+        time, so when several processes sweep at once only one of them wins.
+        
+        Returns:
+            Number of entries re-queued
+        """
+        db = get_async_firestore()
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.stale_seconds)
+        query = (
+            db.collection(self.collection)
+            .where(filter=firestore.FieldFilter("status", "==", "pending"))
+            .where(filter=firestore.FieldFilter("updatedAt", "<", cutoff))
+            .limit(_SWEEP_BATCH_SIZE)
+        )
+        
+        reclaimed = 0
+        async for snapshot in query.stream():
+            if snapshot.id in self._owned:
+                continue
+            
+            try:
+                await snapshot.reference.update(
+                    {"updatedAt": firestore.SERVER_TIMESTAMP},
+                    option=db.write_option(last_update_time=snapshot.update_time)
+                )
+            except Exception:
+                continue  # Claimed by another process in the meantime
+            
+            data = snapshot.to_dict() or {}
+            self._submit(OutboxEntry(
+                id=snapshot.id,
+                kind=data.get("kind", ""),
+                payload=data.get("payload") or {},
+                enqueued_at=data.get("enqueuedAt") or time.time(),
+                attempts=data.get("attempts", 0)
+            ))
+            reclaimed += 1
+        
+        if reclaimed:
+            self._reclaimed += reclaimed
+            logger.info(f"Re-claimed {reclaimed} pending notification outbox entries")
+        return reclaimed
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of queue depth, delivery counters and delivery latency"""
+        return {
+            "running": self._running,
+            "workers": len(self._worker_tasks),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "owned": len(self._owned),
+            "enqueued": self._enqueued,
+            "delivered": self._delivered,
+            "failed": self._failed,
+            "retries": self._retries,
+            "overflow": self._overflow,
+            "reclaimed": self._reclaimed,
+            "store_errors": self._store_errors,
+            "avg_latency_seconds": round(self._total_latency_seconds / self._delivered, 4) if self._delivered else 0.0,
+            "max_latency_seconds": round(self._max_latency_seconds, 4),
+            "by_kind": {kind: dict(counts) for kind, counts in self._by_kind.items()},
+        }
+
+
+# Global notification outbox instance
+notification_outbox = NotificationOutbox(
+    workers=settings.NOTIFICATION_OUTBOX_WORKERS,
+    max_queue=settings.NOTIFICATION_OUTBOX_MAX_QUEUE,
+    max_attempts=settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS,
+    backoff_seconds=settings.NOTIFICATION_OUTBOX_BACKOFF_SECONDS,
+    max_backoff_seconds=settings.NOTIFICATION_OUTBOX_MAX_BACKOFF_SECONDS,
+    persist=settings.NOTIFICATION_OUTBOX_PERSIST,
+    sweep_interval_seconds=settings.NOTIFICATION_OUTBOX_SWEEP_INTERVAL_SECONDS,
+    stale_seconds=settings.NOTIFICATION_OUTBOX_STALE_SECONDS,
+    drain_timeout_seconds=settings.NOTIFICATION_OUTBOX_DRAIN_TIMEOUT_SECONDS
+)
+register_metrics("notification_outbox", notification_outbox.metrics)
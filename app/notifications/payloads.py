@@ -0,0 +1,85 @@
+"""
+Notification Payload Encoding
+
+FCM data payloads are flat string maps. Each notification's payload is built
+once (not per recipient) in a compact, versioned format:
+- "v" is the payload format version, bumped on incompatible changes
+  (version 1 sent locations as Python dict reprs)
+- locations are compact JSON {"lat", "lng", "name"} with coordinates rounded
+  to 6 decimals (~0.1 m); address and empty fields are left out
+- amounts are sent with 2 decimals
+"""
+import json
+from typing import Any, Dict, Optional
+
+PAYLOAD_VERSION = "2"
+
+_COORDINATE_DECIMALS = 6
+
+
+def encode_location(location: Dict[str, Any]) -> str:
+    """Compact JSON for a pickup/dropoff location"""
+    encoded = {
+        "lat": round(float(location["latitude"]), _COORDINATE_DECIMALS),
+        "lng": round(float(location["longitude"]), _COORDINATE_DECIMALS),
+    }
+    if location.get("name"):
+        encoded["name"] = location["name"]
+    return json.dumps(encoded, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_amount(amount: float) -> str:
+    """Money amount with 2 decimals"""
+    return f"{float(amount):.2f}"
+
+
+def _payload(kind: str, ride_id: str, **fields: Optional[str]) -> Dict[str, str]:
+    """Versioned payload, dropping empty fields"""
+    payload = {"v": PAYLOAD_VERSION, "type": kind, "rideId": ride_id}
+    payload.update({key: value for key, value in fields.items() if value})
+    return payload
+
+
+def ride_requested_payload(
+    ride_id: str,
+    pickup_location: Dict[str, Any],
+    dropoff_location: Dict[str, Any],
+    estimated_fare: float
+) -> Dict[str, str]:
+    return _payload(
+        "ride_requested",
+        ride_id,
+        pickup=encode_location(pickup_location),
+        dropoff=encode_location(dropoff_location),
+        estimatedFare=encode_amount(estimated_fare)
+    )
+
+
+def ride_accepted_payload(ride_id: str, driver_name: str, driver_vehicle: str) -> Dict[str, str]:
+    return _payload("ride_accepted", ride_id, driverName=driver_name, driverVehicle=driver_vehicle)
+
+
+def ride_started_payload(ride_id: str) -> Dict[str, str]:
+    return _payload("ride_started", ride_id)
+
+
+def ride_completed_payload(ride_id: str, final_fare: float) -> Dict[str, str]:
+    return _payload("ride_completed", ride_id, finalFare=encode_amount(final_fare))
+
+
+def ride_cancelled_payload(ride_id: str, reason: Optional[str] = None) -> Dict[str, str]:
+    return _payload("ride_cancelled", ride_id, reason=reason)
+
+
+def to_fcm_data(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, str]]:
+    """
+    FCM data map for a payload
+    
+    Payloads built above are returned as is; other dicts get their keys and
+    values converted to strings.
+    """
+    if not data:
+        return None
+    if all(isinstance(key, str) and isinstance(value, str) for key, value in data.items()):
+        return data
+    return {str(key): str(value) for key, value in data.items()}
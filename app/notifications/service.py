@@ -2,15 +2,45 @@
 Notification Service - Orchestration
 """
 from typing import List, Optional, Dict, Any
-from app.notifications.fcm import fcm_service
+from app.notifications import payloads
+from app.notifications.fcm import FAILED, SENT, fcm_service
+from app.notifications.throttle import notification_throttle
 from app.core.logging import logger
 
+# Result of a notification dropped by the throttle (duplicate, superseded or rate limited)
+SUPPRESSED = "suppressed"
+
 
 class NotificationService:
     """Service for notification orchestration"""
     
     def __init__(self):
         self.fcm = fcm_service
+        self.throttle = notification_throttle
+    
+    async def _notify_user(
+        self,
+        user_id: str,
+        ride_id: str,
+        title: str,
+        body: str,
+        data: Dict[str, Any]
+    ) -> str:
+        """
+        Send a ride notification to one user through the throttle
+        
+        Returns:
+            SUPPRESSED, or the FCM result (SENT, NO_DEVICE or FAILED)
+        """
+        kind = data["type"]
+        if not self.throttle.admit([user_id], kind, ride_id):
+            logger.info(f"Suppressed {kind} notification to user {user_id} for ride {ride_id}")
+            return SUPPRESSED
+        
+        result = await self.fcm.send_notification(user_id, title, body, data, collapse_key=f"ride-{ride_id}")
+        if result == SENT:
+            self.throttle.record_delivered([user_id], kind, ride_id)
+        return result
     
     async def notify_ride_requested(
         self,
@@ -19,25 +49,37 @@ class NotificationService:
         pickup_location: Dict[str, Any],
         dropoff_location: Dict[str, Any],
         estimated_fare: float
-    ) -> None:
-        """Notify drivers about a new ride request"""
+    ) -> Dict[str, str]:
+        """
+        Notify drivers about a new ride request
+        
+        Returns:
+            Dict mapping driver_id to FCM result, for drivers not suppressed by the throttle
+        """
         try:
             title = "New Ride Request"
             body = f"Ride from {pickup_location.get('name', 'pickup')} to {dropoff_location.get('name', 'dropoff')}"
             
-            data = {
-                "type": "ride_requested",
-                "rideId": ride_id,
-                "pickup": str(pickup_location),
-                "dropoff": str(dropoff_location),
-                "estimatedFare": str(estimated_fare)
-            }
+            data = payloads.ride_requested_payload(ride_id, pickup_location, dropoff_location, estimated_fare)
+            
+            admitted = self.throttle.admit(driver_ids, "ride_requested", ride_id)
+            if len(admitted) < len(driver_ids):
+                logger.info(f"Suppressed ride request {ride_id} for {len(driver_ids) - len(admitted)} drivers")
+            if not admitted:
+                return {}
             
-            await self.fcm.send_to_drivers(driver_ids, title, body, data)
-            logger.info(f"Ride request notifications sent to {len(driver_ids)} drivers")
+            results = await self.fcm.send_to_drivers(admitted, title, body, data, collapse_key=f"ride-{ride_id}")
+            self.throttle.record_delivered(
+                [driver_id for driver_id, result in results.items() if result == SENT],
+                "ride_requested",
+                ride_id
+            )
+            logger.info(f"Ride request notifications sent to {len(admitted)} drivers")
+            return results
             
         except Exception as e:
             logger.error(f"Error sending ride request notifications: {str(e)}")
+            return {driver_id: FAILED for driver_id in driver_ids}
     
     async def notify_ride_accepted(
         self,
@@ -45,88 +87,77 @@ class NotificationService:
         ride_id: str,
         driver_name: str,
         driver_vehicle: str
-    ) -> None:
-        """Notify rider that their ride was accepted"""
+    ) -> str:
+        """Notify rider that their ride was accepted (returns the notification result)"""
         try:
             title = "Ride Accepted"
             body = f"{driver_name} has accepted your ride request"
             
-            data = {
-                "type": "ride_accepted",
-                "rideId": ride_id,
-                "driverName": driver_name,
-                "driverVehicle": driver_vehicle
-            }
+            data = payloads.ride_accepted_payload(ride_id, driver_name, driver_vehicle)
             
-            await self.fcm.send_notification(user_id, title, body, data)
-            logger.info(f"Ride accepted notification sent to user {user_id}")
+            result = await self._notify_user(user_id, ride_id, title, body, data)
+            logger.info(f"Ride accepted notification to user {user_id}: {result}")
+            return result
             
         except Exception as e:
             logger.error(f"Error sending ride accepted notification: {str(e)}")
+            return FAILED
     
     async def notify_ride_started(
         self,
         user_id: str,
         ride_id: str
-    ) -> None:
-        """Notify rider that driver has started the ride"""
+    ) -> str:
+        """Notify rider that driver has started the ride (returns the notification result)"""
         try:
             title = "Ride Started"
             body = "Your driver has started the ride"
             
-            data = {
-                "type": "ride_started",
-                "rideId": ride_id
-            }
+            data = payloads.ride_started_payload(ride_id)
             
-            await self.fcm.send_notification(user_id, title, body, data)
+            return await self._notify_user(user_id, ride_id, title, body, data)
             
         except Exception as e:
             logger.error(f"Error sending ride started notification: {str(e)}")
+            return FAILED
     
     async def notify_ride_completed(
         self,
         user_id: str,
         ride_id: str,
         final_fare: float
-    ) -> None:
-        """Notify rider that ride is completed"""
+    ) -> str:
+        """Notify rider that ride is completed (returns the notification result)"""
         try:
             title = "Ride Completed"
             body = f"Your ride has been completed. Fare: NAD {final_fare:.2f}"
             
-            data = {
-                "type": "ride_completed",
-                "rideId": ride_id,
-                "finalFare": str(final_fare)
-            }
+            data = payloads.ride_completed_payload(ride_id, final_fare)
             
-            await self.fcm.send_notification(user_id, title, body, data)
+            return await self._notify_user(user_id, ride_id, title, body, data)
             
         except Exception as e:
             logger.error(f"Error sending ride completed notification: {str(e)}")
+            return FAILED
     
     async def notify_ride_cancelled(
         self,
         user_id: str,
         ride_id: str,
         reason: Optional[str] = None
-    ) -> None:
-        """Notify user that ride was cancelled"""
+    ) -> str:
+        """Notify user that ride was cancelled (returns the notification result)"""
         try:
             title = "Ride Cancelled"
             body = reason or "Your ride has been cancelled"
             
-            data = {
-                "type": "ride_cancelled",
-                "rideId": ride_id,
-                "reason": reason or ""
-            }
+            data = payloads.ride_cancelled_payload(ride_id, reason)
             
-            await self.fcm.send_notification(user_id, title, body, data)
+            return await self._notify_user(user_id, ride_id, title, body, data)
             
         except Exception as e:
             logger.error(f"Error sending ride cancelled notification: {str(e)}")
+            return FAILED
 
 
 # Global notification service instance
@@ -0,0 +1,155 @@
+"""
+Per-recipient Notification Throttle
+
+Filters pushes before they reach FCM:
+- superseded: a ride notification older than the ride's latest known state
+  (e.g. ride_requested after the ride was accepted) is dropped for everyone
+- duplicate: the same notification for the same ride was already delivered to
+  the recipient within NOTIFICATION_DEDUPE_WINDOW_SECONDS
+- rate limited: each recipient has a token bucket of NOTIFICATION_RATE_BURST
+  pushes refilled at NOTIFICATION_RATE_PER_MINUTE, charged per delivered push;
+  only ride request broadcasts to drivers are limited, rider lifecycle
+  notifications (one of each per ride) bypass it
+
+State is per process and bounded by NOTIFICATION_THROTTLE_MAX_ENTRIES.
+"""
+import time
+from typing import Any, Dict, List, Optional
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import register_metrics
+
+# Position of each ride notification in the ride lifecycle
+RIDE_NOTIFICATION_RANK = {
+    "ride_requested": 0,
+    "ride_accepted": 1,
+    "ride_started": 2,
+    "ride_completed": 3,
+    "ride_cancelled": 3,
+}
+
+# Rider lifecycle notifications are never rate limited: a suppressed one would
+# be lost, since the outbox counts a suppressed notification as handled
+_UNLIMITED_KINDS = {"ride_accepted", "ride_started", "ride_completed", "ride_cancelled"}
+
+
+class NotificationThrottle:
+    """Coalescing window and token-bucket rate limiter keyed by recipient"""
+    
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: int,
+        dedupe_window_seconds: float,
+        ride_state_ttl_seconds: float,
+        max_entries: int
+    ):
+        """
+        Args:
+            rate_per_minute: Sustained pushes per recipient per minute (0 disables rate limiting)
+            burst: Pushes a recipient can receive back to back
+            dedupe_window_seconds: Window in which a repeated notification is dropped
+            ride_state_ttl_seconds: How long a ride's latest notified state is remembered
+            max_entries: Bound of each internal table
+        """
+        self.rate_per_second = rate_per_minute / 60.0
+        self.burst = burst
+        
+        # An idle bucket is full again after burst / rate seconds, so expiry == full
+        refill_seconds = burst / self.rate_per_second if self.rate_per_second > 0 else 0
+        self._buckets = TTLCache("notification_buckets", max_entries=max_entries, ttl_seconds=refill_seconds)
+        self._recent = TTLCache("notification_recent", max_entries=max_entries, ttl_seconds=dedupe_window_seconds)
+        self._ride_state = TTLCache("notification_ride_state", max_entries=max_entries, ttl_seconds=ride_state_ttl_seconds)
+        
+        self._admitted = 0
+        self._duplicates = 0
+        self._superseded = 0
+        self._rate_limited = 0
+    
+    def admit(self, recipient_ids: List[str], kind: str, ride_id: Optional[str] = None) -> List[str]:
+        """
+        Filter the recipients a notification should actually be sent to
+        
+        Also records the ride's progress, so older notifications for the same
+        ride are dropped afterwards. Call record_delivered() once sent: the
+        rate limit is only charged for delivered pushes, so failed sends that
+        are retried do not use up the recipient's budget.
+        
+        Args:
+            recipient_ids: Candidate recipients
+            kind: Notification type (ride_requested, ride_accepted, ...)
+            ride_id: Ride the notification is about, if any
+        
+        Returns:
+            Recipients to notify, in input order
+        """
+        rank = RIDE_NOTIFICATION_RANK.get(kind)
+        if ride_id is not None and rank is not None:
+            latest = self._ride_state.get(ride_id)
+            if latest is not None and latest > rank:
+                self._superseded += len(recipient_ids)
+                return []
+            if latest is None or rank > latest:
+                self._ride_state.set(ride_id, rank)
+        
+        admitted = []
+        for recipient_id in recipient_ids:
+            if self._recent.get((recipient_id, kind, ride_id)) is not None:
+                self._duplicates += 1
+                continue
+            if kind not in _UNLIMITED_KINDS and self._available_tokens(recipient_id) < 1:
+                self._rate_limited += 1
+                continue
+            admitted.append(recipient_id)
+        
+        self._admitted += len(admitted)
+        return admitted
+    
+    def record_delivered(self, recipient_ids: List[str], kind: str, ride_id: Optional[str] = None) -> None:
+        """Start the dedupe window and charge the rate limit for recipients the notification was delivered to"""
+        for recipient_id in recipient_ids:
+            self._recent.set((recipient_id, kind, ride_id), True)
+            if kind not in _UNLIMITED_KINDS:
+                self._take_token(recipient_id)
+    
+    def _available_tokens(self, recipient_id: str) -> float:
+        """Pushes left in the recipient's bucket"""
+        if self.rate_per_second <= 0:
+            return float("inf")
+        
+        bucket = self._buckets.get(recipient_id)
+        if bucket is None:
+            return float(self.burst)
+        tokens, updated_at = bucket
+        return min(float(self.burst), tokens + (time.monotonic() - updated_at) * self.rate_per_second)
+    
+    def _take_token(self, recipient_id: str) -> None:
+        """Consume one push from the recipient's bucket"""
+        if self.rate_per_second <= 0:
+            return
+        
+        # Concurrent sends admitted on the same token may overdraw by a push
+        tokens = max(self._available_tokens(recipient_id) - 1, 0.0)
+        self._buckets.set(recipient_id, (tokens, time.monotonic()))
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of admitted and suppressed pushes"""
+        return {
+            "admitted": self._admitted,
+            "duplicates": self._duplicates,
+            "superseded": self._superseded,
+            "rate_limited": self._rate_limited,
+            "tracked_recipients": len(self._buckets),
+            "tracked_rides": len(self._ride_state),
+        }
+
+
+# Global notification throttle instance
+notification_throttle = NotificationThrottle(
+    rate_per_minute=settings.NOTIFICATION_RATE_PER_MINUTE,
+    burst=settings.NOTIFICATION_RATE_BURST,
+    dedupe_window_seconds=settings.NOTIFICATION_DEDUPE_WINDOW_SECONDS,
+    ride_state_ttl_seconds=settings.NOTIFICATION_RIDE_STATE_TTL_SECONDS,
+    max_entries=settings.NOTIFICATION_THROTTLE_MAX_ENTRIES
+)
+register_metrics("notification_throttle", notification_throttle.metrics)
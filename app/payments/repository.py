@@ -3,17 +3,18 @@ Payment Repository
 """
 from typing import Optional, Dict, Any, List
 from firebase_admin import firestore
-from app.core.firebase import get_firestore
+from app.core.firebase import get_async_firestore
 from app.core.logging import logger
 from app.core.exceptions import NotFoundError, ValidationError
 from app.core.serializers import serialize_firestore_document
+from app.core.firestore_utils import cached_count, count_cache_key, fetch_page, invalidate_count, merge_written
 
 
 class PaymentRepository:
     """Repository for payment Firestore operations"""
     
     def __init__(self):
-        self.db = get_firestore()
+        self.db = get_async_firestore()
         self.collection = "payments"
     
     async def create_payment(
@@ -37,14 +38,11 @@ class PaymentRepository:
             }
             
             doc_ref = self.db.collection(self.collection).document(payment_id)
-            doc_ref.set(payment_data)
+            write_result = await doc_ref.set(payment_data)
+            invalidate_count(count_cache_key(self.collection, "userId", user_id))
             
-            doc = doc_ref.get()
-            if doc.exists:
-                doc_dict = doc.to_dict()
-                return serialize_firestore_document(doc_dict) if doc_dict else {}
-            
-            raise Exception("Failed to create payment")
+            doc_dict = merge_written(payment_data, write_result.update_time)
+            return serialize_firestore_document(doc_dict)
             
         except Exception as e:
             logger.error(f"Error creating payment: {str(e)}")
@@ -54,7 +52,7 @@ class PaymentRepository:
         """Get payment by ID"""
         try:
             doc_ref = self.db.collection(self.collection).document(payment_id)
-            doc = doc_ref.get()
+            doc = await doc_ref.get()
             
             if doc.exists:
                 doc_dict = doc.to_dict()
@@ -70,23 +68,17 @@ class PaymentRepository:
         self,
         user_id: str,
         page: int = 1,
-        limit: int = 10
+        limit: int = 10,
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """Get payment history for a user"""
         try:
-            offset = (page - 1) * limit
-            
             # Use filter keyword argument (best practice - avoids deprecation warning)
-            query = (
-                self.db.collection(self.collection)
-                .where(filter=firestore.FieldFilter("userId", "==", user_id))
-                .order_by("createdAt", direction=firestore.Query.DESCENDING)
-                .limit(limit)
-                .offset(offset)
-            )
+            collection_ref = self.db.collection(self.collection)
+            query = collection_ref.where(filter=firestore.FieldFilter("userId", "==", user_id))
             
             try:
-                docs = query.stream()
+                docs, next_cursor = await fetch_page(query, collection_ref, page, limit, cursor)
                 payments = [serialize_firestore_document(doc.to_dict()) for doc in docs]
             except Exception as query_error:
                 error_msg = str(query_error)
@@ -114,16 +106,15 @@ class PaymentRepository:
                         )
                 raise
             
-            total_query = self.db.collection(self.collection).where(filter=firestore.FieldFilter("userId", "==", user_id))
-            total_docs = total_query.stream()
-            total = sum(1 for _ in total_docs)
+            total = await cached_count(count_cache_key(self.collection, "userId", user_id), query)
             
             return {
                 "payments": payments,
                 "total": total,
                 "page": page,
                 "limit": limit,
-                "hasMore": (page * limit) < total
+                "hasMore": next_cursor is not None,
+                "nextCursor": next_cursor
             }
             
         except ValidationError:
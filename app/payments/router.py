@@ -1,6 +1,7 @@
 """
 Payment Router
 """
+from typing import Optional
 from fastapi import APIRouter, Depends, Query, status
 from app.core.responses import success_response
 from app.core.security import get_current_user
@@ -55,12 +56,13 @@ async def process_payment(
 async def get_payment_history(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page (takes precedence over page)"),
     current_user: dict = Depends(get_current_user)
 ):
     """Get payment history for the logged in user"""
     try:
         user_id = current_user["uid"]
-        result = await service.get_payment_history(user_id, page, limit)
+        result = await service.get_payment_history(user_id, page, limit, cursor)
         
         return success_response(
             message="Payment history retrieved successfully",
@@ -17,6 +17,7 @@ class CalculateFareRequest(BaseModel):
     pickup_location: LocationInput
     dropoff_location: LocationInput
     ride_type: str = "standard"
+    exact_route: bool = Field(False, description="Price the Google driving route instead of the local estimate")
 
 
 class ProcessPaymentRequest(BaseModel):
@@ -1,7 +1,7 @@
 """
 Payment Service
 """
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import uuid
 from app.payments.repository import PaymentRepository
 from app.maps.service import maps_service
@@ -29,7 +29,8 @@ class PaymentService:
                     "latitude": request.dropoff_location.latitude,
                     "longitude": request.dropoff_location.longitude
                 },
-                base_fare=settings.DEFAULT_RIDE_FARE
+                base_fare=settings.DEFAULT_RIDE_FARE,
+                exact_route=request.exact_route
             )
             
             return fare_info
@@ -71,11 +72,12 @@ class PaymentService:
         self,
         user_id: str,
         page: int = 1,
-        limit: int = 10
+        limit: int = 10,
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """Get payment history for a user"""
         try:
-            return await self.repository.get_user_payments(user_id, page, limit)
+            return await self.repository.get_user_payments(user_id, page, limit, cursor)
             
         except Exception as e:
             logger.error(f"Error getting payment history: {str(e)}")
@@ -1,6 +1,7 @@
 """
 Driver Ride Router - API Endpoints
 """
+from typing import Optional
 from fastapi import APIRouter, Depends, Query, status
 from app.core.responses import success_response
 from app.core.security import get_current_driver
@@ -114,12 +115,13 @@ async def complete_ride(
 async def get_driver_rides(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page (takes precedence over page)"),
     current_driver: dict = Depends(get_current_driver)
 ):
     """Get all rides for the logged in driver"""
     try:
         driver_id = current_driver["uid"]
-        result = await service.get_driver_rides(driver_id, page, limit)
+        result = await service.get_driver_rides(driver_id, page, limit, cursor)
         
         return success_response(
             message="Driver rides retrieved successfully",
@@ -1,9 +1,9 @@
 """
 Driver Ride Service - Business Logic
 """
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from app.rides.repository import RideRepository
-from app.notifications.service import notification_service
+from app.rides.notifications import enqueue_ride_accepted, enqueue_ride_completed, enqueue_ride_started
 from app.core.logging import logger
 from app.core.exceptions import ValidationError, NotFoundError, ConflictError
 from app.rides.schemas import AcceptRideRequest, DeclineRideRequest, StartRideRequest, CompleteRideRequest
@@ -36,15 +36,13 @@ class DriverRideService:
             
             # Notify rider
             try:
-                driver_doc = await self.repository.get_ride_by_id(ride_id)  # Get updated ride
-                await notification_service.notify_ride_accepted(
+                await enqueue_ride_accepted(
                     user_id=ride["userId"],
                     ride_id=ride_id,
-                    driver_name="Driver",  # Would get from driver doc
-                    driver_vehicle="Vehicle"  # Would get from driver doc
+                    driver_id=driver_id
                 )
             except Exception as e:
-                logger.warning(f"Failed to notify rider: {str(e)}")
+                logger.warning(f"Failed to queue rider notification: {str(e)}")
             
             return ride
             
@@ -94,16 +92,16 @@ class DriverRideService:
             if ride["status"] != "accepted":
                 raise ConflictError(f"Cannot start ride with status: {ride['status']}")
             
-            ride = await self.repository.update_ride_status(ride_id, "started")
+            ride = await self.repository.update_ride_status(ride_id, "started", current=ride)
             
             # Notify rider
             try:
-                await notification_service.notify_ride_started(
+                await enqueue_ride_started(
                     user_id=ride["userId"],
                     ride_id=ride_id
                 )
             except Exception as e:
-                logger.warning(f"Failed to notify rider: {str(e)}")
+                logger.warning(f"Failed to queue rider notification: {str(e)}")
             
             return ride
             
@@ -134,18 +132,19 @@ class DriverRideService:
             ride = await self.repository.update_ride_status(
                 ride_id=request.rideId,
                 status="completed",
-                updates={"finalFare": request.final_fare}
+                updates={"finalFare": request.final_fare},
+                current=ride
             )
             
             # Notify rider
             try:
-                await notification_service.notify_ride_completed(
+                await enqueue_ride_completed(
                     user_id=ride["userId"],
                     ride_id=request.rideId,
                     final_fare=request.final_fare
                 )
             except Exception as e:
-                logger.warning(f"Failed to notify rider: {str(e)}")
+                logger.warning(f"Failed to queue rider notification: {str(e)}")
             
             return ride
             
@@ -159,11 +158,12 @@ class DriverRideService:
         self,
         driver_id: str,
         page: int = 1,
-        limit: int = 10
+        limit: int = 10,
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """Get all rides for a driver"""
         try:
-            return await self.repository.get_driver_rides(driver_id, page, limit)
+            return await self.repository.get_driver_rides(driver_id, page, limit, cursor)
             
         except Exception as e:
             logger.error(f"Error getting driver rides: {str(e)}")
@@ -0,0 +1,152 @@
+"""
+Ride Notification Jobs
+
+Ride endpoints enqueue these jobs on the notification outbox instead of
+notifying inline. The handlers run on the outbox workers, where a raised
+exception makes the job retry. Only transient send failures raise: a rider
+without a valid device token or a notification dropped by the throttle
+counts as handled.
+"""
+from typing import Any, Dict, Optional
+from app.drivers.repository import DriverRepository
+from app.drivers.service import DriverService
+from app.notifications.fcm import FAILED
+from app.notifications.outbox import DeliveryError, notification_outbox
+from app.notifications.service import notification_service
+from app.core.logging import logger
+
+# Radius searched for drivers to notify about a new ride
+RIDE_REQUEST_RADIUS_KM = 5.0
+
+_driver_service = DriverService()
+_driver_repository = DriverRepository()
+
+
+async def enqueue_ride_requested(
+    ride_id: str,
+    pickup_location: Dict[str, Any],
+    dropoff_location: Dict[str, Any],
+    estimated_fare: float
+) -> None:
+    """Queue notifying nearby drivers about a new ride"""
+    await notification_outbox.enqueue("ride_requested", {
+        "rideId": ride_id,
+        "pickupLocation": pickup_location,
+        "dropoffLocation": dropoff_location,
+        "estimatedFare": estimated_fare
+    })
+
+
+async def enqueue_ride_accepted(user_id: str, ride_id: str, driver_id: str) -> None:
+    """Queue notifying the rider that a driver accepted their ride"""
+    await notification_outbox.enqueue("ride_accepted", {
+        "userId": user_id,
+        "rideId": ride_id,
+        "driverId": driver_id
+    })
+
+
+async def enqueue_ride_started(user_id: str, ride_id: str) -> None:
+    """Queue notifying the rider that the ride started"""
+    await notification_outbox.enqueue("ride_started", {
+        "userId": user_id,
+        "rideId": ride_id
+    })
+
+
+async def enqueue_ride_completed(user_id: str, ride_id: str, final_fare: float) -> None:
+    """Queue notifying the rider that the ride is completed"""
+    await notification_outbox.enqueue("ride_completed", {
+        "userId": user_id,
+        "rideId": ride_id,
+        "finalFare": final_fare
+    })
+
+
+async def enqueue_ride_cancelled(user_id: str, ride_id: str, reason: Optional[str] = None) -> None:
+    """Queue notifying a user that the ride was cancelled"""
+    await notification_outbox.enqueue("ride_cancelled", {
+        "userId": user_id,
+        "rideId": ride_id,
+        "reason": reason
+    })
+
+
+async def _deliver_ride_requested(payload: Dict[str, Any]) -> None:
+    """Find drivers near the pickup and notify them"""
+    pickup_location = payload["pickupLocation"]
+    nearby_drivers = await _driver_service.find_nearby_drivers(
+        latitude=pickup_location["latitude"],
+        longitude=pickup_location["longitude"],
+        radius_km=RIDE_REQUEST_RADIUS_KM
+    )
+    
+    driver_ids = [driver["id"] for driver in nearby_drivers]
+    if not driver_ids:
+        logger.info(f"No nearby drivers to notify for ride {payload['rideId']}")
+        return
+    
+    # Per-driver failures are not retried: the job would re-notify every driver
+    await notification_service.notify_ride_requested(
+        driver_ids=driver_ids,
+        ride_id=payload["rideId"],
+        pickup_location=pickup_location,
+        dropoff_location=payload["dropoffLocation"],
+        estimated_fare=payload["estimatedFare"]
+    )
+
+
+async def _deliver_ride_accepted(payload: Dict[str, Any]) -> None:
+    """Notify the rider with the accepting driver's name and vehicle"""
+    driver_doc = await _driver_repository.get_driver_by_id(payload["driverId"]) or {}
+    vehicle = " ".join(
+        part for part in (
+            driver_doc.get("vehicle_color"),
+            driver_doc.get("vehicle_model"),
+            driver_doc.get("vehicle_plate")
+        ) if part
+    )
+    result = await notification_service.notify_ride_accepted(
+        user_id=payload["userId"],
+        ride_id=payload["rideId"],
+        driver_name=driver_doc.get("name") or "Driver",
+        driver_vehicle=vehicle or "Vehicle"
+    )
+    if result == FAILED:
+        raise DeliveryError(f"Ride accepted notification to {payload['userId']} failed")
+
+
+async def _deliver_ride_started(payload: Dict[str, Any]) -> None:
+    result = await notification_service.notify_ride_started(
+        user_id=payload["userId"],
+        ride_id=payload["rideId"]
+    )
+    if result == FAILED:
+        raise DeliveryError(f"Ride started notification to {payload['userId']} failed")
+
+
+async def _deliver_ride_completed(payload: Dict[str, Any]) -> None:
+    result = await notification_service.notify_ride_completed(
+        user_id=payload["userId"],
+        ride_id=payload["rideId"],
+        final_fare=payload["finalFare"]
+    )
+    if result == FAILED:
+        raise DeliveryError(f"Ride completed notification to {payload['userId']} failed")
+
+
+async def _deliver_ride_cancelled(payload: Dict[str, Any]) -> None:
+    result = await notification_service.notify_ride_cancelled(
+        user_id=payload["userId"],
+        ride_id=payload["rideId"],
+        reason=payload.get("reason")
+    )
+    if result == FAILED:
+        raise DeliveryError(f"Ride cancelled notification to {payload['userId']} failed")
+
+
+notification_outbox.register_handler("ride_requested", _deliver_ride_requested)
+notification_outbox.register_handler("ride_accepted", _deliver_ride_accepted)
+notification_outbox.register_handler("ride_started", _deliver_ride_started)
+notification_outbox.register_handler("ride_completed", _deliver_ride_completed)
+notification_outbox.register_handler("ride_cancelled", _deliver_ride_cancelled)
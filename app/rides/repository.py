@@ -3,18 +3,19 @@ Ride Repository - Firestore Operations
 """
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
-from firebase_admin import firestore
-from app.core.firebase import get_firestore
+from firebase_admin import firestore, firestore_async
+from app.core.firebase import get_async_firestore
 from app.core.logging import logger
 from app.core.exceptions import NotFoundError, ConflictError, ValidationError
 from app.core.serializers import serialize_firestore_document
+from app.core.firestore_utils import cached_count, count_cache_key, fetch_page, invalidate_count, merge_written
 
 
 class RideRepository:
     """Repository for ride Firestore operations"""
     
     def __init__(self):
-        self.db = get_firestore()
+        self.db = get_async_firestore()
         self.collection = "rides"
     
     async def create_ride(
@@ -50,16 +51,13 @@ class RideRepository:
             }
             
             doc_ref = self.db.collection(self.collection).document(ride_id)
-            doc_ref.set(ride_data)
+            write_result = await doc_ref.set(ride_data)
+            invalidate_count(count_cache_key(self.collection, "userId", user_id))
             
-            # Fetch created document
-            doc = doc_ref.get()
-            if doc.exists:
-                ride_dict = doc.to_dict()
-                # Serialize Firestore document to JSON-serializable format
-                return serialize_firestore_document(ride_dict) if ride_dict else {}
-            
-            raise Exception("Failed to create ride document")
+            # Build the created document from the write instead of reading it back
+            ride_dict = merge_written(ride_data, write_result.update_time)
+            # Serialize Firestore document to JSON-serializable format
+            return serialize_firestore_document(ride_dict)
             
         except Exception as e:
             logger.error(f"Error creating ride: {str(e)}")
@@ -76,7 +74,7 @@ class RideRepository:
             ride_id = ride_id.strip()
             
             doc_ref = self.db.collection(self.collection).document(ride_id)
-            doc = doc_ref.get()
+            doc = await doc_ref.get()
             
             if doc.exists:
                 ride_dict = doc.to_dict()
@@ -101,7 +99,7 @@ class RideRepository:
             
             try:
                 docs = query.stream()
-                rides = [doc.to_dict() for doc in docs]
+                rides = [doc.to_dict() async for doc in docs]
                 
                 # Serialize all ride documents to JSON-serializable format
                 return [serialize_firestore_document(ride) for ride in rides]
@@ -139,22 +137,16 @@ class RideRepository:
         self,
         user_id: str,
         page: int = 1,
-        limit: int = 10
+        limit: int = 10,
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """Get rides for a user with pagination"""
         try:
-            offset = (page - 1) * limit
-            
-            query = (
-                self.db.collection(self.collection)
-                .where(filter=firestore.FieldFilter("userId", "==", user_id))
-                .order_by("createdAt", direction=firestore.Query.DESCENDING)
-                .limit(limit)
-                .offset(offset)
-            )
+            collection_ref = self.db.collection(self.collection)
+            query = collection_ref.where(filter=firestore.FieldFilter("userId", "==", user_id))
             
             try:
-                docs = query.stream()
+                docs, next_cursor = await fetch_page(query, collection_ref, page, limit, cursor)
                 rides = [doc.to_dict() for doc in docs]
                 
                 # Serialize all ride documents to JSON-serializable format
@@ -183,11 +175,9 @@ class RideRepository:
                     )
                 raise
             
-            # Get total count (simplified - in production use separate count query)
+            # Get total count with a server-side aggregation
             try:
-                total_query = self.db.collection(self.collection).where(filter=firestore.FieldFilter("userId", "==", user_id))
-                total_docs = total_query.stream()
-                total = sum(1 for _ in total_docs)
+                total = await cached_count(count_cache_key(self.collection, "userId", user_id), query)
             except Exception:
                 # If count query fails, use length of rides (approximation)
                 total = len(rides)
@@ -197,7 +187,8 @@ class RideRepository:
                 "total": total,
                 "page": page,
                 "limit": limit,
-                "hasMore": (page * limit) < total
+                "hasMore": next_cursor is not None,
+                "nextCursor": next_cursor
             }
             
         except Exception as e:
@@ -208,22 +199,16 @@ class RideRepository:
         self,
         driver_id: str,
         page: int = 1,
-        limit: int = 10
+        limit: int = 10,
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """Get rides for a driver with pagination"""
         try:
-            offset = (page - 1) * limit
-            
-            query = (
-                self.db.collection(self.collection)
-                .where(filter=firestore.FieldFilter("driverId", "==", driver_id))
-                .order_by("createdAt", direction=firestore.Query.DESCENDING)
-                .limit(limit)
-                .offset(offset)
-            )
+            collection_ref = self.db.collection(self.collection)
+            query = collection_ref.where(filter=firestore.FieldFilter("driverId", "==", driver_id))
             
             try:
-                docs = query.stream()
+                docs, next_cursor = await fetch_page(query, collection_ref, page, limit, cursor)
                 rides = [doc.to_dict() for doc in docs]
                 
                 # Serialize all ride documents to JSON-serializable format
@@ -253,9 +238,7 @@ class RideRepository:
                 raise
             
             try:
-                total_query = self.db.collection(self.collection).where(filter=firestore.FieldFilter("driverId", "==", driver_id))
-                total_docs = total_query.stream()
-                total = sum(1 for _ in total_docs)
+                total = await cached_count(count_cache_key(self.collection, "driverId", driver_id), query)
             except Exception:
                 # If count query fails, use length of rides (approximation)
                 total = len(rides)
@@ -265,7 +248,8 @@ class RideRepository:
                 "total": total,
                 "page": page,
                 "limit": limit,
-                "hasMore": (page * limit) < total
+                "hasMore": next_cursor is not None,
+                "nextCursor": next_cursor
             }
             
         except Exception as e:
@@ -285,9 +269,9 @@ class RideRepository:
             transaction = self.db.transaction()
             ride_ref = self.db.collection(self.collection).document(ride_id)
             
-            @firestore.transactional
-            def accept_in_transaction(transaction, ride_ref, driver_id):
-                ride_doc = ride_ref.get(transaction=transaction)
+            @firestore_async.async_transactional
+            async def accept_in_transaction(transaction, ride_ref, driver_id):
+                ride_doc = await ride_ref.get(transaction=transaction)
                 
                 if not ride_doc.exists:
                     raise NotFoundError("Ride not found")
@@ -301,21 +285,22 @@ class RideRepository:
                     raise ConflictError("Ride has already been accepted")
                 
                 # Update ride
-                transaction.update(ride_ref, {
+                updates = {
                     "driverId": driver_id,
                     "status": "accepted",
                     "updatedAt": firestore.SERVER_TIMESTAMP
-                })
+                }
+                transaction.update(ride_ref, updates)
                 
-                return ride_doc.to_dict()
+                # The commit time is not exposed by transactional functions,
+                # so updatedAt resolves to the local clock
+                return merge_written(updates, None, current=ride_data)
             
-            ride_data = accept_in_transaction(transaction, ride_ref, driver_id)
+            ride_dict = await accept_in_transaction(transaction, ride_ref, driver_id)
+            invalidate_count(count_cache_key(self.collection, "driverId", driver_id))
             
-            # Fetch updated document
-            updated_doc = ride_ref.get()
-            ride_dict = updated_doc.to_dict()
             # Serialize Firestore document to JSON-serializable format
-            return serialize_firestore_document(ride_dict) if ride_dict else {}
+            return serialize_firestore_document(ride_dict)
             
         except (NotFoundError, ConflictError):
             raise
@@ -327,9 +312,15 @@ class RideRepository:
         self,
         ride_id: str,
         status: str,
-        updates: Optional[Dict[str, Any]] = None
+        updates: Optional[Dict[str, Any]] = None,
+        current: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
-        """Update ride status"""
+        """
+        Update ride status
+        
+        Pass the ride as already loaded by the caller in `current` to build the
+        result locally; otherwise the ride is read back after the update.
+        """
         try:
             ride_ref = self.db.collection(self.collection).document(ride_id)
             
@@ -341,10 +332,15 @@ class RideRepository:
             if updates:
                 update_data.update(updates)
             
-            ride_ref.update(update_data)
+            write_result = await ride_ref.update(update_data)
+            
+            if current is not None:
+                ride_dict = merge_written(update_data, write_result.update_time, current=current)
+                # Serialize Firestore document to JSON-serializable format
+                return serialize_firestore_document(ride_dict)
             
             # Fetch updated document
-            doc = ride_ref.get()
+            doc = await ride_ref.get()
             if doc.exists:
                 ride_dict = doc.to_dict()
                 # Serialize Firestore document to JSON-serializable format
@@ -380,7 +376,8 @@ class RideRepository:
             return await self.update_ride_status(
                 ride_id=ride_id,
                 status="cancelled",
-                updates={"cancellationReason": reason}
+                updates={"cancellationReason": reason},
+                current=ride
             )
             
         except (NotFoundError, ConflictError):
@@ -415,7 +412,8 @@ class RideRepository:
                 updates={
                     "rating": rating,
                     "review": review
-                }
+                },
+                current=ride
             )
             
         except (NotFoundError, ConflictError):
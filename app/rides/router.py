@@ -1,6 +1,7 @@
 """
 Ride Router - User Endpoints
 """
+from typing import Optional
 from fastapi import APIRouter, Depends, Query, status
 from app.core.responses import success_response
 from app.core.security import get_current_user
@@ -122,12 +123,13 @@ async def get_ride_status(
 async def get_user_rides(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page (takes precedence over page)"),
     current_user: dict = Depends(get_current_user)
 ):
     """Get all rides for the logged in user"""
     try:
         user_id = current_user["uid"]
-        result = await service.get_user_rides(user_id, page, limit)
+        result = await service.get_user_rides(user_id, page, limit, cursor)
         
         return success_response(
             message="Rides retrieved successfully",
@@ -144,6 +146,7 @@ async def get_nearby_drivers(
     latitude: float = Query(..., ge=-90, le=90, description="User's latitude"),
     longitude: float = Query(..., ge=-180, le=180, description="User's longitude"),
     radius: float = Query(5.0, gt=0, le=100, description="Search radius in km (default: 5, max: 100)"),
+    include_eta: bool = Query(False, description="Add driving ETAs to the user's location and rank drivers by ETA"),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -156,6 +159,8 @@ async def get_nearby_drivers(
         latitude: User's latitude (-90 to 90)
         longitude: User's longitude (-180 to 180)
         radius: Search radius in kilometers (0.1 to 100, default: 5)
+        include_eta: Add eta_seconds, eta_text and eta_estimated to each driver
+            and sort by ETA instead of distance
         
     Returns:
         List of nearby drivers with location and distance information
@@ -173,7 +178,8 @@ async def get_nearby_drivers(
         drivers = await driver_service.get_nearby_drivers(
             latitude=latitude,
             longitude=longitude,
-            radius_km=radius
+            radius_km=radius,
+            include_eta=include_eta
         )
         
         # Check if any drivers found
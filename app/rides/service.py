@@ -1,12 +1,11 @@
 """
 Ride Service - Business Logic
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import uuid
 from app.rides.repository import RideRepository
-from app.drivers.repository import DriverRepository
 from app.maps.service import maps_service
-from app.notifications.service import notification_service
+from app.rides.notifications import enqueue_ride_cancelled, enqueue_ride_requested
 from app.core.config import settings
 from app.core.logging import logger
 from app.core.exceptions import ValidationError, NotFoundError, ConflictError
@@ -19,7 +18,6 @@ class RideService:
     
     def __init__(self):
         self.repository = RideRepository()
-        self.driver_repository = DriverRepository()
     
     async def request_ride(self, user_id: str, request: RequestRideRequest) -> Dict[str, Any]:
         """
@@ -60,26 +58,16 @@ class RideService:
                 passenger_count=request.passengerCount
             )
             
-            # Find nearby drivers and send notifications
+            # Nearby drivers are found and notified by the outbox workers
             try:
-                nearby_drivers = await self.driver_repository.get_nearby_drivers(
-                    latitude=request.pickup_location.latitude,
-                    longitude=request.pickup_location.longitude,
-                    radius_km=5.0
+                await enqueue_ride_requested(
+                    ride_id=ride_id,
+                    pickup_location=request.pickup_location.model_dump(),
+                    dropoff_location=request.dropoff_location.model_dump(),
+                    estimated_fare=estimated_fare
                 )
-                
-                driver_ids = [driver["id"] for driver in nearby_drivers]
-                
-                if driver_ids:
-                    await notification_service.notify_ride_requested(
-                        driver_ids=driver_ids,
-                        ride_id=ride_id,
-                        pickup_location=request.pickup_location.model_dump(),
-                        dropoff_location=request.dropoff_location.model_dump(),
-                        estimated_fare=estimated_fare
-                    )
             except Exception as e:
-                logger.warning(f"Failed to notify drivers: {str(e)}")
+                logger.warning(f"Failed to queue driver notifications: {str(e)}")
                 # Continue even if notification fails
             
             # Serialize Firestore document to JSON-serializable format
@@ -108,13 +96,13 @@ class RideService:
             # Notify driver if ride was accepted
             if ride.get("driverId"):
                 try:
-                    await notification_service.notify_ride_cancelled(
+                    await enqueue_ride_cancelled(
                         user_id=ride["driverId"],
                         ride_id=request.ride_id,
                         reason=request.reason or "Ride cancelled by rider"
                     )
                 except Exception as e:
-                    logger.warning(f"Failed to notify driver: {str(e)}")
+                    logger.warning(f"Failed to queue driver notification: {str(e)}")
             
             # Serialize Firestore document to JSON-serializable format
             return serialize_firestore_document(ride) if ride else {}
@@ -171,11 +159,12 @@ class RideService:
         self,
         user_id: str,
         page: int = 1,
-        limit: int = 10
+        limit: int = 10,
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """Get all rides for a user"""
         try:
-            return await self.repository.get_user_rides(user_id, page, limit)
+            return await self.repository.get_user_rides(user_id, page, limit, cursor)
             
         except Exception as e:
             logger.error(f"Error getting user rides: {str(e)}")
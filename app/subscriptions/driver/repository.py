@@ -4,20 +4,26 @@ Driver Subscription Repository
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
 from firebase_admin import firestore
-from app.core.firebase import get_firestore
+from app.core.firebase import get_async_firestore
 from app.core.config import settings
 from app.core.logging import logger
 from app.core.exceptions import NotFoundError, ValidationError
 from app.core.serializers import serialize_firestore_document
+from app.core.firestore_utils import cached_count, count_cache_key, fetch_page, invalidate_count, merge_written
+from app.core.document_cache import document_cache
 
 
 class DriverSubscriptionRepository:
     """Repository for driver subscription Firestore operations"""
     
     def __init__(self):
-        self.db = get_firestore()
+        self.db = get_async_firestore()
         self.collection = "driver_subscriptions"
     
+    def _active_cache_key(self, driver_id: str) -> str:
+        """Document cache key for a driver's active subscription"""
+        return f"{self.collection}:active:{driver_id}"
+    
     async def create_subscription(
         self,
         subscription_id: str,
@@ -43,21 +49,31 @@ class DriverSubscriptionRepository:
             }
             
             doc_ref = self.db.collection(self.collection).document(subscription_id)
-            doc_ref.set(subscription_data)
-            
-            doc = doc_ref.get()
-            if doc.exists:
-                doc_dict = doc.to_dict()
-                return serialize_firestore_document(doc_dict) if doc_dict else {}
+            write_result = await doc_ref.set(subscription_data)
             
-            raise Exception("Failed to create subscription")
+            doc_dict = serialize_firestore_document(merge_written(subscription_data, write_result.update_time))
+            await document_cache.set(self._active_cache_key(driver_id), doc_dict)
+            return doc_dict
             
         except Exception as e:
             logger.error(f"Error creating subscription: {str(e)}")
             raise
     
     async def get_subscription_by_driver(self, driver_id: str) -> Optional[Dict[str, Any]]:
-        """Get active subscription for a driver"""
+        """
+        Get active subscription for a driver
+        
+        Served from the document cache when possible. "No active subscription"
+        is cached too, since it is checked on every driver screen.
+        """
+        return await document_cache.get_or_load(
+            self._active_cache_key(driver_id),
+            lambda: self._load_active_subscription(driver_id),
+            cache_absent=True
+        )
+    
+    async def _load_active_subscription(self, driver_id: str) -> Optional[Dict[str, Any]]:
+        """Query the active subscription for a driver from Firestore"""
         try:
             # Use filter keyword argument (best practice - avoids deprecation warning)
             query = (
@@ -68,7 +84,7 @@ class DriverSubscriptionRepository:
             )
             
             docs = query.stream()
-            for doc in docs:
+            async for doc in docs:
                 doc_dict = doc.to_dict()
                 return serialize_firestore_document(doc_dict) if doc_dict else None
             
@@ -82,7 +98,7 @@ class DriverSubscriptionRepository:
         """Get subscription by ID"""
         try:
             doc_ref = self.db.collection(self.collection).document(subscription_id)
-            doc = doc_ref.get()
+            doc = await doc_ref.get()
             
             if doc.exists:
                 doc_dict = doc.to_dict()
@@ -97,21 +113,36 @@ class DriverSubscriptionRepository:
     async def update_subscription(
         self,
         subscription_id: str,
-        updates: Dict[str, Any]
+        updates: Dict[str, Any],
+        current: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
-        """Update subscription"""
+        """
+        Update subscription
+        
+        Pass the subscription as already loaded by the caller in `current` to
+        build the result locally; otherwise it is read back after the update.
+        """
         try:
             updates["updatedAt"] = firestore.SERVER_TIMESTAMP
             
             doc_ref = self.db.collection(self.collection).document(subscription_id)
-            doc_ref.update(updates)
+            write_result = await doc_ref.update(updates)
             
-            doc = doc_ref.get()
-            if doc.exists:
-                doc_dict = doc.to_dict()
-                return serialize_firestore_document(doc_dict) if doc_dict else {}
+            if current is not None:
+                doc_dict = serialize_firestore_document(
+                    merge_written(updates, write_result.update_time, current=current)
+                )
+            else:
+                doc = await doc_ref.get()
+                if not doc.exists:
+                    raise NotFoundError(f"Subscription {subscription_id} not found")
+                doc_dict = serialize_firestore_document(doc.to_dict() or {})
+            
+            # Status or dates may have changed which subscription is active
+            if doc_dict.get("driverId"):
+                await document_cache.invalidate(self._active_cache_key(doc_dict["driverId"]))
             
-            raise NotFoundError(f"Subscription {subscription_id} not found")
+            return doc_dict
             
         except NotFoundError:
             raise
@@ -140,14 +171,11 @@ class DriverSubscriptionRepository:
             }
             
             doc_ref = self.db.collection("subscription_payments").document(payment_id)
-            doc_ref.set(payment_data)
+            write_result = await doc_ref.set(payment_data)
+            invalidate_count(count_cache_key("subscription_payments", "driverId", driver_id))
             
-            doc = doc_ref.get()
-            if doc.exists:
-                doc_dict = doc.to_dict()
-                return serialize_firestore_document(doc_dict) if doc_dict else {}
-            
-            raise Exception("Failed to create payment record")
+            doc_dict = merge_written(payment_data, write_result.update_time)
+            return serialize_firestore_document(doc_dict)
             
         except Exception as e:
             logger.error(f"Error creating payment record: {str(e)}")
@@ -157,23 +185,17 @@ class DriverSubscriptionRepository:
         self,
         driver_id: str,
         page: int = 1,
-        limit: int = 10
+        limit: int = 10,
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """Get payment history for a driver"""
         try:
-            offset = (page - 1) * limit
-            
             # Use filter keyword argument (best practice - avoids deprecation warning)
-            query = (
-                self.db.collection("subscription_payments")
-                .where(filter=firestore.FieldFilter("driverId", "==", driver_id))
-                .order_by("createdAt", direction=firestore.Query.DESCENDING)
-                .limit(limit)
-                .offset(offset)
-            )
+            collection_ref = self.db.collection("subscription_payments")
+            query = collection_ref.where(filter=firestore.FieldFilter("driverId", "==", driver_id))
             
             try:
-                docs = query.stream()
+                docs, next_cursor = await fetch_page(query, collection_ref, page, limit, cursor)
                 payments = [serialize_firestore_document(doc.to_dict()) for doc in docs]
             except Exception as query_error:
                 error_msg = str(query_error)
@@ -201,16 +223,15 @@ class DriverSubscriptionRepository:
                         )
                 raise
             
-            total_query = self.db.collection("subscription_payments").where(filter=firestore.FieldFilter("driverId", "==", driver_id))
-            total_docs = total_query.stream()
-            total = sum(1 for _ in total_docs)
+            total = await cached_count(count_cache_key("subscription_payments", "driverId", driver_id), query)
             
             return {
                 "payments": payments,
                 "total": total,
                 "page": page,
                 "limit": limit,
-                "hasMore": (page * limit) < total
+                "hasMore": next_cursor is not None,
+                "nextCursor": next_cursor
             }
             
         except ValidationError:
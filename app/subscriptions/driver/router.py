@@ -1,6 +1,7 @@
 """
 Driver Subscription Router
 """
+from typing import Optional
 from fastapi import APIRouter, Depends, Query, status
 from app.core.responses import success_response
 from app.core.security import get_current_driver
@@ -145,6 +146,7 @@ async def get_subscription_history(
     driver_id: str,
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page (takes precedence over page)"),
     current_driver: dict = Depends(get_current_driver)
 ):
     """Get subscription payment history for a driver"""
@@ -154,7 +156,7 @@ async def get_subscription_history(
             from app.core.exceptions import ForbiddenError
             raise ForbiddenError("You can only view your own payment history")
         
-        result = await service.get_payment_history(driver_id, page, limit)
+        result = await service.get_payment_history(driver_id, page, limit, cursor)
         
         return success_response(
             message="Payment history retrieved successfully",
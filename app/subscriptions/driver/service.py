@@ -62,7 +62,8 @@ class DriverSubscriptionService:
                     # Update status to expired
                     await self.repository.update_subscription(
                         subscription["id"],
-                        {"status": "expired"}
+                        {"status": "expired"},
+                        current=subscription
                     )
                     subscription["status"] = "expired"
             
@@ -121,7 +122,7 @@ class DriverSubscriptionService:
                 return subscription
             
             # Update using the subscription ID from the retrieved subscription
-            return await self.repository.update_subscription(subscription["id"], updates)
+            return await self.repository.update_subscription(subscription["id"], updates, current=subscription)
             
         except (NotFoundError, ValidationError):
             raise
@@ -162,7 +163,8 @@ class DriverSubscriptionService:
                         "status": "active",
                         "startDate": start_date,
                         "endDate": end_date
-                    }
+                    },
+                    current=subscription
                 )
             
             # Create payment record
@@ -190,11 +192,12 @@ class DriverSubscriptionService:
         self,
         driver_id: str,
         page: int = 1,
-        limit: int = 10
+        limit: int = 10,
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """Get subscription payment history"""
         try:
-            return await self.repository.get_payment_history(driver_id, page, limit)
+            return await self.repository.get_payment_history(driver_id, page, limit, cursor)
             
         except Exception as e:
             logger.error(f"Error getting payment history: {str(e)}")
@@ -219,7 +222,7 @@ class DriverSubscriptionService:
                 "cancellationReason": reason
             }
             
-            return await self.repository.update_subscription(subscription["id"], updates)
+            return await self.repository.update_subscription(subscription["id"], updates, current=subscription)
             
         except NotFoundError:
             raise
@@ -4,18 +4,19 @@ Parent Subscription Repository
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
 from firebase_admin import firestore
-from app.core.firebase import get_firestore
+from app.core.firebase import get_async_firestore
 from app.core.config import settings
 from app.core.logging import logger
 from app.core.exceptions import NotFoundError
 from app.core.serializers import serialize_firestore_document
+from app.core.firestore_utils import merge_written
 
 
 class ParentSubscriptionRepository:
     """Repository for parent subscription Firestore operations"""
     
     def __init__(self):
-        self.db = get_firestore()
+        self.db = get_async_firestore()
         self.collection = "parent_subscriptions"
         self.children_collection = "children_profiles"
     
@@ -46,7 +47,10 @@ class ParentSubscriptionRepository:
             }
             
             doc_ref = self.db.collection(self.collection).document(subscription_id)
-            doc_ref.set(subscription_data)
+            
+            # Write subscription and child profiles in a single batch commit
+            batch = self.db.batch()
+            batch.set(doc_ref, subscription_data)
             
             # Create child profile documents
             import uuid
@@ -60,14 +64,13 @@ class ParentSubscriptionRepository:
                     "subscriptionId": subscription_id,
                     "createdAt": firestore.SERVER_TIMESTAMP
                 }
-                child_ref.set(child_data)
+                batch.set(child_ref, child_data)
             
-            doc = doc_ref.get()
-            if doc.exists:
-                doc_dict = doc.to_dict()
-                return serialize_firestore_document(doc_dict) if doc_dict else {}
+            write_results = await batch.commit()
             
-            raise Exception("Failed to create subscription")
+            # The subscription is the first write of the batch
+            doc_dict = merge_written(subscription_data, write_results[0].update_time)
+            return serialize_firestore_document(doc_dict)
             
         except Exception as e:
             logger.error(f"Error creating parent subscription: {str(e)}")
@@ -85,7 +88,7 @@ class ParentSubscriptionRepository:
             )
             
             docs = query.stream()
-            for doc in docs:
+            async for doc in docs:
                 doc_dict = doc.to_dict()
                 return serialize_firestore_document(doc_dict) if doc_dict else None
             
@@ -98,16 +101,26 @@ class ParentSubscriptionRepository:
     async def update_subscription(
         self,
         subscription_id: str,
-        updates: Dict[str, Any]
+        updates: Dict[str, Any],
+        current: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
-        """Update subscription"""
+        """
+        Update subscription
+        
+        Pass the subscription as already loaded by the caller in `current` to
+        build the result locally; otherwise it is read back after the update.
+        """
         try:
             updates["updatedAt"] = firestore.SERVER_TIMESTAMP
             
             doc_ref = self.db.collection(self.collection).document(subscription_id)
-            doc_ref.update(updates)
+            write_result = await doc_ref.update(updates)
+            
+            if current is not None:
+                doc_dict = merge_written(updates, write_result.update_time, current=current)
+                return serialize_firestore_document(doc_dict)
             
-            doc = doc_ref.get()
+            doc = await doc_ref.get()
             if doc.exists:
                 doc_dict = doc.to_dict()
                 return serialize_firestore_document(doc_dict) if doc_dict else {}
@@ -130,7 +143,7 @@ class ParentSubscriptionRepository:
             )
             
             docs = query.stream()
-            children = [serialize_firestore_document(doc.to_dict()) for doc in docs]
+            children = [serialize_firestore_document(doc.to_dict()) async for doc in docs]
             
             return children
             
@@ -152,30 +165,25 @@ class ParentSubscriptionRepository:
             child_data["id"] = child_id
             child_data["userId"] = user_id
             child_data["subscriptionId"] = subscription_id
-            child_data["createdAt"] = firestore.SERVER_TIMESTAMP
             
-            child_ref.set(child_data)
+            # Sentinels are rejected inside array elements, so the subscription
+            # keeps the child without its server-set createdAt
+            subscription_child = dict(child_data)
+            child_data["createdAt"] = firestore.SERVER_TIMESTAMP
             
-            # Update subscription to include new child
+            # Create the child and append it to the subscription in a single batch commit
             subscription_ref = self.db.collection(self.collection).document(subscription_id)
-            subscription_doc = subscription_ref.get()
-            
-            if subscription_doc.exists:
-                subscription_data = subscription_doc.to_dict()
-                children = subscription_data.get("childrenProfiles", [])
-                children.append(child_data)
-                
-                subscription_ref.update({
-                    "childrenProfiles": children,
-                    "updatedAt": firestore.SERVER_TIMESTAMP
-                })
-            
-            doc = child_ref.get()
-            if doc.exists:
-                doc_dict = doc.to_dict()
-                return serialize_firestore_document(doc_dict) if doc_dict else {}
+            batch = self.db.batch()
+            batch.set(child_ref, child_data)
+            batch.update(subscription_ref, {
+                "childrenProfiles": firestore.ArrayUnion([subscription_child]),
+                "updatedAt": firestore.SERVER_TIMESTAMP
+            })
+            write_results = await batch.commit()
             
-            raise Exception("Failed to create child profile")
+            # The child profile is the first write of the batch
+            doc_dict = merge_written(child_data, write_results[0].update_time)
+            return serialize_firestore_document(doc_dict)
             
         except Exception as e:
             logger.error(f"Error adding child profile: {str(e)}")
@@ -204,7 +212,7 @@ class ParentSubscriptionRepository:
             )
             
             docs = query.stream()
-            rides = [serialize_firestore_document(doc.to_dict()) for doc in docs]
+            rides = [serialize_firestore_document(doc.to_dict()) async for doc in docs]
             
             completed_rides = [r for r in rides if r.get("status") == "completed"]
             
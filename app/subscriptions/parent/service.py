@@ -65,7 +65,8 @@ class ParentSubscriptionService:
                 if isinstance(end_date, datetime) and end_date < datetime.utcnow():
                     await self.repository.update_subscription(
                         subscription["id"],
-                        {"status": "expired"}
+                        {"status": "expired"},
+                        current=subscription
                     )
                     subscription["status"] = "expired"
             
@@ -94,7 +95,7 @@ class ParentSubscriptionService:
             if not updates:
                 return subscription
             
-            return await self.repository.update_subscription(subscription["id"], updates)
+            return await self.repository.update_subscription(subscription["id"], updates, current=subscription)
             
         except NotFoundError:
             raise
@@ -115,7 +116,8 @@ class ParentSubscriptionService:
                 {
                     "status": "cancelled",
                     "cancellationReason": request.reason
-                }
+                },
+                current=subscription
             )
             
         except NotFoundError:
@@ -4,18 +4,27 @@ User Repository - Firestore Operations
 from typing import Optional, Dict, Any
 from datetime import datetime
 from firebase_admin import firestore
-from app.core.firebase import get_firestore
+from google.api_core.exceptions import AlreadyExists
+from app.core.firebase import get_async_firestore
 from app.core.logging import logger
 from app.core.exceptions import NotFoundError
+from app.core.firestore_utils import merge_written
+from app.core.config import settings
+from app.core.document_cache import document_cache
+from app.core import phone_index
 
 
 class UserRepository:
     """Repository for user Firestore operations"""
     
     def __init__(self):
-        self.db = get_firestore()
+        self.db = get_async_firestore()
         self.collection = "users"
     
+    def _cache_key(self, user_id: str) -> str:
+        """Document cache key for a user"""
+        return f"{self.collection}:{user_id}"
+    
     async def create_user(
         self,
         user_id: str,
@@ -25,9 +34,9 @@ class UserRepository:
         email: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Create a new user document in Firestore using transaction for atomicity
+        Create a new user document in Firestore
         
-        Best Practice: Use transactions to ensure data consistency
+        Best Practice: Use create() so an existing document is never overwritten
         """
         try:
             user_data = {
@@ -42,32 +51,22 @@ class UserRepository:
             
             doc_ref = self.db.collection(self.collection).document(user_id)
             
-            # Use transaction to ensure atomicity (best practice)
-            transaction = self.db.transaction()
-            
-            @firestore.transactional
-            def create_user_transaction(transaction):
-                # Check if document already exists
-                doc = doc_ref.get(transaction=transaction)
-                if doc.exists:
-                    raise ValueError(f"User {user_id} already exists")
-                
-                # Create document atomically
-                transaction.set(doc_ref, user_data)
-            
-            # Execute transaction
-            create_user_transaction(transaction)
-            
-            # Fetch the created document to return with timestamps
-            doc = doc_ref.get()
-            if doc.exists:
-                user_dict = doc.to_dict()
-                # Ensure "id" field is set from document ID
-                if user_dict and "id" not in user_dict:
-                    user_dict["id"] = doc.id
-                return user_dict
-            
-            raise Exception("Failed to create user document")
+            # create() fails if the document exists, so existence check and
+            # write happen atomically in a single round trip (with the phone index entry)
+            try:
+                write_result = await phone_index.commit_with_entry(
+                    self.db,
+                    lambda batch: batch.create(doc_ref, user_data),
+                    phone_index.USER_FIELD,
+                    user_id,
+                    phone_number
+                )
+            except AlreadyExists:
+                raise ValueError(f"User {user_id} already exists")
+            
+            user_dict = merge_written(user_data, write_result.update_time)
+            await document_cache.set(self._cache_key(user_id), user_dict)
+            return user_dict
             
         except ValueError:
             # Re-raise validation errors
@@ -76,11 +75,64 @@ class UserRepository:
             logger.error(f"Error creating user: {str(e)}")
             raise
     
+    async def get_or_create_user(self, user_id: str, phone_number: str) -> Dict[str, Any]:
+        """
+        Get a user document, creating a minimal one if it does not exist
+        
+        Used at login, where the document is normally missing: create() is
+        tried first, so a new user costs one round trip and the existing
+        document is only read when the create is rejected.
+        """
+        try:
+            user_data = {
+                "id": user_id,
+                "phone_number": phone_number,
+                "name": "",  # Will be set in create-account
+                "userType": "user",
+                "email": None,
+                "createdAt": firestore.SERVER_TIMESTAMP,
+                "updatedAt": firestore.SERVER_TIMESTAMP,
+            }
+            
+            doc_ref = self.db.collection(self.collection).document(user_id)
+            try:
+                write_result = await phone_index.commit_with_entry(
+                    self.db,
+                    lambda batch: batch.create(doc_ref, user_data),
+                    phone_index.USER_FIELD,
+                    user_id,
+                    phone_number
+                )
+            except AlreadyExists:
+                # A cached "absent" marker would hide the existing document
+                await document_cache.invalidate(self._cache_key(user_id))
+                user_dict = await self.get_user_by_id(user_id)
+                if user_dict is None:
+                    raise NotFoundError(f"User {user_id} not found")
+                if user_dict.get("phone_number") == phone_number:
+                    await phone_index.repair(self.db, phone_number, phone_index.USER_FIELD, user_id)
+                return user_dict
+            
+            user_dict = merge_written(user_data, write_result.update_time)
+            await document_cache.set(self._cache_key(user_id), user_dict)
+            return user_dict
+            
+        except Exception as e:
+            logger.error(f"Error getting or creating user: {str(e)}")
+            raise
+    
     async def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
-        """Get user by ID"""
+        """Get user by ID (served from the document cache when possible)"""
+        return await document_cache.get_or_load(
+            self._cache_key(user_id),
+            lambda: self._load_user(user_id)
+        )
+    
+    async def _load_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Read user document from Firestore"""
         try:
             doc_ref = self.db.collection(self.collection).document(user_id)
-            doc = doc_ref.get()
+            doc = await doc_ref.get()
             
             if doc.exists:
                 return doc.to_dict()
@@ -92,17 +144,35 @@ class UserRepository:
             raise
     
     async def get_user_by_phone(self, phone_number: str) -> Optional[Dict[str, Any]]:
-        """Get user by phone number"""
+        """
+        Get user by phone number
+        
+        Resolved through the phone index (direct gets, usually cached); the
+        collection query is only run for phone numbers missing from the index
+        while PHONE_INDEX_FALLBACK_QUERY is on.
+        """
         try:
+            user_id = await phone_index.lookup(self.db, phone_number, phone_index.USER_FIELD)
+            if user_id:
+                user_data = await self.get_user_by_id(user_id)
+                # Ignore stale entries (document deleted or phone number changed)
+                if user_data and user_data.get("phone_number") == phone_number:
+                    user_data.setdefault("id", user_id)
+                    return user_data
+            
+            if not settings.PHONE_INDEX_FALLBACK_QUERY:
+                return None
+            
             # Use filter keyword argument (best practice - avoids deprecation warning)
             query = self.db.collection(self.collection).where(filter=firestore.FieldFilter("phone_number", "==", phone_number)).limit(1)
             docs = query.stream()
             
-            for doc in docs:
+            async for doc in docs:
                 user_data = doc.to_dict()
                 # Ensure "id" field is set from document ID
                 if user_data and "id" not in user_data:
                     user_data["id"] = doc.id
+                await phone_index.repair(self.db, phone_number, phone_index.USER_FIELD, doc.id)
                 return user_data
             
             return None
@@ -114,20 +184,46 @@ class UserRepository:
     async def update_user(
         self,
         user_id: str,
-        updates: Dict[str, Any]
+        updates: Dict[str, Any],
+        current: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
-        """Update user document"""
+        """
+        Update user document
+        
+        Pass the document as already loaded by the caller in `current` to build
+        the result locally; otherwise it is read back after the update. Phone
+        number changes always read the document within their transaction.
+        """
         try:
             updates["updatedAt"] = firestore.SERVER_TIMESTAMP
             
             doc_ref = self.db.collection(self.collection).document(user_id)
-            doc_ref.update(updates)
+            if "phone_number" in updates:
+                # Move the phone index entry in the same transaction
+                user_dict = await phone_index.update_with_entry(
+                    self.db, doc_ref, updates, phone_index.USER_FIELD, user_id
+                )
+                if user_dict is None:
+                    await document_cache.invalidate(self._cache_key(user_id))
+                    raise NotFoundError(f"User {user_id} not found")
+                await document_cache.set(self._cache_key(user_id), user_dict)
+                return user_dict
+            
+            write_result = await doc_ref.update(updates)
+            
+            if current is not None:
+                user_dict = merge_written(updates, write_result.update_time, current=current)
+                await document_cache.set(self._cache_key(user_id), user_dict)
+                return user_dict
             
             # Fetch updated document
-            doc = doc_ref.get()
+            doc = await doc_ref.get()
             if doc.exists:
-                return doc.to_dict()
+                user_dict = doc.to_dict()
+                await document_cache.set(self._cache_key(user_id), user_dict)
+                return user_dict
             
+            await document_cache.invalidate(self._cache_key(user_id))
             raise NotFoundError(f"User {user_id} not found")
             
         except Exception as e:
@@ -143,11 +239,12 @@ class UserRepository:
         """Update user location"""
         try:
             doc_ref = self.db.collection(self.collection).document(user_id)
-            doc_ref.update({
+            await doc_ref.update({
                 "location": firestore.GeoPoint(latitude, longitude),
                 "locationUpdatedAt": firestore.SERVER_TIMESTAMP,
                 "updatedAt": firestore.SERVER_TIMESTAMP
             })
+            await document_cache.invalidate(self._cache_key(user_id))
             
         except Exception as e:
             logger.error(f"Error updating user location: {str(e)}")
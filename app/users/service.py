@@ -1,10 +1,11 @@
 """
 User Service - Business Logic
 """
+import asyncio
 from typing import Optional, Dict, Any
 from firebase_admin import auth as firebase_auth
-from firebase_admin import auth
-from app.core.firebase import get_firebase_auth
+from app.core import phone_login
+from app.core.auth_client import auth_client
 from app.core.config import settings
 from app.core.logging import logger
 from app.core.exceptions import ValidationError, NotFoundError, ConflictError, UnauthorizedError
@@ -19,7 +20,6 @@ class UserService:
     
     def __init__(self):
         self.repository = UserRepository()
-        self.auth = get_firebase_auth()
     
     async def send_phone_otp(self, phone_number: str) -> Dict[str, Any]:
         """
@@ -65,77 +65,45 @@ class UserService:
             # In production, verify OTP with Firebase Auth
             # For now, we'll accept any 6-digit OTP for development
             
-            # Check if user exists in Firestore
-            existing_user = await self.repository.get_user_by_phone(phone_number)
+            # Look the phone number up in Firestore and Firebase Auth concurrently
+            existing_user, auth_record = await asyncio.gather(
+                self.repository.get_user_by_phone(phone_number),
+                phone_login.find_auth_user(phone_number)
+            )
             
-            user_id: str
+            user_id: Optional[str] = None
             if existing_user:
                 # Get user_id from document (repository ensures "id" field exists)
                 user_id = existing_user.get("id")
                 if not user_id:
                     # This shouldn't happen with the repository fix, but handle it just in case
                     raise ValidationError("User data is missing ID field. Please contact support.")
-                
-                # Verify user exists in Firebase Auth
-                # If not, create them (user might exist in Firestore but not Auth)
-                try:
-                    self.auth.get_user(user_id)
-                    logger.info(f"User {user_id} exists in Firebase Auth")
-                except firebase_auth.UserNotFoundError:
-                    # User exists in Firestore but not in Firebase Auth - create Auth user
-                    logger.info(f"User {user_id} exists in Firestore but not in Auth, creating Auth user")
-                    try:
-                        # Try to create with the same UID
-                        user_record = self.auth.create_user(uid=user_id, phone_number=phone_number)
-                        logger.info(f"Created Firebase Auth user with existing UID: {user_id}")
-                    except firebase_auth.UidAlreadyExistsError:
-                        # User was created between check and create - that's fine
-                        logger.info(f"User {user_id} was created concurrently")
-                    except Exception as e:
-                        logger.error(f"Error creating Firebase Auth user: {str(e)}")
-                        # Continue anyway - we'll use the user_id from Firestore
-            else:
-                # Create new Firebase Auth user
-                try:
-                    user_record = self.auth.create_user(phone_number=phone_number)
-                    user_id = user_record.uid
-                    logger.info(f"Created new Firebase Auth user: {user_id}")
-                except Exception as e:
-                    logger.error(f"Error creating Firebase user: {str(e)}")
-                    raise ValidationError("Failed to create user account")
             
-            # Generate custom token with custom claims for RBAC
-            # Best Practice: Client should exchange this for ID token using Firebase SDK
-            # Custom claims allow role-based access control
+            # Custom claims for RBAC
             custom_claims = {
                 "user_type": "user"  # Set user_type in custom claims for RBAC
             }
-            custom_token = auth.create_custom_token(user_id, custom_claims)
-            
-            # Ensure custom_token is a string (not bytes)
-            if isinstance(custom_token, bytes):
-                custom_token = custom_token.decode('utf-8')
-            elif not isinstance(custom_token, str):
-                custom_token = str(custom_token)
             
-            # Set custom claims on Firebase Auth user for ID token generation
+            # Make sure the Auth user exists (created for new phone numbers)
             try:
-                self.auth.set_custom_user_claims(user_id, custom_claims)
-                logger.info(f"Set custom claims for user: {user_id}")
+                user_id, auth_record = await phone_login.ensure_auth_user(
+                    phone_number, user_id, auth_record, custom_claims
+                )
             except Exception as e:
-                logger.warning(f"Could not set custom claims: {str(e)}")
-                # Continue - custom token will still work
+                logger.error(f"Error creating Firebase user: {str(e)}")
+                raise ValidationError("Failed to create user account")
             
-            # Get or create user document
-            user_doc = await self.repository.get_user_by_id(user_id)
-            if not user_doc:
-                # Create user document with minimal info
-                user_doc = await self.repository.create_user(
-                    user_id=user_id,
-                    phone_number=phone_number,
-                    name="",  # Will be set in create-account
-                    user_type="user",
-                    email=None
+            # Generate custom token with custom claims
+            # Best Practice: Client should exchange this for ID token using Firebase SDK
+            # Custom claims are only written when they differ from the stored ones
+            if existing_user:
+                user_doc = existing_user
+                custom_token = await phone_login.issue_token(user_id, custom_claims, auth_record)
+            else:
+                # Create the user document with minimal info alongside the token
+                custom_token, user_doc = await asyncio.gather(
+                    phone_login.issue_token(user_id, custom_claims, auth_record),
+                    self.repository.get_or_create_user(user_id, phone_number)
                 )
             
             # Serialize Firestore document to JSON-serializable format
@@ -217,7 +185,7 @@ class UserService:
                 user_data["email"] = request.email
                 # Update Firebase Auth email if needed
                 try:
-                    self.auth.update_user(user_id, email=request.email)
+                    await auth_client.update_user(user_id, email=request.email)
                 except Exception as e:
                     logger.warning(f"Could not update Firebase Auth email: {str(e)}")
             
@@ -227,13 +195,13 @@ class UserService:
                 "user_type": request.userType  # Set user_type in custom claims
             }
             try:
-                self.auth.set_custom_user_claims(user_id, custom_claims)
+                await auth_client.set_custom_user_claims(user_id, custom_claims)
                 logger.info(f"Updated custom claims for user: {user_id}, type: {request.userType}")
             except Exception as e:
                 logger.warning(f"Could not update custom claims: {str(e)}")
                 # Continue - user data is still updated
             
-            updated_user = await self.repository.update_user(user_id, user_data)
+            updated_user = await self.repository.update_user(user_id, user_data, current=existing_user)
             
             # Serialize Firestore document to JSON-serializable format
             # Best Practice: Ensure all Firestore types are converted before API response
@@ -274,7 +242,7 @@ class UserService:
                 updates["email"] = request.email
                 # Update Firebase Auth email
                 try:
-                    self.auth.update_user(user_id, email=request.email)
+                    await auth_client.update_user(user_id, email=request.email)
                 except Exception as e:
                     logger.warning(f"Could not update Firebase Auth email: {str(e)}")
             
@@ -329,7 +297,7 @@ class UserService:
             
             # Verify user exists in Firebase Auth
             try:
-                user_record = self.auth.get_user(user_id)
+                user_record = await auth_client.get_user(user_id)
                 logger.info(f"User {user_id} verified in Firebase Auth for token refresh")
             except firebase_auth.UserNotFoundError:
                 logger.error(f"User {user_id} not found in Firebase Auth")
@@ -368,7 +336,7 @@ class UserService:
             custom_claims = {
                 "user_type": user_type
             }
-            custom_token = auth.create_custom_token(user_id, custom_claims)
+            custom_token = await auth_client.create_custom_token(user_id, custom_claims)
             
             # Ensure custom_token is a string
             if isinstance(custom_token, bytes):
@@ -378,7 +346,7 @@ class UserService:
             
             # Update custom claims on Firebase Auth user
             try:
-                self.auth.set_custom_user_claims(user_id, custom_claims)
+                await auth_client.set_custom_user_claims(user_id, custom_claims)
                 logger.info(f"Updated custom claims for user: {user_id}, type: {user_type}")
             except Exception as e:
                 logger.warning(f"Could not update custom claims: {str(e)}")
@@ -0,0 +1,114 @@
+"""
+Script to backfill the geohash field of existing driver documents
+
+Nearby-driver search queries online drivers by geohash prefix ranges, so a
+driver without a geohash is invisible to it until their next location update.
+This script writes the geohash of every driver with a location but a missing
+or outdated geohash (e.g. documents written before the field existed).
+
+The script is idempotent: up-to-date drivers are skipped, so it can be re-run
+safely.
+
+Usage:
+    python scripts/backfill_driver_geohash.py            # write geohashes
+    python scripts/backfill_driver_geohash.py --dry-run  # only report
+"""
+import sys
+import os
+import argparse
+from typing import Dict, Tuple
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.firebase import get_firestore, initialize_firebase
+from app.core.logging import logger
+from app.maps import geohash
+
+# Firestore limit of writes per batch
+BATCH_SIZE = 500
+
+
+def collect_updates(db) -> Tuple[Dict[str, str], int, int]:
+    """
+    Compute the geohash of every driver whose stored one is missing or outdated
+    
+    Returns:
+        Tuple of (geohash keyed by driver ID, drivers already up to date,
+        drivers without a valid location)
+    """
+    updates: Dict[str, str] = {}
+    up_to_date = 0
+    without_location = 0
+    
+    for doc in db.collection("drivers").select(["location", "geohash"]).stream():
+        driver_data = doc.to_dict() or {}
+        location = driver_data.get("location")
+        try:
+            cell = geohash.encode(float(location.latitude), float(location.longitude))
+        except (AttributeError, TypeError, ValueError):
+            without_location += 1
+            continue
+        
+        if driver_data.get("geohash") == cell:
+            up_to_date += 1
+        else:
+            updates[doc.id] = cell
+    
+    return updates, up_to_date, without_location
+
+
+def write_updates(db, updates: Dict[str, str]) -> int:
+    """Write the geohashes in batches"""
+    drivers = db.collection("drivers")
+    written = 0
+    batch = db.batch()
+    pending = 0
+    
+    for driver_id, cell in updates.items():
+        # update() rather than set(): never recreates a driver deleted since it was read
+        # (the batch then fails and the script can simply be re-run)
+        batch.update(drivers.document(driver_id), {"geohash": cell})
+        pending += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            written += pending
+            logger.info(f"Updated {written}/{len(updates)} drivers")
+            batch = db.batch()
+            pending = 0
+    
+    if pending:
+        batch.commit()
+        written += pending
+    
+    return written
+
+
+def backfill_driver_geohash(dry_run: bool = False):
+    initialize_firebase()
+    db = get_firestore()
+    
+    updates, up_to_date, without_location = collect_updates(db)
+    written = 0 if dry_run else write_updates(db, updates)
+    
+    # Print summary
+    print("\n" + "="*60)
+    print("📊 DRIVER GEOHASH BACKFILL SUMMARY" + (" (dry run)" if dry_run else ""))
+    print("="*60)
+    print(f"📍 Missing or outdated geohash: {len(updates)} drivers")
+    print(f"✅ Written: {written} drivers")
+    print(f"⚪ Already up to date: {up_to_date} drivers")
+    print(f"⚠️  Without valid location: {without_location} drivers")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the geohash field of driver documents")
+    parser.add_argument("--dry-run", action="store_true", help="Report without writing")
+    args = parser.parse_args()
+    
+    try:
+        backfill_driver_geohash(dry_run=args.dry_run)
+    except Exception as e:
+        logger.error(f"Failed to backfill driver geohashes: {str(e)}", exc_info=True)
+        sys.exit(1)
@@ -0,0 +1,133 @@
+"""
+Script to backfill the phone_index collection from existing users and drivers
+
+Login lookups resolve phone numbers through phone_index/{e164} documents,
+which the API writes together with every new user or driver. This script
+indexes accounts created before that (or written directly, e.g. by
+create_test_drivers.py), after which PHONE_INDEX_FALLBACK_QUERY can be
+turned off.
+
+The script is idempotent: entries are merged, so it can be re-run safely.
+When several documents of one collection share a phone number, the first one
+found is indexed and the others are reported.
+
+Usage:
+    python scripts/backfill_phone_index.py            # write entries
+    python scripts/backfill_phone_index.py --dry-run  # only report
+"""
+import sys
+import os
+import argparse
+from typing import Dict, List, Tuple
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from firebase_admin import firestore
+from app.core.firebase import get_firestore, initialize_firebase
+from app.core.logging import logger
+from app.core.phone_index import DRIVER_FIELD, PHONE_INDEX_COLLECTION, USER_FIELD
+
+# Firestore limit of writes per batch
+BATCH_SIZE = 500
+
+# Indexed collections and their index field
+SOURCES = (
+    ("users", USER_FIELD),
+    ("drivers", DRIVER_FIELD),
+)
+
+
+def collect_entries(db) -> Tuple[Dict[str, Dict[str, str]], List[str], int]:
+    """
+    Read the phone number of every user and driver
+    
+    Returns:
+        Tuple of (entries keyed by phone number, duplicate descriptions,
+        documents without a phone number)
+    """
+    entries: Dict[str, Dict[str, str]] = {}
+    duplicates: List[str] = []
+    missing_phone = 0
+    
+    for collection, field in SOURCES:
+        for doc in db.collection(collection).select(["phone_number"]).stream():
+            phone_number = (doc.to_dict() or {}).get("phone_number")
+            if not phone_number:
+                missing_phone += 1
+                continue
+            
+            entry = entries.setdefault(phone_number, {})
+            if field in entry:
+                duplicates.append(f"{collection}/{doc.id} shares a phone number with {collection}/{entry[field]}")
+                continue
+            entry[field] = doc.id
+    
+    return entries, duplicates, missing_phone
+
+
+def write_entries(db, entries: Dict[str, Dict[str, str]]) -> int:
+    """Merge the entries into phone_index in batches"""
+    index_collection = db.collection(PHONE_INDEX_COLLECTION)
+    written = 0
+    batch = db.batch()
+    pending = 0
+    
+    for phone_number, entry in entries.items():
+        batch.set(
+            index_collection.document(phone_number),
+            {**entry, "updatedAt": firestore.SERVER_TIMESTAMP},
+            merge=True
+        )
+        pending += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            written += pending
+            logger.info(f"Indexed {written}/{len(entries)} phone numbers")
+            batch = db.batch()
+            pending = 0
+    
+    if pending:
+        batch.commit()
+        written += pending
+    
+    return written
+
+
+def backfill_phone_index(dry_run: bool = False):
+    initialize_firebase()
+    db = get_firestore()
+    
+    entries, duplicates, missing_phone = collect_entries(db)
+    users = sum(1 for entry in entries.values() if USER_FIELD in entry)
+    drivers = sum(1 for entry in entries.values() if DRIVER_FIELD in entry)
+    
+    written = 0 if dry_run else write_entries(db, entries)
+    
+    # Print summary
+    print("\n" + "="*60)
+    print("📊 PHONE INDEX BACKFILL SUMMARY" + (" (dry run)" if dry_run else ""))
+    print("="*60)
+    print(f"📱 Phone numbers: {len(entries)} ({users} users, {drivers} drivers)")
+    print(f"✅ Written: {written} entries")
+    print(f"⚪ Documents without phone number: {missing_phone}")
+    print(f"⚠️  Duplicate phone numbers: {len(duplicates)}")
+    print("="*60)
+    
+    for duplicate in duplicates:
+        print(f"⚠️  {duplicate}")
+    
+    if not dry_run:
+        print("\n💡 TIP: Set PHONE_INDEX_FALLBACK_QUERY=false once no new accounts are created outside the API")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill phone_index from users and drivers")
+    parser.add_argument("--dry-run", action="store_true", help="Report without writing")
+    args = parser.parse_args()
+    
+    try:
+        backfill_phone_index(dry_run=args.dry_run)
+    except Exception as e:
+        logger.error(f"Failed to backfill phone index: {str(e)}", exc_info=True)
+        sys.exit(1)
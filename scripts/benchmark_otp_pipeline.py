@@ -0,0 +1,200 @@
+"""
+Benchmark of the OTP login pipeline
+
+Compares UserService.verify_phone_otp with the previous sequential flow
+(phone query, get_user, create_user, create_custom_token,
+set_custom_user_claims, get_user_by_id, create_user) against simulated Firebase
+Auth and Firestore backends with a fixed per-call latency, for:
+- cold logins: a phone number seen for the first time
+- warm logins: a returning user whose claims are already set
+
+No Firebase project is needed; nothing is written anywhere.
+
+Usage:
+    python scripts/benchmark_otp_pipeline.py --latency-ms 40 --iterations 200
+"""
+import sys
+import os
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from firebase_admin import auth as firebase_auth
+from app.core.auth_client import auth_client
+from app.users.service import UserService
+
+CUSTOM_CLAIMS = {"user_type": "user"}
+
+
+class FakeAuth:
+    """In-memory Firebase Auth with blocking calls of a fixed latency (run on the auth executor)"""
+
+    def __init__(self, latency_ms: float, sign_ms: float):
+        self.latency = latency_ms / 1000
+        self.sign = sign_ms / 1000
+        self.users: Dict[str, SimpleNamespace] = {}
+        self.calls = 0
+
+    def _remote(self) -> None:
+        self.calls += 1
+        time.sleep(self.latency * random.uniform(0.8, 1.2))
+
+    def get_user(self, uid: str) -> SimpleNamespace:
+        self._remote()
+        if uid not in self.users:
+            raise firebase_auth.UserNotFoundError(f"No user record found for uid: {uid}")
+        return self.users[uid]
+
+    def get_user_by_phone_number(self, phone_number: str) -> SimpleNamespace:
+        self._remote()
+        for user in self.users.values():
+            if user.phone_number == phone_number:
+                return user
+        raise firebase_auth.UserNotFoundError(f"No user record found for phone: {phone_number}")
+
+    def create_user(self, uid: Optional[str] = None, phone_number: Optional[str] = None) -> SimpleNamespace:
+        self._remote()
+        user = SimpleNamespace(uid=uid or uuid.uuid4().hex[:28], phone_number=phone_number, custom_claims=None)
+        self.users[user.uid] = user
+        return user
+
+    def set_custom_user_claims(self, uid: str, custom_claims: Dict[str, Any]) -> None:
+        self._remote()
+        self.users[uid].custom_claims = dict(custom_claims)
+
+    def create_custom_token(self, uid: str, developer_claims: Optional[Dict[str, Any]] = None) -> bytes:
+        # Signed locally with the service account key: CPU only
+        time.sleep(self.sign)
+        return f"token-{uid}".encode("utf-8")
+
+
+class FakeUserRepository:
+    """In-memory users collection with a fixed per-call latency"""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.calls = 0
+
+    async def _remote(self) -> None:
+        self.calls += 1
+        await asyncio.sleep(self.latency * random.uniform(0.8, 1.2))
+
+    async def get_user_by_phone(self, phone_number: str) -> Optional[Dict[str, Any]]:
+        await self._remote()
+        for document in self.documents.values():
+            if document["phone_number"] == phone_number:
+                return dict(document)
+        return None
+
+    async def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        await self._remote()
+        document = self.documents.get(user_id)
+        return dict(document) if document else None
+
+    async def create_user(self, user_id: str, phone_number: str, **fields: Any) -> Dict[str, Any]:
+        await self._remote()
+        self.documents[user_id] = {"id": user_id, "phone_number": phone_number, "name": "", "userType": "user"}
+        return dict(self.documents[user_id])
+
+    async def get_or_create_user(self, user_id: str, phone_number: str) -> Dict[str, Any]:
+        await self._remote()
+        if user_id not in self.documents:
+            self.documents[user_id] = {"id": user_id, "phone_number": phone_number, "name": "", "userType": "user"}
+        return dict(self.documents[user_id])
+
+
+async def sequential_login(repository: FakeUserRepository, phone_number: str) -> Dict[str, Any]:
+    """The previous verify_phone_otp call sequence"""
+    existing_user = await repository.get_user_by_phone(phone_number)
+    if existing_user:
+        user_id = existing_user["id"]
+        try:
+            await auth_client.get_user(user_id)
+        except firebase_auth.UserNotFoundError:
+            await auth_client.create_user(uid=user_id, phone_number=phone_number)
+    else:
+        user_record = await auth_client.create_user(phone_number=phone_number)
+        user_id = user_record.uid
+
+    custom_token = await auth_client.create_custom_token(user_id, CUSTOM_CLAIMS)
+    await auth_client.set_custom_user_claims(user_id, CUSTOM_CLAIMS)
+
+    user_doc = await repository.get_user_by_id(user_id)
+    if not user_doc:
+        user_doc = await repository.create_user(user_id, phone_number)
+    return {"accessToken": custom_token, "user": user_doc}
+
+
+async def measure(
+    login: Callable[[str], Awaitable[Dict[str, Any]]],
+    phone_numbers: List[str]
+) -> List[float]:
+    """Latency of each login in milliseconds"""
+    timings = []
+    for phone_number in phone_numbers:
+        started_at = time.perf_counter()
+        await login(phone_number)
+        timings.append((time.perf_counter() - started_at) * 1000)
+    return timings
+
+
+def summarize(timings: List[float]) -> str:
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {statistics.median(ordered):7.1f} ms   p95 {p95:7.1f} ms"
+
+
+async def run(latency_ms: float, sign_ms: float, iterations: int) -> None:
+    results = {}
+
+    for name in ("sequential", "pipeline"):
+        fake_auth = FakeAuth(latency_ms, sign_ms)
+        repository = FakeUserRepository(latency_ms)
+        auth_client._client_factory = lambda: fake_auth
+
+        if name == "sequential":
+            login = lambda phone_number: sequential_login(repository, phone_number)
+        else:
+            service = UserService.__new__(UserService)
+            service.repository = repository
+            login = lambda phone_number: service.verify_phone_otp(phone_number, "123456")
+
+        phone_numbers = [f"+26481{index:07d}" for index in range(iterations)]
+        cold = await measure(login, phone_numbers)
+        calls_cold = fake_auth.calls + repository.calls
+        warm = await measure(login, phone_numbers)
+        calls_warm = fake_auth.calls + repository.calls - calls_cold
+
+        results[name] = (cold, warm)
+        print(f"{name:<11} cold  {summarize(cold)}   remote calls/login {calls_cold / iterations:.1f}")
+        print(f"{'':<11} warm  {summarize(warm)}   remote calls/login {calls_warm / iterations:.1f}")
+
+    print()
+    for index, label in enumerate(("cold", "warm")):
+        before = sorted(results["sequential"][index])
+        after = sorted(results["pipeline"][index])
+        p95_index = min(iterations - 1, int(iterations * 0.95))
+        print(f"{label} p95 speedup: {before[p95_index] / after[p95_index]:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the OTP login pipeline against the sequential flow")
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="Latency of each simulated Auth/Firestore call")
+    parser.add_argument("--sign-ms", type=float, default=1.0, help="Local custom token signing time")
+    parser.add_argument("--iterations", type=int, default=100, help="Logins per scenario")
+    args = parser.parse_args()
+
+    print(f"⏱️  OTP login benchmark: {args.iterations} logins per scenario, {args.latency_ms:.0f} ms per remote call\n")
+    asyncio.run(run(args.latency_ms, args.sign_ms, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
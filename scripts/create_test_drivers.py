@@ -3,6 +3,7 @@ Script to create test drivers with location data in Firestore
 
 This script creates test drivers with:
 - Valid location data (GeoPoint with Windhoek coordinates)
+- Geohash of the location (used by the nearby drivers search)
 - Online status
 - Complete profile information
 - Active subscription status
@@ -20,6 +21,10 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from firebase_admin import firestore
 from app.core.firebase import get_firestore, initialize_firebase
 from app.core.logging import logger
+from app.maps import geo, geohash
+
+# Windhoek city center, used as the reference point for printed distances
+WINDHOEK_CENTER = (-22.5700, 17.0836)
 
 
 def create_test_drivers():
@@ -163,12 +168,17 @@ def create_test_drivers():
             driver_id = driver_data["id"]
             doc_ref = drivers_collection.document(driver_id)
             
+            # Geohash must be kept in sync with location for nearby search
+            location = driver_data["location"]
+            driver_data["geohash"] = geohash.encode(location.latitude, location.longitude)
+            
             # Check if driver already exists
             doc = doc_ref.get()
             if doc.exists:
                 # Update existing driver
                 doc_ref.update({
                     "location": driver_data["location"],
+                    "geohash": driver_data["geohash"],
                     "status": driver_data["status"],
                     "locationUpdatedAt": firestore.SERVER_TIMESTAMP,
                     "updatedAt": firestore.SERVER_TIMESTAMP,
@@ -195,14 +205,23 @@ def create_test_drivers():
     
     # Print location info
     print("\n📍 TEST DRIVER LOCATIONS (Windhoek area):")
-    print("-" * 60)
-    for driver in test_drivers:
+    print("-" * 72)
+    distances = geo.distances_km(
+        WINDHOEK_CENTER[0],
+        WINDHOEK_CENTER[1],
+        [driver["location"].latitude for driver in test_drivers],
+        [driver["location"].longitude for driver in test_drivers]
+    )
+    for driver, distance_km in zip(test_drivers, distances):
         lat = driver["location"].latitude
         lng = driver["location"].longitude
         status = driver["status"]
         status_emoji = "🟢" if status == "online" else "🔴"
-        print(f"{status_emoji} {driver['name']:<20} | {lat:>9.4f}, {lng:>9.4f} | {status}")
-    print("-" * 60)
+        print(
+            f"{status_emoji} {driver['name']:<20} | {lat:>9.4f}, {lng:>9.4f} | "
+            f"{distance_km:>5.2f} km | {status}"
+        )
+    print("-" * 72)
     
     print("\n💡 TIP: Use coordinates around -22.5700, 17.0836 (Windhoek) to test nearby drivers")
     print("💡 Default search radius is 5km")
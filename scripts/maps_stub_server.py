@@ -0,0 +1,187 @@
+"""
+Local stub of the Google Maps web services for testing the async Maps client
+
+Serves the endpoints app/maps/client.py calls, with answers computed locally
+(Haversine distance times a road factor at a fixed speed):
+- /maps/api/distancematrix/json
+- /maps/api/geocode/json (address= or latlng=)
+- /maps/api/directions/json
+
+Failures and latency can be injected to exercise retries, timeouts and the
+circuit breaker.
+
+Usage:
+    python scripts/maps_stub_server.py --port 8765 --fail-rate 0.2 --latency-ms 50
+    
+    # Then start the API against it
+    GOOGLE_MAPS_BASE_URL=http://127.0.0.1:8765 MAPS_HTTP2=false python run.py
+"""
+import sys
+import os
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.maps import geo
+
+ROAD_FACTOR = 1.3
+SPEED_KMH = 30.0
+
+# Returned for every forward geocode
+DEFAULT_LOCATION = (-22.5700, 17.0836)  # Windhoek city center
+
+
+def parse_locations(value: str) -> List[Tuple[float, float]]:
+    """Parse "lat,lng|lat,lng" parameters"""
+    locations = []
+    for part in value.split("|"):
+        latitude, longitude = part.split(",")
+        locations.append((float(latitude), float(longitude)))
+    return locations
+
+
+def route(origin: Tuple[float, float], destination: Tuple[float, float]) -> Tuple[int, int]:
+    """Road distance in meters and duration in seconds"""
+    distance_km = geo.haversine_km(origin[0], origin[1], destination[0], destination[1]) * ROAD_FACTOR
+    return int(distance_km * 1000), int(distance_km / SPEED_KMH * 3600)
+
+
+def distance_matrix(params: Dict[str, str]) -> Dict[str, Any]:
+    rows = []
+    for origin in parse_locations(params["origins"]):
+        elements = []
+        for destination in parse_locations(params["destinations"]):
+            meters, seconds = route(origin, destination)
+            elements.append({
+                "status": "OK",
+                "distance": {"value": meters, "text": f"{meters / 1000:.1f} km"},
+                "duration": {"value": seconds, "text": f"{max(1, round(seconds / 60))} mins"}
+            })
+        rows.append({"elements": elements})
+    return {"status": "OK", "rows": rows}
+
+
+def geocode(params: Dict[str, str]) -> Dict[str, Any]:
+    if "latlng" in params:
+        latitude, longitude = parse_locations(params["latlng"])[0]
+        formatted_address = f"Stub Street {abs(int(latitude * 1000)) % 100}, Windhoek, Namibia"
+    else:
+        latitude, longitude = DEFAULT_LOCATION
+        formatted_address = f"{params['address']}, Windhoek, Namibia"
+    
+    return {
+        "status": "OK",
+        "results": [{
+            "formatted_address": formatted_address,
+            "place_id": f"stub_{latitude:.5f}_{longitude:.5f}",
+            "geometry": {"location": {"lat": latitude, "lng": longitude}},
+            "address_components": [
+                {"long_name": "Windhoek", "short_name": "Windhoek", "types": ["locality"]},
+                {"long_name": "Namibia", "short_name": "NA", "types": ["country"]}
+            ]
+        }]
+    }
+
+
+def directions(params: Dict[str, str]) -> Dict[str, Any]:
+    origin = parse_locations(params["origin"])[0]
+    destination = parse_locations(params["destination"])[0]
+    meters, seconds = route(origin, destination)
+    return {
+        "status": "OK",
+        "routes": [{
+            "legs": [{
+                "distance": {"value": meters},
+                "duration": {"value": seconds},
+                "start_address": f"{origin[0]:.5f},{origin[1]:.5f}",
+                "end_address": f"{destination[0]:.5f},{destination[1]:.5f}",
+                "steps": [{
+                    "html_instructions": "Head to destination",
+                    "distance": {"value": meters},
+                    "duration": {"value": seconds}
+                }]
+            }]
+        }]
+    }
+
+
+ENDPOINTS = {
+    "/maps/api/distancematrix/json": distance_matrix,
+    "/maps/api/geocode/json": geocode,
+    "/maps/api/directions/json": directions,
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers Maps requests, optionally slow or failing"""
+    
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+    fail_rate = 0.0
+    latency_ms = 0
+    
+    def do_GET(self):
+        url = urlparse(self.path)
+        handler = ENDPOINTS.get(url.path)
+        if handler is None:
+            self.respond(404, {"status": "NOT_FOUND"})
+            return
+        
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        
+        if random.random() < self.fail_rate:
+            # Alternate between the two retryable failure kinds
+            if random.random() < 0.5:
+                self.respond(503, {"status": "UNKNOWN_ERROR"})
+            else:
+                self.respond(200, {"status": "OVER_QUERY_LIMIT", "error_message": "Stub quota exceeded"})
+            return
+        
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        try:
+            self.respond(200, handler(params))
+        except (KeyError, ValueError) as e:
+            self.respond(200, {"status": "INVALID_REQUEST", "error_message": f"Bad parameter: {str(e)}"})
+    
+    def respond(self, status_code: int, body: Dict[str, Any]):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Google Maps web service stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with a retryable error")
+    parser.add_argument("--latency-ms", type=int, default=0, help="Delay added to every response")
+    args = parser.parse_args()
+    
+    StubHandler.fail_rate = args.fail_rate
+    StubHandler.latency_ms = args.latency_ms
+    
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"🗺️  Maps stub listening on http://{args.host}:{args.port} "
+          f"(fail rate {args.fail_rate:.0%}, latency {args.latency_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -16,10 +16,17 @@ import json
 import requests
 from typing import Optional
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.maps import geo
+
 # Test configuration
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 API_VERSION = "v1"
 
+# Allowed difference between API distances (rounded to 2 decimals) and local ones
+DISTANCE_TOLERANCE_KM = 0.01
+
 # Windhoek test coordinates
 WINDHOEK_CENTER = {"latitude": -22.5700, "longitude": 17.0836}
 WINDHOEK_NORTH = {"latitude": -22.5650, "longitude": 17.0800}
@@ -104,6 +111,8 @@ def test_nearby_drivers(
                             print(f"     ✅ Location properly serialized")
                         else:
                             print(f"     ❌ Location NOT properly serialized: {type(location)}")
+                    
+                    verify_distances(latitude, longitude, radius, drivers)
                 else:
                     print(f"⚠️  API returned success=false: {data.get('message')}")
             else:
@@ -122,6 +131,43 @@ def test_nearby_drivers(
         return {"error": str(e)}
 
 
+def verify_distances(latitude: float, longitude: float, radius: float, drivers: list) -> bool:
+    """Check returned distance_km values against one batch geo computation"""
+    located = [
+        d for d in drivers
+        if isinstance(d.get("location"), dict) and "latitude" in d["location"] and "longitude" in d["location"]
+    ]
+    if not located:
+        return True
+    
+    batch = geo.score_points(
+        latitude,
+        longitude,
+        [d["location"]["latitude"] for d in located],
+        [d["location"]["longitude"] for d in located],
+        radius
+    )
+    
+    all_ok = True
+    for driver, expected, inside in zip(located, batch.distances_km, batch.within_radius):
+        reported = driver.get("distance_km")
+        if reported is None or abs(reported - expected) > DISTANCE_TOLERANCE_KM:
+            print(f"     ❌ {driver.get('name', 'Unknown')}: distance_km={reported}, expected {expected:.2f}")
+            all_ok = False
+        elif not inside:
+            print(f"     ❌ {driver.get('name', 'Unknown')}: {expected:.2f} km is outside the {radius}km radius")
+            all_ok = False
+    
+    reported = [d.get("distance_km") or 0 for d in located]
+    if reported != sorted(reported):
+        print("     ❌ Drivers are not sorted by distance")
+        all_ok = False
+    
+    if all_ok:
+        print(f"\n✅ Distances of {len(located)} drivers match local computation")
+    return all_ok
+
+
 def run_tests():
     """Run comprehensive tests"""
     